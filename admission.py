@@ -0,0 +1,150 @@
+"""
+Admission control for request handlers that block on Google.
+
+Every admitted /chat turn holds a threadpool thread for as long as its
+calendar calls take, so when Google slows down, turns pile up. An
+AdmissionController admits at most `max_concurrent` of them per worker,
+queues up to `max_queue` more and turns everyone else away at once with
+OverloadedError, which the API answers with 503 and a Retry-After estimated
+from recent turn times.
+
+Waiters are served by priority: turns that finish a booking (picking or
+confirming a slot) go before exploratory ones. When the queue is full, a
+booking turn takes the place of the newest exploratory waiter, so bookings
+are not shed while exploratory turns are still waiting. Runs on the event
+loop, before any thread is taken.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Tuple
+
+from metrics import ADMISSION_REJECTED, ADMISSION_WAIT
+
+# Priorities, most urgent first
+BOOKING = 0
+EXPLORATORY = 1
+PRIORITY_NAMES = {BOOKING: "booking", EXPLORATORY: "exploratory"}
+
+
+class OverloadedError(Exception):
+    """Raised when a request cannot be admitted; `retry_after` is in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Priority-ordered, bounded concurrency limit for one event loop; not thread-safe"""
+
+    def __init__(self, max_concurrent: int = 32, max_queue: int = 64, queue_timeout: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._queues: Dict[int, Deque[asyncio.Future]] = {BOOKING: deque(), EXPLORATORY: deque()}
+        self.rejected: Dict[Tuple[str, str], int] = {}
+        # Moving average of how long an admitted request holds its slot
+        self._service_seconds = 1.0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @asynccontextmanager
+    async def admit(self, priority: int = EXPLORATORY):
+        """Hold one of the `max_concurrent` slots for the duration of the block"""
+        await self.acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_seconds += 0.1 * (time.perf_counter() - started - self._service_seconds)
+            self.release()
+
+    async def acquire(self, priority: int = EXPLORATORY):
+        if self.active < self.max_concurrent and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.max_queue and not self._displace(priority):
+            self._reject("queue_full", priority)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(waiter)
+        started = time.perf_counter()
+        try:
+            # release() hands its slot straight to the waiter, so `active` is already counted
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter, priority)
+            self._reject("timeout", priority)
+        except asyncio.CancelledError:
+            # The client went away while queued
+            self._abandon(waiter, priority)
+            raise
+        finally:
+            # A displaced waiter gets its OverloadedError from the await above
+            ADMISSION_WAIT.labels(PRIORITY_NAMES[priority]).observe(time.perf_counter() - started)
+
+    def release(self):
+        """Pass the slot to the most urgent waiter, or free it"""
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        return max(1, math.ceil((self.queued + 1) * self._service_seconds / self.max_concurrent))
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.active,
+            "queued": self.queued,
+            "queued_booking": len(self._queues[BOOKING]),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": {f"{reason}:{priority}": count for (reason, priority), count in self.rejected.items()},
+        }
+
+    def _displace(self, priority: int) -> bool:
+        """Make room for an urgent request by turning away the newest less urgent waiter"""
+        for lower in sorted(self._queues, reverse=True):
+            if lower <= priority:
+                break
+            queue = self._queues[lower]
+            while queue:
+                waiter = queue.pop()
+                if not waiter.done():
+                    self._count("displaced", lower)
+                    waiter.set_exception(OverloadedError("Displaced by a booking", self.retry_after()))
+                    return True
+        return False
+
+    def _abandon(self, waiter: asyncio.Future, priority: int):
+        if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+            # The slot arrived just as we gave up; pass it on
+            self.release()
+        elif not waiter.done():
+            waiter.cancel()
+        try:
+            self._queues[priority].remove(waiter)
+        except ValueError:
+            pass
+
+    def _reject(self, reason: str, priority: int):
+        self._count(reason, priority)
+        raise OverloadedError(f"Server busy ({reason})", self.retry_after())
+
+    def _count(self, reason: str, priority: int):
+        name = PRIORITY_NAMES[priority]
+        self.rejected[(reason, name)] = self.rejected.get((reason, name), 0) + 1
+        ADMISSION_REJECTED.labels(reason, name).inc()
@@ -0,0 +1,543 @@
+"""
+Conversation logic shared by the booking agents.
+
+The booking flow is a small state machine. Each turn starts at the step for
+the conversation's current state (ENTRY_STEPS) and chains through further
+steps only while they need no input from the user (TRANSITIONS); both tables
+are dicts, so picking the next step is a single lookup.
+
+`AgentCore` runs that loop itself, which is all SimpleBookingAgent needs.
+BookingAgent compiles the same steps and tables into a LangGraph graph to get
+checkpointing, so caching, prefetch and any other change to a step applies to
+both agents.
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import recurrence
+from booking_ledger import BOOKED, PENDING, MemoryBookingLedger, booking_key
+from calendar_service import CalendarService
+from google_api import CALENDAR_UNAVAILABLE_MESSAGE, CalendarUnavailableError, stale_notice
+from logging_setup import log_context
+from metrics import BOOKING_ATTEMPTS, NODE_LATENCY, timed
+from models import AgentState, BookingRequest, CalendarSlot, ConversationState
+from nlp_processor import NLPProcessor
+from slot_holds import slot_holds
+from timezones import get_timezone
+from tracing import traced, tracer
+
+logger = logging.getLogger(__name__)
+
+# Step that handles the user's message in each conversation state
+ENTRY_STEPS: Dict[ConversationState, str] = {
+    ConversationState.GREETING: "greeting",
+    ConversationState.UNDERSTANDING_REQUEST: "understand_request",
+    ConversationState.CHECKING_AVAILABILITY: "check_availability",
+    ConversationState.CONFIRMING_BOOKING: "confirm_booking",
+    # A finished or failed booking starts a new request
+    ConversationState.BOOKING_COMPLETE: "greeting",
+    ConversationState.ERROR: "greeting",
+}
+
+# Step -> {state it left the conversation in: step to chain into}. Any other
+# state ends the turn: the reply is recorded and the agent waits for the user.
+TRANSITIONS: Dict[str, Dict[ConversationState, str]] = {
+    "greeting": {
+        ConversationState.UNDERSTANDING_REQUEST: "understand_request",
+    },
+    "understand_request": {
+        ConversationState.CHECKING_AVAILABILITY: "check_availability",
+        ConversationState.ERROR: "handle_error",
+    },
+    "check_availability": {
+        ConversationState.ERROR: "handle_error",
+    },
+    "confirm_booking": {
+        ConversationState.BOOKING_COMPLETE: "complete_booking",
+        ConversationState.ERROR: "handle_error",
+    },
+    "complete_booking": {},
+    "handle_error": {},
+}
+
+# Every turn ends here
+RESPOND_STEP = "respond"
+
+MAX_SUGGESTIONS = 3
+
+
+class AgentCore:
+    """Booking conversation steps plus a table-driven loop that runs them"""
+
+    # Reported on the agent.process_message span
+    agent_name = "simple"
+    # Messages kept in state; None keeps the whole history
+    max_messages: Optional[int] = None
+
+    def __init__(self, calendar_service: CalendarService, bookings=None, holds=None):
+        self.calendar_service = calendar_service
+        self.nlp_processor = NLPProcessor()
+        # Booking idempotency keys (see booking_ledger) and slot holds (see slot_holds)
+        self.bookings = bookings if bookings is not None else MemoryBookingLedger()
+        self.holds = holds if holds is not None else slot_holds
+        # Each step is timed into the per-node latency histogram and traced
+        self.steps = {
+            name: timed(NODE_LATENCY.labels(name), traced(f"agent.node.{name}", getattr(self, f"_{name}")))
+            for name in (*TRANSITIONS, RESPOND_STEP)
+        }
+
+    @property
+    def calendar_id(self) -> str:
+        return getattr(self.calendar_service, "calendar_id", "primary")
+
+    def entry_step(self, state: AgentState) -> str:
+        """Step that handles the user's reply in the current state"""
+        step = ENTRY_STEPS.get(state.current_state, "greeting")
+        if step == "check_availability" and state.suggested_slots:
+            # Slots were offered last turn, so this message is a selection
+            return "confirm_booking"
+        return step
+
+    def next_step(self, step: str, state: AgentState) -> str:
+        """Step to chain into after `step`, or RESPOND_STEP to end the turn"""
+        return TRANSITIONS[step].get(state.current_state, RESPOND_STEP)
+
+    def load_state(self, session_id: str) -> Optional[AgentState]:
+        """Stored state for a session; the core keeps none, callers pass state in"""
+        return None
+
+    def process_message(self, message: str, state: Optional[AgentState] = None, session_id: Optional[str] = None,
+                        request_id: Optional[str] = None) -> AgentState:
+        """Process a user message and update state.
+
+        When `state` is omitted it is loaded for `session_id` (see load_state)
+        or started fresh.
+        """
+        with log_context(request_id=request_id, session_id=session_id), \
+                tracer.start_span("agent.process_message", {"agent": self.agent_name}) as span:
+            if state is None:
+                state = (self.load_state(session_id) if session_id else None) or AgentState()
+            if session_id:
+                state.session_id = session_id
+            span.set_attribute("state.before", state.current_state.value)
+            state = self._process_message(message, state, session_id)
+            span.set_attribute("state.after", state.current_state.value)
+            return state
+
+    def _process_message(self, message: str, state: AgentState, session_id: Optional[str] = None) -> AgentState:
+        try:
+            # Update state with user input
+            state.user_input = message
+            if message.strip():  # Don't add empty messages to history
+                state.messages.append({"role": "user", "content": message})
+            return self._run_turn(state, session_id)
+
+        except Exception:
+            logger.exception("Error processing message")
+            state.agent_response = "I'm sorry, I encountered an error. Could you please try again?"
+            state.current_state = ConversationState.ERROR
+            state.messages.append({"role": "assistant", "content": state.agent_response})
+            return state
+
+    def _run_turn(self, state: AgentState, session_id: Optional[str] = None) -> AgentState:
+        """Run steps from the entry step until one needs the user's reply"""
+        step = self.entry_step(state)
+        while step != RESPOND_STEP:
+            state = self.steps[step](state)
+            step = self.next_step(step, state)
+        return self.steps[RESPOND_STEP](state)
+
+    # Steps
+
+    def _greeting(self, state: AgentState) -> AgentState:
+        """Handle initial greeting and intent detection"""
+        if not state.user_input.strip():
+            # Initial greeting when agent starts
+            state.agent_response = "Hi! I'm your calendar booking assistant. I can help you schedule appointments and check availability. What would you like to schedule today?"
+            state.current_state = ConversationState.GREETING
+            return state
+
+        if state.current_state == ConversationState.BOOKING_COMPLETE:
+            # A new request after a finished booking starts from a clean slate
+            self._reset_booking(state)
+
+        # Process user's message
+        intent = self.nlp_processor.extract_intent(state.user_input)
+        if intent == "booking_request":
+            state.agent_response = "Great! I'd be happy to help you schedule an appointment. Let me gather some details."
+        else:
+            state.agent_response = "I can help you book appointments and schedule meetings. Could you tell me what kind of meeting you'd like to schedule and when?"
+        state.current_state = ConversationState.UNDERSTANDING_REQUEST
+        return state
+
+    def _understand_request(self, state: AgentState) -> AgentState:
+        """Extract booking details from user input"""
+        try:
+            self._extract_booking_info(state)
+
+            # Check if we have enough information to proceed
+            missing_info = []
+            if not state.booking_request.date:
+                missing_info.append("date")
+            if not state.booking_request.time:
+                missing_info.append("preferred time")
+
+            if missing_info:
+                if len(missing_info) == 1:
+                    state.agent_response = f"I need to know the {missing_info[0]}. When would you like to schedule this?"
+                else:
+                    state.agent_response = f"I need a bit more information. Could you please specify the {' and '.join(missing_info)}?"
+                state.current_state = ConversationState.UNDERSTANDING_REQUEST
+                if state.booking_request.date:
+                    # The time usually arrives next turn; warm the calendar cache meanwhile
+                    self.calendar_service.prefetch_availability(state.booking_request.date, self._timezone(state))
+            else:
+                # We have enough info, move to availability check
+                state.agent_response = f"Perfect! Let me check availability for {self._format_date(state.booking_request.date)} around {state.booking_request.time}."
+                state.current_state = ConversationState.CHECKING_AVAILABILITY
+
+        except Exception:
+            logger.exception("Error understanding request")
+            state.current_state = ConversationState.ERROR
+
+        return state
+
+    def _check_availability(self, state: AgentState) -> AgentState:
+        """Check calendar availability and suggest slots"""
+        formatted_date = self._format_date(state.booking_request.date)
+        try:
+            # Offer (and hold) the best slots no other session is holding
+            ranked = self._ranked_slots(state)
+            state.suggested_slots = self._hold(state, ranked, MAX_SUGGESTIONS)
+
+            if state.suggested_slots:
+                state.agent_response = (f"Here are some available time slots for {formatted_date}:\n\n"
+                                        f"{self._format_slots(state.suggested_slots)}\n\n"
+                                        "Which slot works best for you? Just type 1, 2, or 3.")
+                state.agent_response += stale_notice(state.suggested_slots)
+                state.current_state = ConversationState.CHECKING_AVAILABILITY
+            elif ranked:
+                state.agent_response = (f"The remaining times on {formatted_date} are being offered to someone else right now. "
+                                        "Would you like to try a different date, or check again in a few minutes?")
+                state.current_state = ConversationState.UNDERSTANDING_REQUEST
+            else:
+                state.agent_response = f"I don't have any available slots on {formatted_date}. Would you like to try a different date?"
+                state.current_state = ConversationState.UNDERSTANDING_REQUEST
+
+        except CalendarUnavailableError:
+            state.suggested_slots = []
+            state.agent_response = CALENDAR_UNAVAILABLE_MESSAGE
+            state.current_state = ConversationState.UNDERSTANDING_REQUEST
+        except Exception:
+            logger.exception("Error checking availability")
+            state.agent_response = "I encountered an error while checking availability. Could you please try again?"
+            state.current_state = ConversationState.ERROR
+
+        return state
+
+    def _confirm_booking(self, state: AgentState) -> AgentState:
+        """Handle slot selection and booking confirmation"""
+        try:
+            # Check if user selected a slot by number
+            slot_selection = self.nlp_processor.extract_slot_selection(state.user_input)
+
+            if slot_selection is not None and slot_selection < len(state.suggested_slots):
+                # User selected a specific slot; only it stays on hold
+                state.confirmed_slot = state.suggested_slots[slot_selection]
+                if not self._hold(state, [state.confirmed_slot], 1):
+                    return self._offer_next_slot(state)
+                state.agent_response = (f"Perfect! I'll book your {state.booking_request.title.lower()} for "
+                                        f"{self._format_slot_time(state.confirmed_slot)}"
+                                        f"{self._recurrence_note(state, state.confirmed_slot)}. "
+                                        "Please confirm - is this correct?")
+                state.current_state = ConversationState.CONFIRMING_BOOKING
+                return state
+
+            # Check for general confirmation/rejection intent
+            intent = self.nlp_processor.extract_intent(state.user_input)
+            if intent == "confirmation" and state.confirmed_slot:
+                # User confirmed the booking
+                state.agent_response = "Excellent! Let me complete your booking now."
+                state.current_state = ConversationState.BOOKING_COMPLETE
+            elif intent == "rejection":
+                # User rejected or wants to modify
+                state.agent_response = "No problem! Would you like to see different time slots or schedule for a different date?"
+                state.current_state = ConversationState.UNDERSTANDING_REQUEST
+                state.confirmed_slot = None
+                self.holds.release_holds(self._holder(state))
+            elif state.current_state == ConversationState.CONFIRMING_BOOKING and state.confirmed_slot:
+                # Ask for clear confirmation
+                state.agent_response = "Please type 'yes' to confirm the booking or 'no' to choose a different time."
+            else:
+                # User input not clear
+                if state.suggested_slots:
+                    state.agent_response = "Please select a time slot by typing 1, 2, or 3, or let me know if you'd like different options."
+                else:
+                    state.agent_response = "I'm not sure what you'd like to do. Could you please clarify?"
+                state.current_state = ConversationState.CHECKING_AVAILABILITY
+
+        except Exception:
+            logger.exception("Error confirming booking")
+            state.current_state = ConversationState.ERROR
+
+        return state
+
+    def _complete_booking(self, state: AgentState) -> AgentState:
+        """Create the calendar event for the confirmed slot, at most once per session and slot"""
+        try:
+            if not state.confirmed_slot:
+                state.agent_response = "Something went wrong with the booking. Let's start over."
+                state.current_state = ConversationState.ERROR
+                return state
+
+            slot = state.confirmed_slot
+            rule = state.booking_request.recurrence
+            # Anonymous conversations each have their own key, or the second would be told
+            # the first one's booking was its own
+            key = booking_key(self._holder(state), slot, self.calendar_id, rule)
+            held = self.bookings.claim_booking(key, self._holder(state))
+            if held == BOOKED:
+                # A repeated confirmation (double click, retried request): report the earlier booking
+                BOOKING_ATTEMPTS.labels("duplicate").inc()
+                return self._booked(state)
+            if held == PENDING:
+                BOOKING_ATTEMPTS.labels("in_progress").inc()
+                state.agent_response = "I'm already booking that slot. Give me a moment and reply 'yes' to check on it."
+                state.current_state = ConversationState.CONFIRMING_BOOKING
+                return state
+
+            try:
+                # The slot was free when suggested, but that may have been a while ago
+                # and our hold may have lapsed since
+                if not self._hold(state, [slot], 1) or not self.calendar_service.is_slot_free(slot):
+                    self.bookings.release_booking(key)
+                    BOOKING_ATTEMPTS.labels("conflict").inc()
+                    return self._offer_next_slot(state)
+                # Later meetings of a series that clash are left out of it rather than double-booked
+                conflicts = self._series_conflicts(slot, rule, self._timezone(state))[1] if rule else []
+                success = self.calendar_service.create_event(
+                    slot,
+                    state.booking_request.title or "Scheduled Meeting",
+                    state.booking_request.description or "",
+                    state.booking_request.attendee_email or "",
+                    event_id=key,
+                    rrule=rule,
+                    exclude=[start for start, _ in conflicts],
+                    timezone=self._timezone(state),
+                )
+            except Exception:
+                self.bookings.release_booking(key)
+                raise
+
+            if success:
+                self.bookings.finish_booking(key)
+                self.holds.release_holds(self._holder(state))
+                BOOKING_ATTEMPTS.labels("booked").inc()
+                return self._booked(state)
+            self.bookings.release_booking(key)
+            BOOKING_ATTEMPTS.labels("failed").inc()
+            state.agent_response = "I encountered an issue while booking your appointment. Please try again or contact support."
+            state.current_state = ConversationState.ERROR
+
+        except Exception:
+            logger.exception("Error completing booking")
+            state.agent_response = "I encountered an error while completing your booking. Please try again."
+            state.current_state = ConversationState.ERROR
+
+        return state
+
+    def _booked(self, state: AgentState) -> AgentState:
+        title = state.booking_request.title or "Scheduled Meeting"
+        state.agent_response = f"🎉 Your {title.lower()} has been successfully booked for {self._format_slot_time(state.confirmed_slot)}"
+        rule = state.booking_request.recurrence
+        state.agent_response += f", {recurrence.describe(rule)}!" if rule else "!"
+        if self.calendar_service.authenticated:
+            state.agent_response += " You should receive a calendar invitation shortly."
+        state.agent_response += "\n\nIs there anything else I can help you with?"
+        state.current_state = ConversationState.BOOKING_COMPLETE
+        return state
+
+    def _offer_next_slot(self, state: AgentState) -> AgentState:
+        """The confirmed slot was taken meanwhile: offer the next ranked slot that is still free"""
+        taken = state.confirmed_slot
+        remaining = [slot for slot in state.suggested_slots if not self._overlaps(slot, taken)]
+        next_slot = self._first_free(state, remaining)
+        if next_slot is None:
+            # Every suggestion is gone; look further down the day's ranking
+            try:
+                ranked = [slot for slot in self._ranked_slots(state)
+                          if not self._overlaps(slot, taken) and slot not in remaining]
+            except CalendarUnavailableError:
+                ranked = []
+            next_slot = self._first_free(state, ranked[:MAX_SUGGESTIONS])
+
+        if next_slot is None:
+            self.holds.release_holds(self._holder(state))
+            state.suggested_slots = []
+            state.confirmed_slot = None
+            state.agent_response = (f"Sorry, {self._format_slot_time(taken)} was just taken and I couldn't find another "
+                                    f"free time near it on {self._format_date(state.booking_request.date)}. "
+                                    "Would you like to try a different time or date?")
+            state.current_state = ConversationState.UNDERSTANDING_REQUEST
+            return state
+
+        state.suggested_slots = [next_slot] + [slot for slot in remaining if slot != next_slot]
+        state.confirmed_slot = next_slot
+        state.agent_response = (f"Sorry, {self._format_slot_time(taken)} was just taken. The next best time is "
+                                f"{self._format_slot_time(next_slot)}{self._recurrence_note(state, next_slot)}. "
+                                "Shall I book that instead?")
+        state.current_state = ConversationState.CONFIRMING_BOOKING
+        return state
+
+    def _handle_error(self, state: AgentState) -> AgentState:
+        """Handle errors gracefully"""
+        state.agent_response = "I apologize, but I encountered an issue. Let's start fresh - how can I help you schedule an appointment?"
+        state.current_state = ConversationState.GREETING
+        self._reset_booking(state)
+        return state
+
+    def _respond(self, state: AgentState) -> AgentState:
+        """Record the turn's reply and compact the history"""
+        if state.agent_response:
+            state.messages.append({"role": "assistant", "content": state.agent_response})
+        if self.max_messages and len(state.messages) > self.max_messages:
+            state.messages = state.messages[-self.max_messages:]
+        return state
+
+    # Helpers
+
+    def _extract_booking_info(self, state: AgentState):
+        """Fill in whatever date, time and title the user's message gives"""
+        date_info, time_info = self.nlp_processor.extract_datetime_info(state.user_input, self._timezone(state))
+
+        if date_info and not state.booking_request.date:
+            state.booking_request.date = date_info
+        if time_info and not state.booking_request.time:
+            state.booking_request.time = time_info
+        if not state.booking_request.recurrence:
+            state.booking_request.recurrence = self.nlp_processor.extract_recurrence(state.user_input)
+
+        # Extract meeting type/title if not set
+        if not state.booking_request.title:
+            text_lower = state.user_input.lower()
+            if "call" in text_lower:
+                state.booking_request.title = "Phone Call"
+            elif "meeting" in text_lower:
+                state.booking_request.title = "Meeting"
+            elif "discussion" in text_lower or "discuss" in text_lower:
+                state.booking_request.title = "Discussion"
+            else:
+                state.booking_request.title = "Appointment"
+
+    def _ranked_slots(self, state: AgentState) -> list[CalendarSlot]:
+        """The requested day's free slots, closest to the requested time first"""
+        available_slots = self._get_available_slots(state.booking_request.date, self._timezone(state))
+        if available_slots and state.booking_request.time:
+            available_slots = self._filter_preferred_slots(available_slots, state.booking_request.time)
+        return available_slots
+
+    def _first_free(self, state: AgentState, slots: list[CalendarSlot]) -> Optional[CalendarSlot]:
+        """First of `slots` that is free in the calendar and can be held for this session"""
+        for slot in slots:
+            if self.calendar_service.is_slot_free(slot) and self._hold(state, [slot], 1):
+                return slot
+        return None
+
+    def _hold(self, state: AgentState, slots: list[CalendarSlot], limit: int = 0) -> list[CalendarSlot]:
+        """Hold up to `limit` of `slots` for this session (replacing its holds); returns those held"""
+        intervals = [(slot.start_time.timestamp(), slot.end_time.timestamp()) for slot in slots]
+        held = set(self.holds.hold_slots(self.calendar_id, self._holder(state), intervals, limit=limit))
+        return [slot for slot, interval in zip(slots, intervals) if interval in held]
+
+    @staticmethod
+    def _holder(state: AgentState) -> str:
+        """Owner of the conversation's slot holds: its session, or an id of its own when it has none"""
+        if state.session_id:
+            return state.session_id
+        if not state.hold_owner:
+            # Anonymous conversations must not share (and replace) each other's holds
+            state.hold_owner = f"anonymous-{uuid.uuid4().hex}"
+        return state.hold_owner
+
+    def _get_available_slots(self, date_str: str, timezone=None) -> list[CalendarSlot]:
+        """Free slots over the whole requested day in `timezone` (default the calendar's), in that timezone"""
+        timezone = timezone or self.calendar_service.timezone
+        requested_date = datetime.strptime(date_str, "%Y-%m-%d")
+        start_date = timezone.localize(requested_date.replace(hour=0, minute=0, second=0))
+        end_date = timezone.localize(requested_date.replace(hour=23, minute=59, second=59))
+        slots = self.calendar_service.get_availability(start_date, end_date)
+        # In another timezone than the calendar's, the user's day spans two calendar days
+        return [slot.model_copy(update={"start_time": slot.start_time.astimezone(timezone),
+                                        "end_time": slot.end_time.astimezone(timezone)})
+                for slot in slots if start_date <= slot.start_time <= end_date]
+
+    def _timezone(self, state: AgentState):
+        """The user's timezone if the conversation has one, else the calendar's"""
+        return get_timezone(state.timezone) if state.timezone else self.calendar_service.timezone
+
+    def _filter_preferred_slots(self, slots: list[CalendarSlot], preferred_time: str) -> list[CalendarSlot]:
+        """Filter slots based on preferred time"""
+        preferred_hour = self.nlp_processor.parse_time_to_hour(preferred_time)
+        if preferred_hour is None:
+            return slots
+
+        # Sort by proximity to preferred time
+        def time_distance(slot):
+            return abs(slot.start_time.hour - preferred_hour)
+
+        return sorted(slots, key=time_distance)
+
+    def _series_conflicts(self, slot: CalendarSlot, rule: str, timezone) -> Tuple[List[Tuple[datetime, datetime]], List[Tuple[datetime, datetime]]]:
+        """Every occurrence of the series starting at `slot` and repeating in `timezone`, and those that clash
+        with the calendar"""
+        # A checkpointed slot only keeps its UTC offset, so the zone comes from the conversation
+        occurrences = recurrence.expand(rule, slot.start_time, slot.end_time, timezone=timezone)
+        # The first meeting is the slot itself, booked even when its day is not in the rule,
+        # and already checked on its own
+        return occurrences, self.calendar_service.find_conflicts(occurrences[1:])
+
+    def _recurrence_note(self, state: AgentState, slot: CalendarSlot) -> str:
+        """", every Tuesday (8 meetings)" plus any clashing dates, or "" for a one-off booking"""
+        rule = state.booking_request.recurrence
+        if not rule:
+            return ""
+        occurrences, conflicts = self._series_conflicts(slot, rule, self._timezone(state))
+        note = f", {recurrence.describe(rule)} ({len(occurrences)} meetings)"
+        if conflicts:
+            dates = ", ".join(start.strftime('%B %d') for start, _ in conflicts)
+            note += (f". {len(conflicts)} of them clash with your calendar and will be skipped: {dates}"
+                     if len(conflicts) > 1 else f". The one on {dates} clashes with your calendar and will be skipped")
+        return note
+
+    def _reset_booking(self, state: AgentState):
+        self.holds.release_holds(self._holder(state))
+        state.booking_request = BookingRequest()
+        state.suggested_slots = []
+        state.confirmed_slot = None
+
+    @staticmethod
+    def _overlaps(slot: CalendarSlot, other: CalendarSlot) -> bool:
+        return slot.start_time < other.end_time and slot.end_time > other.start_time
+
+    @staticmethod
+    def _format_slots(slots: list[CalendarSlot]) -> str:
+        return "\n".join(
+            f"{i+1}. {slot.start_time.strftime('%I:%M %p')} - {slot.end_time.strftime('%I:%M %p')}"
+            for i, slot in enumerate(slots)
+        )
+
+    @staticmethod
+    def _format_slot_time(slot: CalendarSlot) -> str:
+        return slot.start_time.strftime('%A, %B %d at %I:%M %p')
+
+    @staticmethod
+    def _format_date(date_str: str) -> str:
+        """Format date string for display"""
+        try:
+            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+            return date_obj.strftime('%A, %B %d')
+        except (TypeError, ValueError):
+            return date_str
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from models import AgentState, BookingRequest, ConversationState
+from resilience import CircuitBreaker, CircuitOpenError, backoff_delay
+
+
+class BackendUnavailableError(Exception):
+    """Raised when the booking API cannot be reached after retries"""
+
+
+# Statuses where the backend did not process the turn, so a retry is safe
+RETRYABLE_STATUSES = {502, 503, 504}
+
+
+class BookingAPIClient:
+    """HTTP client for the FastAPI booking backend.
+
+    One instance holds a pooled keep-alive `requests.Session` and is meant to
+    be shared by every UI session in the process. `/chat` is not idempotent,
+    so only failures where the request never reached the agent (connection
+    errors, 502/503/504) are retried; read timeouts are surfaced instead.
+    """
+
+    def __init__(self, base_url: str, connect_timeout: float = 3.05, read_timeout: float = 30.0,
+                 max_retries: int = 3, backoff_base: float = 0.2, backoff_cap: float = 5.0,
+                 pool_size: int = 20, breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=15.0)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def chat(self, message: str, session_id: Optional[str] = None, timezone: Optional[str] = None,
+             client_id: Optional[str] = None) -> Dict[str, Any]:
+        """Send one chat turn and return the decoded `ChatResponse`.
+
+        `client_id` names the end user for the API's per-client limits when
+        this process is one of its RATE_LIMIT_TRUSTED_PROXIES.
+        """
+        payload = {"message": message, "session_id": session_id}
+        if timezone:
+            payload["timezone"] = timezone
+        headers = {"X-Client-ID": client_id} if client_id else None
+        return self._request("POST", "/chat", json=payload, headers=headers)
+
+    def schedule_batch(self, requests: List[Dict[str, Any]], start_date: str, end_date: str,
+                       create_events: bool = False, timezone: Optional[str] = None,
+                       batch_id: Optional[str] = None) -> Dict[str, Any]:
+        """Assign slots to many booking requests with `/schedule/batch`.
+
+        A batch id is chosen here when none is given, so a retried request
+        does not create its events twice.
+        """
+        payload = {"requests": requests, "start_date": start_date, "end_date": end_date,
+                   "create_events": create_events, "batch_id": batch_id or uuid.uuid4().hex}
+        if timezone:
+            payload["timezone"] = timezone
+        return self._request("POST", "/schedule/batch", json=payload)
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Booking API circuit open, retry in {self.breaker.retry_after():.0f}s")
+
+        url = f"{self.base_url}{path}"
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                if response.status_code not in RETRYABLE_STATUSES:
+                    response.raise_for_status()
+                    self.breaker.record_success()
+                    return response.json()
+                last_error = requests.HTTPError(f"{response.status_code} from {path}", response=response)
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+            except requests.ConnectionError as e:
+                # Refused/reset connections and connect timeouts: the turn was never delivered
+                last_error = e
+            except requests.HTTPError:
+                # 4xx/500 are answers, not outages; don't trip the breaker
+                self.breaker.record_success()
+                raise
+            except requests.exceptions.ReadTimeout as e:
+                self.breaker.record_failure()
+                raise BackendUnavailableError(f"Booking API timed out: {e}") from e
+
+            if attempt < self.max_retries:
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                if retry_after is not None:
+                    delay = max(delay, min(retry_after, self.backoff_cap))
+                time.sleep(delay)
+
+        self.breaker.record_failure()
+        raise BackendUnavailableError(f"Booking API unavailable: {last_error}")
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def state_from_response(data: Dict[str, Any], state: Optional[AgentState] = None) -> AgentState:
+    """Mirror the server-side conversation state locally for UI display"""
+    state = state or AgentState()
+    state.agent_response = data.get("response", "")
+    state.current_state = ConversationState(data.get("state", ConversationState.GREETING.value))
+    if data.get("booking_request"):
+        state.booking_request = BookingRequest(**data["booking_request"])
+    return state
+
+
+_client: Optional[BookingAPIClient] = None
+_client_lock = threading.Lock()
+
+
+def backend_mode_enabled() -> bool:
+    """True when the UI should call the API instead of running the agent in-process"""
+    return os.getenv("AGENT_BACKEND", "local").lower() == "api"
+
+
+def get_api_client() -> BookingAPIClient:
+    """Process-wide client so all UI sessions share one connection pool"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = BookingAPIClient(
+                    os.getenv("API_BASE_URL", "http://localhost:8000"),
+                    read_timeout=float(os.getenv("API_READ_TIMEOUT", "30")),
+                    max_retries=int(os.getenv("API_MAX_RETRIES", "3")),
+                )
+    return _client
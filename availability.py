@@ -0,0 +1,194 @@
+"""
+Bitmap availability engine.
+
+A search window is laid out as one NumPy array of fixed-size bins
+(AVAILABILITY_RESOLUTION_MINUTES, 5 or 15) starting at local midnight of its
+first day. Busy periods of every calendar are painted into it at once with a
+difference array (+1 at each start bin, -1 at each end bin, then a cumulative
+sum), so free time for all attendees together is simply "no calendar busy".
+Runs of free bins long enough for a meeting come from a second cumulative
+sum: bins i..i+k-1 are all free exactly when cumsum[i+k] - cumsum[i] == k.
+Only the slots found are turned back into datetimes, and parsed busy lists
+are reused across queries, which keeps 100 calendars x 90 days in the low
+milliseconds.
+
+Busy periods are painted outward to whole bins, and candidate slots start on
+bin boundaries, so the answer matches an exact interval overlap check.
+`busy_matrix` keeps one row per calendar instead, for solvers that book
+slots as they go (batch_scheduler.py).
+NumPy is optional: without it `ENABLED` is False and CalendarService keeps
+its per-slot loop.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from timezones import epoch_minutes, from_epoch_minutes, parse_epoch_seconds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+RESOLUTION_MINUTES = int(os.getenv("AVAILABILITY_RESOLUTION_MINUTES", "15"))
+ENABLED = np is not None and os.getenv("AVAILABILITY_BITMAP", "true").lower() != "false"
+
+# Bookable hours and slot spacing, matching CalendarService's per-slot loop
+WORKDAY = (9, 17)
+SLOT_STEP_MINUTES = 60
+
+
+# Parsed busy lists by identity. Cached freebusy lists are never mutated
+# (FreeBusyCache.add_busy swaps in a new list), so identity is a safe key; each
+# entry keeps its list alive, so the id cannot be reused while it is cached.
+_parsed: "OrderedDict[int, tuple]" = OrderedDict()
+_parsed_lock = threading.Lock()
+PARSED_CACHE_SIZE = 4096
+
+
+def busy_epochs(busy_periods: Sequence[dict]) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Starts and ends of Google freebusy periods in epoch seconds; unparsable ones are skipped.
+
+    Results are remembered per list object, so do not mutate a list after passing it in.
+    """
+    with _parsed_lock:
+        cached = _parsed.get(id(busy_periods))
+        if cached is not None and cached[0] is busy_periods:
+            _parsed.move_to_end(id(busy_periods))
+            return cached[1]
+    starts, ends = [], []
+    for busy in busy_periods:
+        try:
+            start, end = parse_epoch_seconds(busy["start"]), parse_epoch_seconds(busy["end"])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Error parsing busy period: %s", e)
+            continue
+        starts.append(start)
+        ends.append(end)
+    epochs = np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+    with _parsed_lock:
+        _parsed[id(busy_periods)] = (busy_periods, epochs)
+        if len(_parsed) > PARSED_CACHE_SIZE:
+            _parsed.popitem(last=False)
+    return epochs
+
+
+class AvailabilityGrid:
+    """Busy counts over whole local days, one bin per `resolution_minutes`"""
+
+    def __init__(self, first_day: date, days: int, timezone, resolution_minutes: int = RESOLUTION_MINUTES):
+        self.first_day = first_day
+        self.days = days
+        self.timezone = timezone
+        self.step = resolution_minutes * 60
+        # Local midnights, each with its own day's offset, so DST days are 23 or 25 hours long
+        self.origin = self._local_epoch(first_day, 0)
+        end = self._local_epoch(first_day + timedelta(days=days), 0)
+        self.size = -(-(end - self.origin) // self.step)
+        # Difference array of busy counts; one extra bin takes ends at the window edge
+        self._delta = np.zeros(self.size + 1, dtype=np.int64)
+
+    def add_busy(self, starts: "np.ndarray", ends: "np.ndarray"):
+        """Paint busy intervals (epoch seconds) of one or more calendars"""
+        if not len(starts):
+            return
+        first, last = self._bins(starts, ends)
+        self._delta += np.bincount(first, minlength=self.size + 1)
+        self._delta -= np.bincount(last, minlength=self.size + 1)
+
+    def busy_matrix(self, epochs_by_calendar: Sequence[Tuple["np.ndarray", "np.ndarray"]]) -> "np.ndarray":
+        """Boolean (calendars x bins) array: True where that calendar is busy.
+
+        Every row is painted in one bincount, each calendar offset by a row of bins.
+        """
+        width = self.size + 1
+        delta = np.zeros(len(epochs_by_calendar) * width, dtype=np.int64)
+        for row, (starts, ends) in enumerate(epochs_by_calendar):
+            if len(starts):
+                first, last = self._bins(starts, ends)
+                delta[row * width:(row + 1) * width] += (np.bincount(first, minlength=width)
+                                                         - np.bincount(last, minlength=width))
+        return np.cumsum(delta.reshape(-1, width)[:, :-1], axis=1) > 0
+
+    def _bins(self, starts: "np.ndarray", ends: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        """First and past-the-end bins of each interval, dropping those outside the grid"""
+        first = np.clip((starts - self.origin) // self.step, 0, self.size)
+        # Ceiling division, so a period ending mid-bin still blocks that bin
+        last = np.clip(-((self.origin - ends) // self.step), 0, self.size)
+        keep = last > first
+        return first[keep], last[keep]
+
+    def free(self) -> "np.ndarray":
+        """Boolean array: True where no calendar is busy"""
+        return np.cumsum(self._delta[:-1]) == 0
+
+    def find_slots(self, duration_minutes: int = 60, step_minutes: int = SLOT_STEP_MINUTES,
+                   workday: Tuple[int, int] = WORKDAY, weekdays_only: bool = True) -> "np.ndarray":
+        """Epoch starts of free `duration_minutes` slots, `step_minutes` apart within working hours"""
+        length = self.length(duration_minutes)
+        if length > self.size:
+            return np.empty(0, dtype=np.int64)
+        candidates = self.candidates(length, step_minutes, workday[0] * 60, workday[1] * 60,
+                                     weekdays_only=weekdays_only)
+        return self.origin + candidates[fits(self.free(), length)[candidates]] * self.step
+
+    def length(self, duration_minutes: int) -> int:
+        """Bins covered by a meeting of `duration_minutes`"""
+        return -(-duration_minutes * 60 // self.step)
+
+    def candidates(self, length: int, step_minutes: int, opens_minute: int, closes_minute: int,
+                   days: Optional[Iterable[date]] = None, weekdays_only: bool = True) -> "np.ndarray":
+        """Start bins of `length`-bin slots, `step_minutes` apart, between two local times of each day"""
+        stride = max(1, step_minutes * 60 // self.step)
+        candidates = []
+        for day in self.dates() if days is None else days:
+            if weekdays_only and day.weekday() >= 5:
+                continue
+            opens = (self._local_epoch(day, opens_minute) - self.origin) // self.step
+            closes = min((self._local_epoch(day, closes_minute) - self.origin) // self.step, self.size)
+            candidates.append(np.arange(max(opens, 0), closes - length + 1, stride, dtype=np.int64))
+        return np.concatenate(candidates) if candidates else np.empty(0, dtype=np.int64)
+
+    def dates(self) -> List[date]:
+        return [self.first_day + timedelta(days=offset) for offset in range(self.days)]
+
+    def _local_epoch(self, day: date, minute: int) -> int:
+        return epoch_minutes(self.timezone, day, minute) * 60
+
+
+def fits(free: "np.ndarray", length: int) -> "np.ndarray":
+    """fits[i] is True when bins i..i+length-1 are all free"""
+    counts = np.concatenate(([0], np.cumsum(free, dtype=np.int64)))
+    return (counts[length:] - counts[:-length]) == length
+
+
+def find_free_slots(start_date: datetime, end_date: datetime, busy_by_calendar: Sequence[Sequence[dict]],
+                    timezone, duration_minutes: int = 60,
+                    resolution_minutes: int = RESOLUTION_MINUTES) -> List[Tuple[datetime, datetime]]:
+    """(start, end) of every working-hours slot in the window when all calendars are free.
+
+    Covers the same days as CalendarService's per-slot loop: from the day of
+    `start_date` through the last day whose working hours start before `end_date`.
+    """
+    first_day = start_date.astimezone(timezone).date()
+    end_minute = end_date.timestamp() / 60
+    days = 0
+    while epoch_minutes(timezone, first_day + timedelta(days=days), WORKDAY[0] * 60) < end_minute:
+        days += 1
+    if not days:
+        return []
+
+    grid = AvailabilityGrid(first_day, days, timezone, resolution_minutes)
+    epochs = [busy_epochs(busy_periods) for busy_periods in busy_by_calendar]
+    if epochs:
+        # Every attendee painted in one pass
+        grid.add_busy(np.concatenate([starts for starts, _ in epochs]),
+                      np.concatenate([ends for _, ends in epochs]))
+    return [(from_epoch_minutes(start, timezone), from_epoch_minutes(start + duration_minutes, timezone))
+            for start in (epoch // 60 for epoch in grid.find_slots(duration_minutes).tolist())]
@@ -0,0 +1,214 @@
+"""
+Batch scheduling: place many meetings in one call.
+
+Each BookingRequest names the calendars that must all be free (`attendees`,
+plus `attendee_email`; the organizer's calendar when neither is given) and
+may constrain the day (`date`), the time of day (`not_before`/`not_after`,
+otherwise working hours) and the preferred start (`time`). Busy periods of
+every calendar involved come from one freebusy fetch over the whole window,
+painted into a calendars x bins matrix (AvailabilityGrid.busy_matrix).
+
+The solver is greedy. Requests with the fewest feasible starts go first,
+and each takes the feasible start closest to its preferred time (else the
+earliest). Its bins are then marked busy for all of its attendees, so later
+requests cannot overlap it. Greedy is not optimal, but tightly constrained
+meetings are placed while they still have room, and dozens of meetings over
+a week solve in milliseconds.
+
+Event ids derive from the batch id and each request's position only. When a
+batch is resent with the same id, requests whose events already exist keep
+their slots (one batched lookup) and only the rest are solved and booked.
+"""
+
+import hashlib
+import logging
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence
+
+import availability
+from calendar_service import CalendarService
+from models import BookingRequest, CalendarSlot, ScheduledBooking
+from nlp_processor import parse_time_of_day
+from timezones import epoch_minutes, from_epoch_minutes
+from tracing import current_span, traced
+
+logger = logging.getLogger(__name__)
+
+# The solver needs NumPy; the per-slot loop has no batch equivalent
+np = availability.np
+AVAILABLE = np is not None
+
+MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "200"))
+MAX_DAYS = int(os.getenv("BATCH_MAX_DAYS", "31"))
+SLOT_STEP_MINUTES = int(os.getenv("BATCH_SLOT_STEP_MINUTES", "30"))
+
+# One request, in bins: attendee rows, meeting length, candidate starts and
+# the preferred start of each candidate's day
+_Problem = namedtuple("_Problem", "rows length candidates targets")
+
+
+class BatchScheduler:
+    """Assigns slots to many booking requests against one freebusy snapshot"""
+
+    def __init__(self, calendar_service: CalendarService, step_minutes: int = SLOT_STEP_MINUTES,
+                 resolution_minutes: int = availability.RESOLUTION_MINUTES):
+        self.calendar_service = calendar_service
+        self.step_minutes = step_minutes
+        self.resolution_minutes = resolution_minutes
+
+    @traced("batch.schedule")
+    def schedule(self, requests: Sequence[BookingRequest], first_day: date, last_day: date,
+                 timezone, batch_id: Optional[str] = None) -> List[ScheduledBooking]:
+        """One assignment per request, in order; raises CalendarUnavailableError when Google cannot answer.
+
+        With the `batch_id` of an earlier attempt, requests already booked by
+        it keep their slots and come back `booked`.
+        """
+        grid = availability.AvailabilityGrid(first_day, (last_day - first_day).days + 1, timezone,
+                                             self.resolution_minutes)
+        calendars_of = [self._calendars(request) for request in requests]
+        calendar_ids = list(dict.fromkeys(calendar_id for ids in calendars_of for calendar_id in ids))
+        rows = {calendar_id: row for row, calendar_id in enumerate(calendar_ids)}
+
+        assignments = [ScheduledBooking(request=request) for request in requests]
+        existing = self.calendar_service.get_events(
+            [event_id(batch_id, position) for position in range(len(requests))]) if batch_id else {}
+
+        start = from_epoch_minutes(epoch_minutes(timezone, first_day, 0), timezone)
+        end = from_epoch_minutes(epoch_minutes(timezone, last_day + timedelta(days=1), 0), timezone)
+        busy_by_calendar = self.calendar_service.get_busy_periods(calendar_ids, start, end)
+        for position, assignment in enumerate(assignments):
+            slot = existing.get(event_id(batch_id, position)) if existing else None
+            if slot is None:
+                continue
+            assignment.slot = CalendarSlot(start_time=slot.start_time.astimezone(timezone),
+                                           end_time=slot.end_time.astimezone(timezone))
+            assignment.event_id, assignment.booked = event_id(batch_id, position), True
+            # Busy for every attendee, whether or not their calendar shows the invitation yet
+            period = {"start": slot.start_time.isoformat(), "end": slot.end_time.isoformat()}
+            for calendar_id in calendars_of[position]:
+                busy_by_calendar[rows[calendar_id]] = [*busy_by_calendar[rows[calendar_id]], period]
+        busy = grid.busy_matrix([availability.busy_epochs(periods) for periods in busy_by_calendar])
+
+        problems: List[Optional[_Problem]] = []
+        for assignment, calendars in zip(assignments, calendars_of):
+            if assignment.booked:
+                problems.append(None)
+                continue
+            try:
+                problems.append(self._problem(grid, assignment.request,
+                                              [rows[calendar_id] for calendar_id in calendars]))
+            except ValueError as error:
+                assignment.reason = str(error)
+                problems.append(None)
+
+        # Most constrained first: fewest feasible starts, then longest
+        order = sorted((index for index, problem in enumerate(problems) if problem is not None),
+                       key=lambda index: (int(self._feasible(busy, problems[index]).sum()),
+                                          -problems[index].length, index))
+        for index in order:
+            problem = problems[index]
+            feasible = self._feasible(busy, problem)
+            if not feasible.any():
+                assignments[index].reason = "No time when every attendee is free"
+                continue
+            candidates, targets = problem.candidates[feasible], problem.targets[feasible]
+            # argmin keeps the first of equally close starts, i.e. the earliest
+            first_bin = int(candidates[np.argmin(np.abs(candidates - targets))])
+            busy[problem.rows, first_bin:first_bin + problem.length] = True
+
+            start_minute = (grid.origin + first_bin * grid.step) // 60
+            duration = assignments[index].request.duration or 60
+            assignments[index].slot = CalendarSlot(start_time=from_epoch_minutes(start_minute, timezone),
+                                                   end_time=from_epoch_minutes(start_minute + duration, timezone))
+
+        scheduled = sum(assignment.slot is not None for assignment in assignments)
+        current_span().set_attributes({"requests": len(requests), "calendars": len(calendar_ids),
+                                       "scheduled": scheduled})
+        logger.info("Batch scheduled", extra={"requests": len(requests), "calendars": len(calendar_ids),
+                                              "scheduled": scheduled})
+        return assignments
+
+    @traced("batch.book")
+    def book(self, assignments: Sequence[ScheduledBooking], batch_id: str):
+        """Create the events of scheduled assignments with batched inserts, filling in `event_id` and `booked`.
+
+        Assignments already `booked` are left alone. An insert whose event id
+        exists (a resend racing the first attempt) counts as booked.
+        """
+        scheduled = [(position, assignment) for position, assignment in enumerate(assignments)
+                     if assignment.slot is not None and not assignment.booked]
+        for position, assignment in scheduled:
+            assignment.event_id = event_id(batch_id, position)
+        results = self.calendar_service.create_events([
+            dict(slot=assignment.slot,
+                 title=assignment.request.title or "Scheduled Meeting",
+                 description=assignment.request.description or "",
+                 attendee_email=assignment.request.attendee_email or "",
+                 attendees=assignment.request.attendees,
+                 event_id=assignment.event_id)
+            for _, assignment in scheduled
+        ])
+        for (_, assignment), booked in zip(scheduled, results):
+            assignment.booked = booked
+
+    def _calendars(self, request: BookingRequest) -> List[str]:
+        calendars = [calendar_id for calendar_id in dict.fromkeys((*request.attendees, request.attendee_email))
+                     if calendar_id]
+        return calendars or [self.calendar_service.calendar_id]
+
+    def _problem(self, grid: "availability.AvailabilityGrid", request: BookingRequest, rows: List[int]) -> _Problem:
+        """Candidate starts for `request`; raises ValueError for constraints that cannot be met"""
+        if request.recurrence:
+            raise ValueError("Recurring meetings cannot be batch scheduled")
+        duration = request.duration or 60
+        if duration <= 0:
+            raise ValueError("duration must be positive")
+        days = grid.dates()
+        if request.date:
+            try:
+                day = datetime.strptime(request.date, "%Y-%m-%d").date()
+            except ValueError:
+                raise ValueError(f"Invalid date {request.date!r}; expected YYYY-MM-DD") from None
+            if day not in days:
+                raise ValueError(f"{request.date} is outside the scheduling window")
+            days = [day]
+        opens = _minute_of_day(request.not_before, "not_before", availability.WORKDAY[0] * 60)
+        closes = _minute_of_day(request.not_after, "not_after", availability.WORKDAY[1] * 60)
+        preferred = _minute_of_day(request.time, "time", None)
+
+        length = grid.length(duration)
+        candidates, targets = [], []
+        for day in days:
+            # Weekends only when asked for by date
+            starts = grid.candidates(length, self.step_minutes, opens, closes, [day], weekdays_only=not request.date)
+            target = starts if preferred is None else \
+                (epoch_minutes(grid.timezone, day, preferred) * 60 - grid.origin) // grid.step
+            candidates.append(starts)
+            targets.append(np.broadcast_to(target, starts.shape))
+        return _Problem(np.array(rows, dtype=np.int64), length,
+                        np.concatenate(candidates), np.concatenate(targets))
+
+    @staticmethod
+    def _feasible(busy: "np.ndarray", problem: _Problem) -> "np.ndarray":
+        """Mask over the problem's candidates: True where every attendee is free for the whole meeting"""
+        if not problem.candidates.size:
+            return problem.candidates.astype(bool)
+        free = ~busy[problem.rows].any(axis=0)
+        return availability.fits(free, problem.length)[problem.candidates]
+
+
+def event_id(batch_id: str, position: int) -> str:
+    """Google event id of the request at `position` in a batch; lowercase hex"""
+    return hashlib.sha1(f"batch|{batch_id}|{position}".encode("utf-8")).hexdigest()
+
+
+def _minute_of_day(value: Optional[str], field: str, default: Optional[int]) -> Optional[int]:
+    if not value:
+        return default
+    minute = parse_time_of_day(value)
+    if minute is None:
+        raise ValueError(f"Invalid {field} {value!r}; expected a time such as 2:00 PM or 14:00")
+    return minute
@@ -0,0 +1,305 @@
+"""
+Load generator for the /chat endpoint.
+
+Drives scripted multi-turn conversations (greeting -> date/time -> slot pick ->
+confirm) against `main.app` in-process, with Google replaced by the seeded
+mock calendar (mock_calendar.py): configurable latency, 5xx and 429 injection,
+and an event store, so booked slots really disappear. By default the mock is
+called in-process through the regular CalendarService code; --calendar http
+serves it over HTTP and goes through googleapiclient as well. Reports latency
+percentiles, throughput per worker and memory growth per 1k sessions, and
+writes JSON so runs can be compared across commits.
+
+Usage (from the repository root):
+
+    python -m benchmarks.load_test --workers 8 --conversations 200 --latency-ms 40
+    python -m benchmarks.load_test --calendar http --error-rate 0.02 --rate-limit-rate 0.05
+    python -m benchmarks.load_test --output results.json --compare baseline.json
+    python -m benchmarks.load_test --url http://localhost:8000   # against a live server
+
+In-process runs turn the API's per-client limits off (rate_limits.py). A live
+server applies them. Run it with RATE_LIMIT_ENABLED=false, or list the load
+generator's address in RATE_LIMIT_TRUSTED_PROXIES. Each conversation sends its
+own X-Client-ID, so the server then counts it as a separate client.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+# Conversation scripts as (phase, message) turns; each worker picks one at random
+CONVERSATIONS = [
+    [("greeting", "Hi, I'd like to schedule a meeting"), ("datetime", "tomorrow at 2 PM"),
+     ("slot_pick", "1"), ("confirm", "yes")],
+    [("greeting", "Can we book a call?"), ("datetime", "friday"), ("datetime", "10 AM"),
+     ("slot_pick", "2"), ("confirm", "yes")],
+    [("greeting", "I want to schedule a discussion next week"), ("datetime", "morning"),
+     ("slot_pick", "1"), ("confirm", "sounds good")],
+    [("datetime", "Schedule a meeting tomorrow at 3 PM"), ("slot_pick", "1"), ("confirm", "confirm")],
+    [("greeting", "hello"), ("datetime", "I need to set up a call on monday afternoon"),
+     ("slot_pick", "3"), ("confirm", "yes")],
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+def install_mock_calendar(args):
+    """Import the app and point its calendar service at a seeded mock Google Calendar"""
+    # Keep checkpoints of the synthetic sessions out of the local database
+    os.environ.setdefault("CHECKPOINT_BACKEND", "memory")
+    # Measure the mock's 429s, not our own client-side throttle
+    os.environ.setdefault("GOOGLE_API_QPS", "1000")
+    # Every virtual user shares one address; measure the app, not the per-client limits
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    import main
+    from mock_calendar import MockCalendarBackend, MockGoogleService, build_http_service, start_server
+
+    backend = MockCalendarBackend(seed=args.seed, calendars=args.calendars,
+                                  latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                  error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    if args.calendar == "http":
+        _, url = start_server(backend)
+        main.calendar_service.service = build_http_service(url)
+    else:
+        main.calendar_service.service = MockGoogleService(backend)
+    main.calendar_service.authenticated = True
+    return main, backend
+
+
+async def run_conversation(client: httpx.AsyncClient, script: List[Tuple[str, str]], results: Dict) -> None:
+    session_id = None
+    final_state = None
+    headers = {"X-Client-ID": uuid.uuid4().hex}
+    for phase, message in script:
+        started = time.perf_counter()
+        try:
+            response = await client.post("/chat", json={"message": message, "session_id": session_id},
+                                         headers=headers)
+            elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                results["errors"] += 1
+                return
+            data = response.json()
+        except httpx.HTTPError:
+            results["errors"] += 1
+            return
+        session_id = data["session_id"]
+        final_state = data["state"]
+        results["latencies"].append(elapsed)
+        results["by_phase"].setdefault(phase, []).append(elapsed)
+    results["conversations"] += 1
+    if final_state == "booking_complete":
+        results["completed_bookings"] += 1
+
+
+async def worker(client: httpx.AsyncClient, queue: asyncio.Queue, rng: random.Random, results: Dict):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        await run_conversation(client, rng.choice(CONVERSATIONS), results)
+
+
+async def run_load(client: httpx.AsyncClient, workers: int, conversations: int, seed: int) -> Dict:
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(conversations):
+        queue.put_nowait(i)
+    results = {"latencies": [], "by_phase": {}, "errors": 0, "conversations": 0, "completed_bookings": 0}
+
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        worker(client, queue, random.Random(seed + i), results) for i in range(workers)
+    ])
+    wall = time.perf_counter() - started
+
+    requests_done = len(results["latencies"])
+    return {
+        "wall_seconds": round(wall, 3),
+        "requests": requests_done,
+        "conversations": results["conversations"],
+        "completed_bookings": results["completed_bookings"],
+        "errors": results["errors"],
+        "throughput_rps": round(requests_done / wall, 2) if wall else 0.0,
+        "throughput_rps_per_worker": round(requests_done / wall / workers, 2) if wall else 0.0,
+        "latency": summarize(results["latencies"]),
+        "latency_by_phase": {name: summarize(values) for name, values in results["by_phase"].items()},
+    }
+
+
+async def measure_session_memory(client: httpx.AsyncClient, app_module, sessions: int) -> Dict:
+    """Create `sessions` fresh sessions and report traced heap growth per 1k"""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    failed = 0
+    for _ in range(sessions):
+        response = await client.post("/chat", json={"message": "Hi, I'd like to schedule a meeting"},
+                                     headers={"X-Client-ID": uuid.uuid4().hex})
+        failed += response.status_code != 200
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    growth = after - before
+    sessions -= failed
+    return {
+        "sessions_created": sessions,
+        "failed": failed,
+        "active_sessions": app_module.checkpointer.thread_count() if app_module else None,
+        "heap_growth_kb": round(growth / 1024, 1),
+        "heap_growth_kb_per_1k_sessions": round(growth / 1024 / sessions * 1000, 1) if sessions else 0.0,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """Human-readable deltas for the headline numbers"""
+    lines = []
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        old, new = baseline["load"]["latency"][key], current["load"]["latency"][key]
+        change = (new - old) / old * 100 if old else 0.0
+        lines.append(f"latency {key}: {old:.2f} -> {new:.2f} ({change:+.1f}%)")
+    old, new = baseline["load"]["throughput_rps"], current["load"]["throughput_rps"]
+    change = (new - old) / old * 100 if old else 0.0
+    lines.append(f"throughput_rps: {old:.1f} -> {new:.1f} ({change:+.1f}%)")
+    if baseline.get("memory") and current.get("memory"):
+        old = baseline["memory"]["heap_growth_kb_per_1k_sessions"]
+        new = current["memory"]["heap_growth_kb_per_1k_sessions"]
+        lines.append(f"heap KB per 1k sessions: {old:.1f} -> {new:.1f}")
+    return lines
+
+
+async def main_async(args) -> Dict:
+    app_module = backend = None
+    if args.url:
+        transport = None
+        base_url = args.url
+    else:
+        app_module, backend = install_mock_calendar(args)
+        transport = httpx.ASGITransport(app=app_module.app)
+        base_url = "http://loadtest"
+
+    limits = httpx.Limits(max_connections=args.workers, max_keepalive_connections=args.workers)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout,
+                                 limits=limits) as client:
+        # Warm up imports, regex compilation and the first graph build
+        await run_conversation(client, CONVERSATIONS[0], {"latencies": [], "by_phase": {}, "errors": 0,
+                                                         "conversations": 0, "completed_bookings": 0})
+        load = await run_load(client, args.workers, args.conversations, args.seed)
+        memory = await measure_session_memory(client, app_module, args.memory_sessions) \
+            if args.memory_sessions else None
+
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "config": {
+            "target": args.url or "in-process",
+            "calendar": None if args.url else args.calendar,
+            "calendars": args.calendars,
+            "workers": args.workers,
+            "conversations": args.conversations,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "seed": args.seed,
+        },
+        "load": load,
+        "memory": memory,
+        "calendar_calls": backend.stats() if backend else None,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the /chat endpoint")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--conversations", type=int, default=200, help="total conversations to run")
+    parser.add_argument("--calendar", choices=("inprocess", "http"), default="inprocess",
+                        help="reach the mock calendar in-process or through googleapiclient over HTTP")
+    parser.add_argument("--calendars", type=int, default=1, help="simulated calendars")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="injected calendar latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="+/- jitter on injected latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calendar calls failing with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="fraction of calendar calls failing with 429")
+    parser.add_argument("--memory-sessions", type=int, default=1000,
+                        help="sessions to create for the memory phase (0 to skip)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--url", help="target a running server instead of main.app in-process")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON results to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = asyncio.run(main_async(args))
+
+    load = results["load"]
+    print(f"{load['requests']} requests, {load['conversations']} conversations "
+          f"({load['completed_bookings']} booked, {load['errors']} errors) in {load['wall_seconds']}s")
+    print(f"throughput: {load['throughput_rps']} req/s ({load['throughput_rps_per_worker']} per worker)")
+    print("latency: p50={p50_ms}ms p95={p95_ms}ms p99={p99_ms}ms".format(**load["latency"]))
+    if results["memory"]:
+        print(f"heap growth: {results['memory']['heap_growth_kb_per_1k_sessions']} KB per 1k sessions"
+              f" ({results['memory']['failed']} session creations failed)")
+    if results["calendar_calls"]:
+        calls = ", ".join(f"{name}={count}" for name, count in sorted(results["calendar_calls"].items()))
+        print(f"calendar calls: {calls}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\nvs baseline:")
+        for line in compare(results, baseline):
+            print(f"  {line}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Micro-benchmarks for the hot paths behind a /chat turn.
+
+Covers NLPProcessor parsing, CalendarService._generate_available_slots over
+0/50/500 busy periods x 1/7/30 days, common availability of 100 calendars
+x 90 days (NumPy bitmap engine), a 50-meeting batch schedule against the
+seeded mock calendar, the per-client rate limiter over 100k clients, and one
+process_message turn of each agent, all on fixed datasets. Output mirrors pytest-benchmark's columns
+(min/median/mean/stddev/rounds) and results can be stored as a baseline and
+compared later to catch regressions.
+
+Usage (from the repository root):
+
+    python -m benchmarks.micro_benchmarks                       # run everything
+    python -m benchmarks.micro_benchmarks -k slots              # filter by name
+    python -m benchmarks.micro_benchmarks --save baseline.json
+    python -m benchmarks.micro_benchmarks --compare baseline.json --threshold 0.15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import pytz
+
+# Fixed datasets so numbers are comparable between runs
+MESSAGES = [
+    "Hi, I'd like to schedule a meeting",
+    "Can we book a call tomorrow at 2 PM?",
+    "What times are available this week?",
+    "I need to set up a discussion on friday afternoon",
+    "yes",
+    "no, a different time please",
+    "the second one",
+    "3",
+    "schedule it for 10:30 AM on 12/15",
+    "Do you have time next week for an appointment?",
+    "sounds good",
+    "I want to talk about the budget on monday morning",
+    "hello there",
+    "book it",
+    "how about 4-5 PM",
+    "let's do 11/02/2026 at 9 AM",
+]
+
+TIME_STRINGS = ["9:00 AM", "2:00 PM", "12:00 PM", "12:30 AM", "10 am", "4:45 PM", "noon", "7 PM"]
+
+WINDOW_START = pytz.UTC.localize(datetime(2025, 1, 6))  # a Monday
+
+
+def make_busy_periods(count: int, days: int, seed: int = 1234) -> List[dict]:
+    """Deterministic busy periods (15-120 min) scattered over working hours"""
+    rng = random.Random(seed + count * 31 + days)
+    periods = []
+    for _ in range(count):
+        day = WINDOW_START + timedelta(days=rng.randrange(days))
+        start = day.replace(hour=8) + timedelta(minutes=rng.randrange(0, 10 * 60, 15))
+        end = start + timedelta(minutes=rng.choice([15, 30, 45, 60, 90, 120]))
+        periods.append({
+            "start": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "end": end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+    return periods
+
+
+class BenchmarkCase:
+    def __init__(self, name: str, func: Callable, setup: Optional[Callable[[], tuple]] = None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+
+
+def _time_batched(func: Callable, min_round_time: float) -> tuple:
+    """Calibrate a loop count so each round is long enough to time reliably"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_round_time or loops >= 1 << 20:
+            return loops, elapsed
+        loops *= 2
+
+
+def run_case(case: BenchmarkCase, min_time: float, min_rounds: int) -> Dict[str, Any]:
+    timings: List[float] = []
+    total = 0.0
+
+    if case.setup is None:
+        loops, _ = _time_batched(case.func, min_round_time=0.005)
+        while total < min_time or len(timings) < min_rounds:
+            started = time.perf_counter()
+            for _ in range(loops):
+                case.func()
+            elapsed = time.perf_counter() - started
+            total += elapsed
+            timings.append(elapsed / loops)
+    else:
+        # Per-call setup (fresh agent state etc.) is excluded from the timing
+        loops = 1
+        while total < min_time or len(timings) < min_rounds:
+            args = case.setup()
+            started = time.perf_counter()
+            case.func(*args)
+            elapsed = time.perf_counter() - started
+            total += elapsed
+            timings.append(elapsed)
+
+    mean = statistics.fmean(timings)
+    return {
+        "name": case.name,
+        "min": min(timings),
+        "max": max(timings),
+        "mean": mean,
+        "median": statistics.median(timings),
+        "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "rounds": len(timings),
+        "iterations": loops,
+        "ops": 1.0 / mean if mean else 0.0,
+    }
+
+
+def build_cases() -> List[BenchmarkCase]:
+    import availability
+    from calendar_service import CalendarService
+    from nlp_processor import NLPProcessor
+    from models import AgentState, ConversationState
+    from slot_holds import MemorySlotHolds
+
+    nlp = NLPProcessor()
+    cases = [
+        BenchmarkCase("nlp.extract_intent", lambda: [nlp.extract_intent(m) for m in MESSAGES]),
+        BenchmarkCase("nlp.extract_datetime_info", lambda: [nlp.extract_datetime_info(m) for m in MESSAGES]),
+        BenchmarkCase("nlp.parse_time_to_hour", lambda: [nlp.parse_time_to_hour(t) for t in TIME_STRINGS]),
+    ]
+
+    # A full client table, so every request also evicts the least recently seen client
+    from rate_limits import ClientRateLimiter, client_key
+    limiter = ClientRateLimiter(rate=1e9, burst=1e9, max_clients=100_000)
+    for index in range(100_000):
+        limiter.acquire(f"ip:10.{index >> 16}.{(index >> 8) & 255}.{index & 255}")
+    scopes = [{"client": (f"192.168.{index >> 8}.{index & 255}", 50000), "headers": [(b"host", b"api")]}
+              for index in range(1000)]
+    cases.append(BenchmarkCase("ratelimit.acquire[clients=100000,requests=1000]",
+                               lambda: [limiter.acquire(client_key(scope)) for scope in scopes]))
+
+    calendar = CalendarService()
+    for busy_count in (0, 50, 500):
+        for days in (1, 7, 30):
+            busy = make_busy_periods(busy_count, days)
+            end = WINDOW_START + timedelta(days=days)
+            cases.append(BenchmarkCase(
+                f"slots.generate[busy={busy_count},days={days}]",
+                lambda busy=busy, end=end: calendar._generate_available_slots(WINDOW_START, end, busy),
+            ))
+    if availability.ENABLED:
+        busy_by_calendar = [make_busy_periods(40, 90, seed=index) for index in range(100)]
+        end = WINDOW_START + timedelta(days=90)
+        cases.append(BenchmarkCase(
+            "slots.common[calendars=100,days=90]",
+            lambda: calendar._bitmap_slots(WINDOW_START, end, busy_by_calendar),
+        ))
+
+        # Dozens of 1:1s over a week; freebusy comes from the cache after the first round
+        from batch_scheduler import BatchScheduler
+        from calendar_service_mock import CalendarService as MockBackedCalendarService
+        from mock_calendar import MockCalendarBackend
+        from models import BookingRequest
+        backend = MockCalendarBackend(seed=1, calendars=20)
+        mock_backed = MockBackedCalendarService(backend=backend)
+        mock_backed.authenticate()
+        scheduler = BatchScheduler(mock_backed)
+        people = backend.calendar_ids
+        one_on_ones = [BookingRequest(title=f"1:1 #{index}", duration=30,
+                                      attendees=[people[index % 20], people[(index * 7 + 3) % 20]])
+                       for index in range(50)]
+        first_day = WINDOW_START.date()
+        cases.append(BenchmarkCase(
+            "batch.schedule[requests=50,calendars=20,days=5]",
+            lambda: scheduler.schedule(one_on_ones, first_day, first_day + timedelta(days=4), pytz.UTC),
+        ))
+
+    # One agent turn: date already known, the time arrives and availability is checked
+    date_str = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    def fresh_state():
+        state = AgentState()
+        state.current_state = ConversationState.UNDERSTANDING_REQUEST
+        state.booking_request.title = "Meeting"
+        state.booking_request.date = date_str
+        return state
+
+    def agent_case(name, agent):
+        def setup():
+            # Each fresh state is a new anonymous conversation holding the slots it is offered;
+            # with the holds of earlier rounds left in place, later rounds would be offered none
+            agent.holds = MemorySlotHolds()
+            return (fresh_state(),)
+
+        def turn(state):
+            state = agent.process_message("around 2 PM", state)
+            assert state.suggested_slots, f"{name}: the turn offered no slots"
+
+        return BenchmarkCase(name, turn, setup=setup)
+
+    from simple_booking_agent import SimpleBookingAgent
+    cases.append(agent_case("agent.simple.process_message", SimpleBookingAgent(calendar)))
+
+    try:
+        from booking_agent import BookingAgent
+    except ImportError:
+        # langgraph not installed; the simple agent still covers the shared hot path
+        BookingAgent = None
+    if BookingAgent is not None:
+        cases.append(agent_case("agent.langgraph.process_message", BookingAgent(calendar)))
+    return cases
+
+
+def compare(results: List[Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Return names whose median regressed by more than `threshold`"""
+    regressions = []
+    print(f"\n{'benchmark':<45} {'baseline':>12} {'current':>12} {'change':>9}")
+    for result in results:
+        old = baseline.get(result["name"])
+        if not old:
+            print(f"{result['name']:<45} {'-':>12} {_fmt(result['median']):>12} {'new':>9}")
+            continue
+        change = (result["median"] - old["median"]) / old["median"] if old["median"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(result["name"])
+            flag = "  REGRESSION"
+        print(f"{result['name']:<45} {_fmt(old['median']):>12} {_fmt(result['median']):>12} "
+              f"{change * 100:>+8.1f}%{flag}")
+    return regressions
+
+
+def _fmt(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.2f} us"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Hot-path micro-benchmarks")
+    parser.add_argument("-k", dest="keyword", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds of timing per benchmark")
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--save", help="write results to this JSON file as a baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative median slowdown that counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    # Keep diagnostic output from the services out of the timings and the table
+    with contextlib.redirect_stdout(io.StringIO()):
+        cases = build_cases()
+    if args.keyword:
+        cases = [case for case in cases if args.keyword in case.name]
+
+    results = []
+    print(f"{'benchmark':<45} {'min':>12} {'median':>12} {'mean':>12} {'stddev':>12} {'rounds':>7}")
+    for case in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_case(case, args.min_time, args.min_rounds)
+        results.append(result)
+        print(f"{case.name:<45} {_fmt(result['min']):>12} {_fmt(result['median']):>12} "
+              f"{_fmt(result['mean']):>12} {_fmt(result['stddev']):>12} {result['rounds']:>7}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "benchmarks": {r["name"]: r for r in results},
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["benchmarks"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
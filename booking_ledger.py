@@ -0,0 +1,86 @@
+"""
+Idempotency keys for bookings.
+
+A booking is keyed by session and slot. Before inserting an event the agent
+claims the key; a second "yes" (double click, retried POST, another worker)
+finds the claim and reports the first attempt's outcome instead of creating
+a duplicate event. The key doubles as the Google event id, so Google itself
+rejects a duplicate insert that slips past the ledger (e.g. across hosts with
+separate session stores).
+
+CompactingSqliteSaver keeps the keys next to the checkpoints of the session;
+MemoryBookingLedger is the in-process equivalent for agents without one.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from models import CalendarSlot
+
+PENDING = "pending"
+BOOKED = "booked"
+
+# A pending claim older than this belongs to a request that died mid-insert
+# and may be taken over
+CLAIM_LEASE_SECONDS = 120.0
+
+
+def booking_key(session_id: Optional[str], slot: CalendarSlot, calendar_id: str = "primary",
+                recurrence: Optional[str] = None) -> str:
+    """Stable key for booking `slot` (or a series starting there) in a session.
+
+    `session_id` is the conversation's hold owner (AgentCore._holder) when it
+    has no session.
+
+    Lowercase hex, so it is also a valid Google Calendar event id.
+    """
+    raw = f"{session_id or ''}|{calendar_id}|{slot.start_time.isoformat()}|{slot.end_time.isoformat()}"
+    if recurrence:
+        raw += f"|{recurrence}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryBookingLedger:
+    """Booking keys held in process memory, bounded by age"""
+
+    def __init__(self, lease_seconds: float = CLAIM_LEASE_SECONDS, max_age: float = 24 * 3600):
+        self.lease_seconds = lease_seconds
+        self.max_age = max_age
+        # Ordered by last update, oldest first, so pruning stops at the first live key
+        self._keys: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim_booking(self, key: str, thread_id: str) -> Optional[str]:
+        """Claim `key` for an insert; returns None if claimed, else the current holder's status"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            held = self._keys.get(key)
+            if held is not None and (held[0] == BOOKED or now - held[1] < self.lease_seconds):
+                return held[0]
+            self._set(key, PENDING, now)
+            return None
+
+    def finish_booking(self, key: str):
+        """Mark the claimed booking as created"""
+        with self._lock:
+            self._set(key, BOOKED, time.time())
+
+    def release_booking(self, key: str):
+        """Drop a claim whose insert did not happen, so the user can try again"""
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def _set(self, key: str, status: str, now: float):
+        self._keys[key] = (status, now)
+        self._keys.move_to_end(key)
+
+    def _prune(self, now: float):
+        while self._keys:
+            key, (_, updated) = next(iter(self._keys.items()))
+            if now - updated <= self.max_age:
+                break
+            del self._keys[key]
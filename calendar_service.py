@@ -1,33 +1,67 @@
+import logging
 import os
-import pickle
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional
-import pytz
+from typing import Dict, List, Optional, Sequence, Tuple
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
+from credential_store import TokenRefresher, build_credential_store
 from models import CalendarSlot
+from metrics import AVAILABILITY_SOURCE
+from tracing import current_span, traced, tracer
+from freebusy_cache import FreeBusyEntry, freebusy_cache
+from google_api import CalendarUnavailableError, discovery_document, google_api, retry_reason
+from resilience import CircuitOpenError, RateLimitedError
+from singleflight import SingleFlight
+from prefetch import ADJACENT_DAYS, prefetcher
+import availability
+import recurrence
+from timezones import CALENDAR_TIMEZONE, epoch_minutes, from_epoch_minutes, get_timezone, parse_epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean Google could not answer a freebusy query right now
+FREEBUSY_ERRORS = (HttpError, OSError, CircuitOpenError, RateLimitedError)
+
+# Google answers freebusy for at most this many calendars per request
+FREEBUSY_MAX_CALENDARS = 50
+
+# Google answers at most this many calls in one batch request
+EVENTS_BATCH_SIZE = 50
+
+# Concurrent identical (calendar, window) queries share one in-flight Google call
+_freebusy_flight = SingleFlight("freebusy")
 
 class CalendarService:
     SCOPES = ['https://www.googleapis.com/auth/calendar']
     
-    def __init__(self, credentials_file: str = "credentials.json", token_file: str = "token.pickle"):
+    def __init__(self, credentials_file: str = "credentials.json", token_file: Optional[str] = None):
         self.credentials_file = credentials_file
-        self.token_file = token_file
+        # JSON token shared by every worker (GOOGLE_CALENDAR_TOKEN_FILE or the keyring)
+        self.credential_store = build_credential_store(token_file)
+        self.token_refresher: Optional[TokenRefresher] = None
+        self.credentials = None
         self.service = None
-        self.timezone = pytz.timezone('UTC')  # Change to your timezone
+        self.timezone = get_timezone(CALENDAR_TIMEZONE)
         self.authenticated = False
+        self.calendar_id = 'primary'
         
     def authenticate(self) -> bool:
         """Authenticate with Google Calendar API"""
-        creds = None
+        api_url = os.getenv("GOOGLE_CALENDAR_API_URL")
+        if api_url:
+            # Local stand-in (python -m mock_calendar): the real client path without Google or OAuth
+            from mock_calendar import build_http_service
+            self.service = build_http_service(api_url)
+            self.authenticated = True
+            logger.info("Using calendar API stand-in at %s", api_url)
+            return True
         
-        # Load existing token
-        if os.path.exists(self.token_file):
-            with open(self.token_file, 'rb') as token:
-                creds = pickle.load(token)
+        # Load existing token; refreshing it is coordinated with the other workers
+        creds = self.credential_store.load(self.SCOPES)
         
         # If no valid credentials, request authorization
         if not creds or not creds.valid:
@@ -35,134 +69,389 @@ class CalendarService:
                 try:
                     creds.refresh(Request())
                 except Exception as e:
-                    print(f"Error refreshing credentials: {e}")
+                    logger.warning("Error refreshing credentials: %s", e)
                     creds = None
             
-            if not creds:
+            if not creds or not creds.valid:
                 if not os.path.exists(self.credentials_file):
-                    print(f"Credentials file {self.credentials_file} not found.")
-                    print("Running in mock mode - using fake calendar data.")
+                    logger.warning("Credentials file %s not found; running in mock mode with fake calendar data",
+                                   self.credentials_file)
                     return False
                 
                 try:
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        self.credentials_file, self.SCOPES)
-                    creds = flow.run_local_server(port=0)
+                    creds = self._authorize()
                 except Exception as e:
-                    print(f"Error during OAuth flow: {e}")
-                    print("Running in mock mode - using fake calendar data.")
+                    logger.error("Error during OAuth flow, running in mock mode: %s", e)
                     return False
-            
-            # Save credentials for next run
-            with open(self.token_file, 'wb') as token:
-                pickle.dump(creds, token)
+                
+                # Save credentials for next run and for the other workers
+                creds = self.credential_store.save(creds)
         
         try:
-            self.service = build('calendar', 'v3', credentials=creds)
+            self.service = build_from_document(discovery_document(), credentials=creds)
+            self.credentials = creds
             # Test the connection
-            self.service.calendarList().list().execute()
+            self._execute("calendarList.list", self.service.calendarList().list())
             self.authenticated = True
-            print("Successfully authenticated with Google Calendar!")
+            self._start_token_refresher(creds)
+            logger.info("Authenticated with Google Calendar")
             return True
         except Exception as e:
-            print(f"Error building calendar service: {e}")
-            print("Running in mock mode - using fake calendar data.")
+            logger.error("Error building calendar service, running in mock mode: %s", e)
             return False
     
+    def _authorize(self):
+        """Run the OAuth consent flow for new credentials"""
+        flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, self.SCOPES)
+        return flow.run_local_server(port=0)
+    
+    def _start_token_refresher(self, creds):
+        """Refresh the token in the background before it expires, off the request path"""
+        if self.token_refresher is not None:
+            self.token_refresher.stop()
+        if hasattr(creds, "sync"):
+            self.token_refresher = TokenRefresher(creds).start()
+    
+    def after_fork(self):
+        """Give a forked worker its own Google connections and token refresher thread"""
+        if self.credentials is not None and self.service is not None:
+            self.service = build_from_document(discovery_document(), credentials=self.credentials)
+        if self.token_refresher is not None:
+            self._start_token_refresher(self.token_refresher.credentials)
+    
+    def close(self):
+        if self.token_refresher is not None:
+            self.token_refresher.stop()
+    
+    def _execute(self, method: str, request, idempotent: bool = True, throttle_wait: Optional[float] = None):
+        """Execute a Google API request through the shared rate limiter, retries and breaker"""
+        return google_api.execute(method, request, idempotent=idempotent, throttle_wait=throttle_wait)
+    
+    @traced("calendar.get_availability")
     def get_availability(self, start_date: datetime, end_date: datetime) -> List[CalendarSlot]:
-        """Get available time slots between start_date and end_date"""
+        """Get available time slots between start_date and end_date.
+
+        When Google cannot be reached, slots are computed from the last cached
+        freebusy data and flagged `stale`; mock data is only used when no
+        calendar is connected. Raises CalendarUnavailableError when neither works.
+        """
         if not self.authenticated:
-            return self._get_mock_availability(start_date, end_date)
+            return self._mock_availability(start_date, end_date)
         
+        start_date, end_date = self._localize(start_date), self._localize(end_date)
         try:
-            # Convert to timezone-aware if needed
-            if start_date.tzinfo is None:
-                start_date = self.timezone.localize(start_date)
-            if end_date.tzinfo is None:
-                end_date = self.timezone.localize(end_date)
+            busy_periods = self._busy_periods(start_date, end_date)
+        except FREEBUSY_ERRORS as error:
+            return self._stale_availability(start_date, end_date, error)
+        return self._slots_from_busy(start_date, end_date, busy_periods)
+    
+    async def get_availability_async(self, start_date: datetime, end_date: datetime) -> List[CalendarSlot]:
+        """Asyncio counterpart of get_availability; the Google call runs in the default executor"""
+        with tracer.start_span("calendar.get_availability", {"async": True}):
+            if not self.authenticated:
+                return self._mock_availability(start_date, end_date)
             
-            # Get busy periods
+            start_date, end_date = self._localize(start_date), self._localize(end_date)
+            try:
+                busy_periods = await self._busy_periods_async(start_date, end_date)
+            except FREEBUSY_ERRORS as error:
+                return self._stale_availability(start_date, end_date, error)
+            return self._slots_from_busy(start_date, end_date, busy_periods)
+    
+    @traced("calendar.get_common_availability")
+    def get_common_availability(self, calendar_ids: Sequence[str], start_date: datetime, end_date: datetime,
+                                duration_minutes: int = 60) -> List[CalendarSlot]:
+        """Slots of `duration_minutes` when every calendar in `calendar_ids` is free.
+
+        Busy periods come from the fresh cache where possible and otherwise from
+        one freebusy request per FREEBUSY_MAX_CALENDARS calendars. Raises
+        CalendarUnavailableError when Google cannot answer.
+        """
+        if not self.authenticated or not self.service:
+            return self._mock_availability(start_date, end_date)
+        
+        start_date, end_date = self._localize(start_date), self._localize(end_date)
+        try:
+            busy_by_calendar = self._busy_periods_many(calendar_ids, start_date, end_date)
+        except FREEBUSY_ERRORS as error:
+            raise CalendarUnavailableError(str(error)) from error
+        if availability.ENABLED:
+            slots = self._bitmap_slots(start_date, end_date, busy_by_calendar, duration_minutes)
+        else:
+            merged = [busy for periods in busy_by_calendar for busy in periods]
+            slots = self._generate_available_slots(start_date, end_date, merged, duration_minutes)
+        current_span().set_attributes({"calendars": len(calendar_ids), "slots": len(slots)})
+        return slots
+    
+    def get_busy_periods(self, calendar_ids: Sequence[str], start_date: datetime,
+                         end_date: datetime) -> List[List[dict]]:
+        """Freebusy periods of each calendar over the window, in `calendar_ids` order.
+
+        In mock mode every calendar is free. Raises CalendarUnavailableError
+        when Google cannot answer.
+        """
+        if not self.authenticated:
+            return [[] for _ in calendar_ids]
+        try:
+            return self._busy_periods_many(calendar_ids, self._localize(start_date), self._localize(end_date))
+        except FREEBUSY_ERRORS as error:
+            raise CalendarUnavailableError(str(error)) from error
+    
+    def _busy_periods_many(self, calendar_ids: Sequence[str], start_date: datetime,
+                           end_date: datetime) -> List[List[dict]]:
+        """Busy periods of each calendar, in `calendar_ids` order"""
+        busy = {}
+        missing = []
+        for calendar_id in dict.fromkeys(calendar_ids):
+            cached = freebusy_cache.get_fresh(calendar_id, start_date, end_date)
+            if cached is not None:
+                busy[calendar_id] = cached.busy
+            else:
+                missing.append(calendar_id)
+        
+        for index in range(0, len(missing), FREEBUSY_MAX_CALENDARS):
+            chunk = missing[index:index + FREEBUSY_MAX_CALENDARS]
+            started = time.perf_counter()
             body = {
                 "timeMin": start_date.isoformat(),
                 "timeMax": end_date.isoformat(),
-                "items": [{"id": "primary"}]
+                "items": [{"id": calendar_id} for calendar_id in chunk]
             }
-            
-            freebusy_result = self.service.freebusy().query(body=body).execute()
-            busy_periods = freebusy_result.get('calendars', {}).get('primary', {}).get('busy', [])
-            
-            # Generate available slots
-            available_slots = self._generate_available_slots(start_date, end_date, busy_periods)
-            return available_slots
-            
-        except HttpError as error:
-            print(f'Calendar API error: {error}')
-            return self._get_mock_availability(start_date, end_date)
+            result = self._execute("freebusy.query", self.service.freebusy().query(body=body))
+            fetch_seconds = time.perf_counter() - started
+            for calendar_id in chunk:
+                calendar = result.get('calendars', {}).get(calendar_id, {})
+                if calendar.get('errors'):
+                    # An unreadable calendar would otherwise look completely free
+                    reason = calendar['errors'][0].get('reason', 'unknown')
+                    raise CalendarUnavailableError(f"No free/busy data for {calendar_id}: {reason}")
+                busy[calendar_id] = freebusy_cache.put(calendar_id, start_date, end_date, calendar.get('busy', []),
+                                                       fetch_seconds=fetch_seconds).busy
+        return [busy[calendar_id] for calendar_id in calendar_ids]
+    
+    def _busy_periods(self, start_date: datetime, end_date: datetime) -> List[dict]:
+        """Busy periods from a fresh (often prefetched) cache entry, else a coalesced Google query"""
+        key = (self.calendar_id, start_date, end_date)
+        cached = freebusy_cache.get_fresh(*key)
+        if cached is not None:
+            prefetcher.record_hit(cached)
+            return cached.busy
+        joined = _freebusy_flight.in_flight(key)
+        started = time.perf_counter()
+        entry = _freebusy_flight.do(key, lambda: self._query_freebusy(start_date, end_date))
+        prefetcher.record_miss(entry if joined else None, time.perf_counter() - started)
+        return entry.busy
+    
+    async def _busy_periods_async(self, start_date: datetime, end_date: datetime) -> List[dict]:
+        key = (self.calendar_id, start_date, end_date)
+        cached = freebusy_cache.get_fresh(*key)
+        if cached is not None:
+            prefetcher.record_hit(cached)
+            return cached.busy
+        joined = _freebusy_flight.in_flight(key)
+        started = time.perf_counter()
+        entry = await _freebusy_flight.do_async(key, lambda: self._query_freebusy(start_date, end_date))
+        prefetcher.record_miss(entry if joined else None, time.perf_counter() - started)
+        return entry.busy
+    
+    def prefetch_availability(self, date_str: str, timezone=None):
+        """Warm the freebusy cache for `date_str` (a day in `timezone`, default the calendar's) and its neighbours"""
+        if not self.authenticated or not self.service:
+            return
+        try:
+            requested_date = datetime.strptime(date_str, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return
+        
+        timezone = timezone or self.timezone
+        today = datetime.now(timezone).date()
+        # Requested day first, then its neighbours
+        for offset in sorted(range(-ADJACENT_DAYS, ADJACENT_DAYS + 1), key=abs):
+            day = requested_date + timedelta(days=offset)
+            if day.date() < today:
+                continue
+            # Same window the agents query for a day
+            start_date = timezone.localize(day.replace(hour=0, minute=0, second=0))
+            end_date = timezone.localize(day.replace(hour=23, minute=59, second=59))
+            key = (self.calendar_id, start_date, end_date)
+            if _freebusy_flight.in_flight(key) or freebusy_cache.get(*key, max_age=freebusy_cache.fresh_ttl):
+                prefetcher.skip()
+                continue
+            prefetcher.submit(lambda key=key, start_date=start_date, end_date=end_date: _freebusy_flight.do(
+                key, lambda: self._query_freebusy(start_date, end_date, prefetched=True)
+            ))
+    
+    def is_slot_free(self, slot: CalendarSlot) -> bool:
+        """Re-check a slot just before booking it.
+
+        Answered from a fresh cache entry when there is one, else by a freebusy
+        query for just the slot. If Google cannot be reached the slot is
+        assumed free; the insert then reports that failure itself.
+        """
+        if not self.authenticated or not self.service:
+            return True
+        start_time, end_time = self._localize(slot.start_time), self._localize(slot.end_time)
+        try:
+            busy_periods = self._busy_periods(start_time, end_time)
+        except FREEBUSY_ERRORS as error:
+            logger.warning("Could not re-check slot before booking: %s", error)
+            return True
+        return not self._is_time_busy(start_time, end_time, busy_periods)
+    
+    def find_conflicts(self, occurrences: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+        """The occurrences of a series that clash with the calendar.
+
+        One freebusy query covers the whole series; each occurrence is then a
+        binary search in an IntervalIndex. Like is_slot_free, reports no
+        clashes when Google cannot be reached.
+        """
+        if not occurrences or not self.authenticated or not self.service:
+            return []
+        start_date = self._localize(min(start for start, _ in occurrences))
+        end_date = self._localize(max(end for _, end in occurrences))
+        try:
+            busy_periods = self._busy_periods(start_date, end_date)
+        except FREEBUSY_ERRORS as error:
+            logger.warning("Could not check recurring occurrences: %s", error)
+            return []
+        index = recurrence.IntervalIndex(self._busy_seconds(busy_periods))
+        return [(start, end) for start, end in occurrences if index.overlaps(start.timestamp(), end.timestamp())]
+    
+    def _localize(self, value: datetime) -> datetime:
+        """Convert to timezone-aware if needed"""
+        return self.timezone.localize(value) if value.tzinfo is None else value
+    
+    def _mock_availability(self, start_date: datetime, end_date: datetime) -> List[CalendarSlot]:
+        slots = self._get_mock_availability(start_date, end_date)
+        current_span().set_attributes({"calendar.source": "mock", "slots": len(slots)})
+        AVAILABILITY_SOURCE.labels("mock").inc()
+        return slots
+    
+    def _stale_availability(self, start_date: datetime, end_date: datetime, error: Exception) -> List[CalendarSlot]:
+        """Answer from the last cached freebusy data, or raise CalendarUnavailableError"""
+        cached = freebusy_cache.get_stale(self.calendar_id, start_date, end_date)
+        if cached is None:
+            logger.error("Google Calendar unavailable and no cached freebusy data: %s", error)
+            current_span().set_attribute("calendar.source", "unavailable")
+            AVAILABILITY_SOURCE.labels("unavailable").inc()
+            raise CalendarUnavailableError(str(error)) from error
+        logger.warning("Google Calendar unavailable, serving cached freebusy data", extra={
+            "error": str(error), "cache_age_s": round(cached.age),
+        })
+        as_of = datetime.fromtimestamp(cached.fetched_at, self.timezone)
+        return self._slots_from_busy(start_date, end_date, cached.busy, as_of)
+    
+    def _slots_from_busy(self, start_date: datetime, end_date: datetime, busy_periods: List[dict],
+                         as_of: Optional[datetime] = None) -> List[CalendarSlot]:
+        available_slots = self._generate_available_slots(start_date, end_date, busy_periods)
+        if as_of is not None:
+            for slot in available_slots:
+                slot.stale = True
+                slot.as_of = as_of
+        source = "google" if as_of is None else "stale_cache"
+        current_span().set_attributes({"calendar.source": source, "busy_periods": len(busy_periods),
+                                       "slots": len(available_slots)})
+        AVAILABILITY_SOURCE.labels(source).inc()
+        return available_slots
+    
+    def _query_freebusy(self, start_date: datetime, end_date: datetime, prefetched: bool = False) -> FreeBusyEntry:
+        """Fetch busy periods from Google and cache them for reuse and stale fallback.
+
+        Prefetches never wait for a rate-limiter token, so they cannot delay user requests.
+        """
+        started = time.perf_counter()
+        body = {
+            "timeMin": start_date.isoformat(),
+            "timeMax": end_date.isoformat(),
+            "items": [{"id": self.calendar_id}]
+        }
+        freebusy_result = self._execute("freebusy.query", self.service.freebusy().query(body=body),
+                                        throttle_wait=0 if prefetched else None)
+        busy_periods = freebusy_result.get('calendars', {}).get(self.calendar_id, {}).get('busy', [])
+        return freebusy_cache.put(self.calendar_id, start_date, end_date, busy_periods,
+                                  fetch_seconds=time.perf_counter() - started, prefetched=prefetched)
     
     def _get_mock_availability(self, start_date: datetime, end_date: datetime) -> List[CalendarSlot]:
         """Generate mock availability for demo purposes"""
-        print("Using mock calendar data")
+        logger.debug("Using mock calendar data")
         slots = []
         
-        # Ensure timezone awareness
-        if start_date.tzinfo is None:
-            start_date = self.timezone.localize(start_date)
-        if end_date.tzinfo is None:
-            end_date = self.timezone.localize(end_date)
-        
-        current = start_date.replace(hour=9, minute=0, second=0, microsecond=0)
+        # Calendar-local days and hours, computed in epoch minutes (see timezones.py)
+        day = self._localize(start_date).astimezone(self.timezone).date()
+        end_minute = self._localize(end_date).timestamp() / 60
         
-        while current < end_date:
+        while epoch_minutes(self.timezone, day, 9 * 60) < end_minute:
             # Skip weekends
-            if current.weekday() < 5:  # Monday = 0, Friday = 4
+            if day.weekday() < 5:  # Monday = 0, Friday = 4
                 # Generate slots from 9 AM to 5 PM
                 for hour in range(9, 17):
-                    slot_start = current.replace(hour=hour)
-                    slot_end = slot_start + timedelta(hours=1)
+                    slot_start = epoch_minutes(self.timezone, day, hour * 60)
                     
                     # Simulate some busy periods (lunch time and random busy slots)
                     is_busy = (
                         hour in [12, 13] or  # Lunch break
-                        (hour == 10 and current.day % 3 == 0) or  # Some 10 AM slots busy
-                        (hour == 15 and current.day % 2 == 0)     # Some 3 PM slots busy
+                        (hour == 10 and day.day % 3 == 0) or  # Some 10 AM slots busy
+                        (hour == 15 and day.day % 2 == 0)     # Some 3 PM slots busy
                     )
                     
                     if not is_busy:
-                        slots.append(CalendarSlot(
-                            start_time=slot_start,
-                            end_time=slot_end,
-                            available=True
-                        ))
+                        slots.append(self._slot(slot_start, slot_start + 60))
             
-            current += timedelta(days=1)
+            day += timedelta(days=1)
         
         return slots
     
-    def _generate_available_slots(self, start_date: datetime, end_date: datetime, busy_periods: List[dict]) -> List[CalendarSlot]:
+    def _generate_available_slots(self, start_date: datetime, end_date: datetime, busy_periods: List[dict],
+                                  duration_minutes: int = 60) -> List[CalendarSlot]:
         """Generate available slots excluding busy periods"""
+        if availability.ENABLED:
+            return self._bitmap_slots(start_date, end_date, [busy_periods], duration_minutes)
+        
         slots = []
-        current = start_date.replace(hour=9, minute=0, second=0, microsecond=0)
+        busy = self._busy_seconds(busy_periods)
+        # Calendar-local days and hours, computed in epoch minutes (see timezones.py)
+        day = self._localize(start_date).astimezone(self.timezone).date()
+        end_minute = self._localize(end_date).timestamp() / 60
         
-        while current < end_date:
-            if current.weekday() < 5:  # Weekdays only
+        while epoch_minutes(self.timezone, day, 9 * 60) < end_minute:
+            if day.weekday() < 5:  # Weekdays only
+                closes = epoch_minutes(self.timezone, day, 17 * 60)
                 for hour in range(9, 17):  # 9 AM to 5 PM
-                    slot_start = current.replace(hour=hour)
-                    slot_end = slot_start + timedelta(hours=1)
+                    slot_start = epoch_minutes(self.timezone, day, hour * 60)
+                    slot_end = slot_start + duration_minutes
+                    if slot_end > closes:
+                        break
                     
                     # Check if slot conflicts with busy periods
-                    is_available = not self._is_time_busy(slot_start, slot_end, busy_periods)
-                    
-                    if is_available:
-                        slots.append(CalendarSlot(
-                            start_time=slot_start,
-                            end_time=slot_end,
-                            available=True
-                        ))
+                    if not any(start < slot_end * 60 and end > slot_start * 60 for start, end in busy):
+                        slots.append(self._slot(slot_start, slot_end))
             
-            current += timedelta(days=1)
+            day += timedelta(days=1)
         
         return slots
     
+    def _slot(self, start_minute: int, end_minute: int) -> CalendarSlot:
+        return CalendarSlot(start_time=from_epoch_minutes(start_minute, self.timezone),
+                            end_time=from_epoch_minutes(end_minute, self.timezone), available=True)
+    
+    @staticmethod
+    def _busy_seconds(busy_periods: List[dict]) -> List[Tuple[int, int]]:
+        """Busy periods as epoch-second intervals"""
+        busy = []
+        for period in busy_periods:
+            try:
+                busy.append((parse_epoch_seconds(period['start']), parse_epoch_seconds(period['end'])))
+            except (ValueError, KeyError) as e:
+                logger.warning("Error parsing busy period: %s", e)
+        return busy
+    
+    def _bitmap_slots(self, start_date: datetime, end_date: datetime, busy_by_calendar: Sequence[List[dict]],
+                      duration_minutes: int = 60) -> List[CalendarSlot]:
+        """Slots when every calendar is free, from the NumPy bitmap engine"""
+        return [CalendarSlot(start_time=start, end_time=end, available=True)
+                for start, end in availability.find_free_slots(start_date, end_date, busy_by_calendar,
+                                                               self.timezone, duration_minutes)]
+    
     def _is_time_busy(self, start_time: datetime, end_time: datetime, busy_periods: List[dict]) -> bool:
         """Check if a time slot conflicts with busy periods"""
         for busy in busy_periods:
@@ -174,43 +463,178 @@ class CalendarService:
                 if start_time < busy_end and end_time > busy_start:
                     return True
             except (ValueError, KeyError) as e:
-                print(f"Error parsing busy period: {e}")
+                logger.warning("Error parsing busy period: %s", e)
                 continue
         
         return False
     
-    def create_event(self, slot: CalendarSlot, title: str, description: str = "", attendee_email: str = "") -> bool:
-        """Create a calendar event"""
+    @traced("calendar.create_event")
+    def create_event(self, slot: CalendarSlot, title: str, description: str = "", attendee_email: str = "",
+                     event_id: Optional[str] = None, rrule: Optional[str] = None,
+                     exclude: Sequence[datetime] = (), attendees: Sequence[str] = (), timezone=None) -> bool:
+        """Create a calendar event.
+        
+        `event_id` makes the insert idempotent: Google rejects a second event
+        with the same id, which is reported as success. With `rrule` the event
+        is one recurring series starting at `slot`, minus the occurrences
+        starting at `exclude`, repeating in `timezone` (a pytz zone; default the
+        slot's zone, else the calendar's). `attendees` are invited along with
+        `attendee_email`.
+        """
         if not self.authenticated:
-            print(f"MOCK BOOKING: {title}")
-            print(f"Time: {slot.start_time.strftime('%A, %B %d at %I:%M %p')}")
-            if description:
-                print(f"Description: {description}")
-            if attendee_email:
-                print(f"Attendee: {attendee_email}")
+            logger.info("Mock booking created", extra={
+                "title": title,
+                "start": slot.start_time.isoformat(),
+                "attendee": attendee_email or None,
+                "recurrence": rrule,
+            })
             return True
         
         try:
-            event = {
-                'summary': title,
-                'description': description,
-                'start': {
-                    'dateTime': slot.start_time.isoformat(),
-                    'timeZone': str(self.timezone),
-                },
-                'end': {
-                    'dateTime': slot.end_time.isoformat(),
-                    'timeZone': str(self.timezone),
-                },
-            }
+            event = self._event_body(slot, title, description, attendee_email, event_id, rrule, exclude, attendees,
+                                     timezone)
+            request = self.service.events().insert(calendarId=self.calendar_id, body=event)
+            # With a client-chosen id a repeated insert cannot duplicate the event, so it may be retried
+            result = self._execute("events.insert", request, idempotent=event_id is not None)
+            logger.info("Event created", extra={"event_id": result.get("id"), "html_link": result.get("htmlLink")})
             
-            if attendee_email:
-                event['attendees'] = [{'email': attendee_email}]
+        except HttpError as error:
+            if not (event_id and error.resp.status == 409):
+                logger.error("Error creating event: %s", error)
+                return False
+            # An earlier attempt with this id already created the event
+            logger.info("Event already exists", extra={"event_id": event_id})
+        except (OSError, CircuitOpenError, RateLimitedError) as error:
+            logger.error("Error creating event: %s", error)
+            return False
+        
+        self._remember_busy(slot, rrule, exclude, timezone)
+        return True
+    
+    def create_events(self, bookings: Sequence[dict]) -> List[bool]:
+        """Create several events with batched inserts, EVENTS_BATCH_SIZE per request.
+        
+        Each item holds create_event's keyword arguments, including an
+        `event_id`, so a batch may be resent. Inserts Google throttled or
+        failed within a batch are retried one at a time through create_event.
+        """
+        if not self.authenticated:
+            return [self.create_event(**booking) for booking in bookings]
+        
+        results = [False] * len(bookings)
+        for first in range(0, len(bookings), EVENTS_BATCH_SIZE):
+            chunk = range(first, min(first + EVENTS_BATCH_SIZE, len(bookings)))
+            errors = {}
             
-            result = self.service.events().insert(calendarId='primary', body=event).execute()
-            print(f"Event created: {result.get('htmlLink')}")
-            return True
+            def collect(request_id, response, exception):
+                errors[int(request_id)] = exception
             
-        except HttpError as error:
-            print(f'Error creating event: {error}')
-            return False
\ No newline at end of file
+            batch = self.service.new_batch_http_request(callback=collect)
+            for index in chunk:
+                body = self._event_body(**bookings[index])
+                batch.add(self.service.events().insert(calendarId=self.calendar_id, body=body), request_id=str(index))
+            try:
+                # Every insert carries its own id, so resending the whole batch is safe
+                self._execute("events.batchInsert", batch)
+            except (HttpError, OSError, CircuitOpenError, RateLimitedError) as error:
+                logger.error("Error creating events in batch: %s", error)
+                continue
+            
+            for index in chunk:
+                error = errors.get(index)
+                if error is not None and retry_reason(error) is not None:
+                    results[index] = self.create_event(**bookings[index])
+                    continue
+                if error is not None and not (isinstance(error, HttpError) and error.resp.status == 409):
+                    logger.error("Error creating event: %s", error)
+                    continue
+                booking = bookings[index]
+                self._remember_busy(booking["slot"], booking.get("rrule"), booking.get("exclude", ()),
+                                    booking.get("timezone"))
+                results[index] = True
+        logger.info("Events created in batch", extra={"events": len(bookings), "created": sum(results)})
+        return results
+    
+    def get_events(self, event_ids: Sequence[str]) -> Dict[str, CalendarSlot]:
+        """Slots of the events that exist among `event_ids`, with batched gets.
+        
+        In mock mode no event is stored, so none exist. Raises
+        CalendarUnavailableError when Google cannot answer.
+        """
+        if not self.authenticated:
+            return {}
+        found: Dict[str, CalendarSlot] = {}
+        for first in range(0, len(event_ids), EVENTS_BATCH_SIZE):
+            errors = {}
+            
+            def collect(request_id, response, exception):
+                if exception is not None:
+                    errors[request_id] = exception
+                elif response.get('status') != 'cancelled':
+                    found[request_id] = CalendarSlot(
+                        start_time=datetime.fromisoformat(response['start']['dateTime'].replace('Z', '+00:00')),
+                        end_time=datetime.fromisoformat(response['end']['dateTime'].replace('Z', '+00:00')))
+            
+            batch = self.service.new_batch_http_request(callback=collect)
+            for event_id in event_ids[first:first + EVENTS_BATCH_SIZE]:
+                batch.add(self.service.events().get(calendarId=self.calendar_id, eventId=event_id),
+                          request_id=event_id)
+            try:
+                self._execute("events.batchGet", batch)
+            except FREEBUSY_ERRORS as error:
+                raise CalendarUnavailableError(str(error)) from error
+            for error in errors.values():
+                if not (isinstance(error, HttpError) and error.resp.status in (404, 410)):
+                    raise CalendarUnavailableError(str(error))
+        return found
+    
+    def _event_body(self, slot: CalendarSlot, title: str, description: str = "", attendee_email: str = "",
+                    event_id: Optional[str] = None, rrule: Optional[str] = None,
+                    exclude: Sequence[datetime] = (), attendees: Sequence[str] = (), timezone=None) -> dict:
+        # A series repeats at the same wall time in the zone the slot was offered in
+        timezone = self._series_zone(slot, timezone)
+        start, end = self._localize(slot.start_time).astimezone(timezone), self._localize(slot.end_time).astimezone(timezone)
+        event = {
+            'summary': title,
+            'description': description,
+            'start': {
+                'dateTime': start.isoformat(),
+                'timeZone': timezone.zone,
+            },
+            'end': {
+                'dateTime': end.isoformat(),
+                'timeZone': timezone.zone,
+            },
+        }
+        
+        if event_id:
+            event['id'] = event_id
+        if rrule:
+            rrule = recurrence.calendar_rule(rrule, start)
+            event['recurrence'] = [f"RRULE:{rrule}"] + ([recurrence.exdate(exclude)] if exclude else [])
+        emails = [email for email in dict.fromkeys((attendee_email, *attendees)) if email]
+        if emails:
+            event['attendees'] = [{'email': email} for email in emails]
+        return event
+    
+    def _series_zone(self, slot: CalendarSlot, timezone=None):
+        """`timezone`, else the slot's own pytz zone, else the calendar's.
+
+        A slot restored from a checkpoint only has a fixed UTC offset, which
+        would not follow DST.
+        """
+        if timezone is not None:
+            return timezone
+        zone = slot.start_time.tzinfo
+        return zone if getattr(zone, 'zone', None) else self.timezone
+    
+    def _remember_busy(self, slot: CalendarSlot, rrule: Optional[str] = None, exclude: Sequence[datetime] = (),
+                       timezone=None):
+        """Later checks must see a new event before the cached window expires"""
+        occurrences = (recurrence.expand(rrule, self._localize(slot.start_time), self._localize(slot.end_time),
+                                         timezone=self._series_zone(slot, timezone))
+                       if rrule else [(self._localize(slot.start_time), self._localize(slot.end_time))])
+        skipped = {start.timestamp() for start in exclude}
+        for start, end in occurrences:
+            if start.timestamp() not in skipped:
+                freebusy_cache.add_busy(self.calendar_id, start, end)
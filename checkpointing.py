@@ -0,0 +1,245 @@
+"""
+Persistent LangGraph checkpoints for conversations, keyed by session_id.
+
+The LangGraph agent checkpoints its state after every step, so any worker can
+resume any conversation after a restart or behind a load balancer, and the
+API only needs the session_id. Checkpoints are compacted as they are written:
+only the latest CHECKPOINT_KEEP per session are kept, and the agent trims the
+message history it stores (CHECKPOINT_MAX_MESSAGES).
+
+Select the backend with CHECKPOINT_BACKEND:
+  - "sqlite" (default): a local database at CHECKPOINT_DB
+  - "memory": SQLite in memory, for tests and single-process demos
+  - "package.module:factory": a callable returning a saver, for a remote store
+    shared by all workers. The saver must subclass LangGraph's
+    BaseCheckpointSaver and also implement the session methods of
+    CompactingSqliteSaver (delete_thread, thread_count, delete_idle and the
+    booking-key methods claim_booking, finish_booking, release_booking and
+    the slot-hold methods hold_slots, release_holds, hold_count).
+
+Booking idempotency keys (see booking_ledger) and slot holds (see slot_holds)
+live in the same store, so every worker sees what the others have claimed.
+"""
+
+import importlib
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Sequence
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from booking_ledger import BOOKED, CLAIM_LEASE_SECONDS, PENDING
+from slot_holds import HOLD_SECONDS, MAX_HOLD_LENGTH, Interval, count_holds
+
+SESSION_METHODS = ("delete_thread", "thread_count", "delete_idle",
+                   "claim_booking", "finish_booking", "release_booking",
+                   "hold_slots", "release_holds", "hold_count")
+
+
+class CompactingSqliteSaver(SqliteSaver):
+    """SqliteSaver that keeps only the newest `keep` checkpoints per thread.
+
+    Also tracks when each thread was last written so idle sessions can be expired,
+    and holds the booking idempotency keys and slot holds of each thread.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, keep: int = 1, lease_seconds: float = CLAIM_LEASE_SECONDS):
+        super().__init__(conn)
+        self.keep = max(1, keep)
+        self.lease_seconds = lease_seconds
+        # One shared connection serves the whole threadpool
+        self.lock = threading.RLock()
+        # Database file, for reconnecting after a fork; "" for an in-memory database
+        self.path = conn.execute("PRAGMA database_list").fetchone()[2]
+
+    def after_fork(self):
+        """Reconnect in a forked worker: an SQLite connection must not be used across fork().
+
+        An in-memory database cannot be reopened; the worker keeps its private copy.
+        """
+        self.lock = threading.RLock()
+        if self.path:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+
+    def close(self):
+        """Commit and close the connection, on shutdown"""
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoint_threads ("
+            "thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS checkpoint_threads_updated ON checkpoint_threads (updated_at)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS booking_keys ("
+            "key TEXT PRIMARY KEY, thread_id TEXT NOT NULL, status TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS booking_keys_thread ON booking_keys (thread_id)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS slot_holds ("
+            "calendar_id TEXT NOT NULL, start REAL NOT NULL, end REAL NOT NULL, "
+            "thread_id TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS slot_holds_interval ON slot_holds (calendar_id, start)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS slot_holds_expiry ON slot_holds (expires_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS slot_holds_thread ON slot_holds (thread_id)")
+        self.conn.commit()
+
+    def get_tuple(self, config):
+        with self.lock:
+            return super().get_tuple(config)
+
+    def list(self, config, *, before=None, limit=None):
+        with self.lock:
+            return iter(list(super().list(config, before=before, limit=limit)))
+
+    def put(self, config, checkpoint, metadata):
+        thread_id = str(config["configurable"]["thread_id"])
+        with self.lock:
+            saved = super().put(config, checkpoint, metadata)
+            with self.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND thread_ts NOT IN ("
+                    "SELECT thread_ts FROM checkpoints WHERE thread_id = ? ORDER BY thread_ts DESC LIMIT ?)",
+                    (thread_id, thread_id, self.keep),
+                )
+                cur.execute(
+                    "INSERT OR REPLACE INTO checkpoint_threads (thread_id, updated_at) VALUES (?, ?)",
+                    (thread_id, time.time()),
+                )
+        return saved
+
+    def delete_thread(self, thread_id: str) -> bool:
+        """Drop every checkpoint of a session; False if it had none"""
+        with self.lock, self.cursor() as cur:
+            cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            cur.execute("DELETE FROM booking_keys WHERE thread_id = ?", (thread_id,))
+            cur.execute("DELETE FROM slot_holds WHERE thread_id = ?", (thread_id,))
+            cur.execute("DELETE FROM checkpoint_threads WHERE thread_id = ?", (thread_id,))
+            return cur.rowcount > 0
+
+    def thread_count(self) -> int:
+        with self.lock, self.cursor(transaction=False) as cur:
+            cur.execute("SELECT COUNT(*) FROM checkpoint_threads")
+            return cur.fetchone()[0]
+
+    def delete_idle(self, max_idle_seconds: float) -> int:
+        """Drop sessions not written for `max_idle_seconds`; returns how many"""
+        cutoff = time.time() - max_idle_seconds
+        with self.lock, self.cursor() as cur:
+            cur.execute(
+                "DELETE FROM checkpoints WHERE thread_id IN ("
+                "SELECT thread_id FROM checkpoint_threads WHERE updated_at < ?)",
+                (cutoff,),
+            )
+            cur.execute(
+                "DELETE FROM booking_keys WHERE thread_id IN ("
+                "SELECT thread_id FROM checkpoint_threads WHERE updated_at < ?)",
+                (cutoff,),
+            )
+            cur.execute(
+                "DELETE FROM slot_holds WHERE thread_id IN ("
+                "SELECT thread_id FROM checkpoint_threads WHERE updated_at < ?)",
+                (cutoff,),
+            )
+            cur.execute("DELETE FROM checkpoint_threads WHERE updated_at < ?", (cutoff,))
+            return cur.rowcount
+
+    def claim_booking(self, key: str, thread_id: str) -> Optional[str]:
+        """Claim `key` for an insert; returns None if claimed, else the current holder's status"""
+        now = time.time()
+        with self.lock, self.cursor() as cur:
+            # One statement, so workers sharing the database cannot both claim;
+            # only a pending claim past its lease is taken over
+            cur.execute(
+                "INSERT INTO booking_keys (key, thread_id, status, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET thread_id = excluded.thread_id, updated_at = excluded.updated_at "
+                "WHERE booking_keys.status = ? AND booking_keys.updated_at < ?",
+                (key, thread_id, PENDING, now, PENDING, now - self.lease_seconds),
+            )
+            if cur.rowcount:
+                return None
+            cur.execute("SELECT status FROM booking_keys WHERE key = ?", (key,))
+            row = cur.fetchone()
+            return row[0] if row else PENDING
+
+    def finish_booking(self, key: str):
+        """Mark the claimed booking as created"""
+        with self.lock, self.cursor() as cur:
+            cur.execute("UPDATE booking_keys SET status = ?, updated_at = ? WHERE key = ?", (BOOKED, time.time(), key))
+
+    def release_booking(self, key: str):
+        """Drop a claim whose insert did not happen, so the user can try again"""
+        with self.lock, self.cursor() as cur:
+            cur.execute("DELETE FROM booking_keys WHERE key = ? AND status = ?", (key, PENDING))
+
+    def hold_slots(self, calendar_id: str, thread_id: str, slots: Sequence[Interval],
+                   ttl: float = HOLD_SECONDS, limit: int = 0) -> List[Interval]:
+        """Replace `thread_id`'s holds with the first `limit` (0: all) of `slots` nobody else holds.
+
+        Returns the intervals actually held, in the order given.
+        """
+        now = time.time()
+        held, contended = [], 0
+        with self.lock, self.cursor() as cur:
+            # Writing first takes the database write lock, so workers sharing
+            # the file cannot interleave their checks and inserts
+            cur.execute("DELETE FROM slot_holds WHERE thread_id = ? OR expires_at <= ?", (thread_id, now))
+            for start, end in slots:
+                if limit and len(held) >= limit:
+                    break
+                # Bounded range on the (calendar_id, start) index
+                cur.execute(
+                    "SELECT 1 FROM slot_holds WHERE calendar_id = ? AND start > ? AND start < ? AND end > ? LIMIT 1",
+                    (calendar_id, start - MAX_HOLD_LENGTH, end, start),
+                )
+                if cur.fetchone():
+                    contended += 1
+                    continue
+                cur.execute(
+                    "INSERT INTO slot_holds (calendar_id, start, end, thread_id, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (calendar_id, start, end, thread_id, now + ttl),
+                )
+                held.append((start, end))
+        count_holds(len(held), contended)
+        return held
+
+    def release_holds(self, thread_id: str):
+        with self.lock, self.cursor() as cur:
+            cur.execute("DELETE FROM slot_holds WHERE thread_id = ?", (thread_id,))
+
+    def hold_count(self) -> int:
+        with self.lock, self.cursor(transaction=False) as cur:
+            cur.execute("SELECT COUNT(*) FROM slot_holds WHERE expires_at > ?", (time.time(),))
+            return cur.fetchone()[0]
+
+
+def build_checkpointer(backend: Optional[str] = None) -> BaseCheckpointSaver:
+    """Create the checkpointer selected by CHECKPOINT_BACKEND"""
+    backend = backend or os.getenv("CHECKPOINT_BACKEND", "sqlite")
+    keep = int(os.getenv("CHECKPOINT_KEEP", "1"))
+
+    if backend in ("sqlite", "memory"):
+        path = ":memory:" if backend == "memory" else os.getenv("CHECKPOINT_DB", "checkpoints.sqlite")
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        return CompactingSqliteSaver(conn, keep=keep)
+
+    module_name, _, attr = backend.partition(":")
+    if not attr:
+        raise ValueError(f"CHECKPOINT_BACKEND must be 'sqlite', 'memory' or 'module:factory', got {backend!r}")
+    saver = getattr(importlib.import_module(module_name), attr)()
+    missing = [name for name in SESSION_METHODS if not hasattr(saver, name)]
+    if not isinstance(saver, BaseCheckpointSaver) or missing:
+        raise TypeError(f"{backend} must return a BaseCheckpointSaver implementing {', '.join(SESSION_METHODS)}")
+    return saver
@@ -0,0 +1,239 @@
+"""
+Google OAuth token storage shared by every worker.
+
+The token is kept as JSON in google-auth's authorized-user format (never
+pickled), either in a file (GOOGLE_CALENDAR_TOKEN_FILE) or, with
+CREDENTIAL_STORE=keyring, in the OS keyring (needs the optional `keyring`
+package). Refreshes are serialized by an exclusive lock file: whoever holds
+it re-reads the store first, so when several workers reach expiry together
+one of them calls Google and the rest adopt the token it saved.
+
+TokenRefresher refreshes proactively, GOOGLE_TOKEN_REFRESH_MARGIN seconds
+before expiry, on a background thread, so requests never wait on Google's
+token endpoint.
+"""
+
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Sequence
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MARGIN = float(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN", "300"))
+# google-auth itself refreshes this close to expiry (its REFRESH_THRESHOLD)
+EXPIRY_SKEW = 20.0
+
+KEYRING_SERVICE = "ai-calendar-booking-agent"
+KEYRING_USERNAME = "google-oauth-token"
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive advisory lock on `path`, held across processes"""
+    with open(path, "a+") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class CredentialStore:
+    """Where the authorized-user JSON lives; subclasses implement read, write and lock"""
+
+    def read(self) -> Optional[dict]:
+        raise NotImplementedError
+
+    def write(self, info: dict):
+        raise NotImplementedError
+
+    def lock(self):
+        raise NotImplementedError
+
+    def load(self, scopes: Optional[Sequence[str]] = None) -> Optional["StoredCredentials"]:
+        """Stored credentials, or None if there are none (or they are unusable)"""
+        info = self.read()
+        if not info:
+            return None
+        try:
+            credentials = StoredCredentials.from_authorized_user_info(info, scopes)
+        except ValueError as error:
+            logger.warning("Ignoring stored Google token: %s", error)
+            return None
+        credentials.store = self
+        return credentials
+
+    def save(self, credentials: Credentials) -> "StoredCredentials":
+        """Store freshly authorized credentials and return them bound to this store"""
+        with self.lock():
+            self.write(json.loads(credentials.to_json()))
+        return self.load(credentials.scopes)
+
+
+class FileCredentialStore(CredentialStore):
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = path + ".lock"
+
+    def read(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            legacy = os.path.splitext(self.path)[0] + ".pickle"
+            if os.path.exists(legacy):
+                logger.warning("%s is no longer read; authorize again to create %s", legacy, self.path)
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError) as error:
+            logger.warning("Could not read Google token from %s: %s", self.path, error)
+            return None
+
+    def write(self, info: dict):
+        # Write a sibling file and rename it over the old one, so readers never see half a token
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".token-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(info, handle)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def lock(self):
+        return file_lock(self.lock_path)
+
+
+class KeyringCredentialStore(CredentialStore):
+    def __init__(self, service_name: str = KEYRING_SERVICE, username: str = KEYRING_USERNAME,
+                 lock_path: Optional[str] = None):
+        if keyring is None:
+            raise RuntimeError("CREDENTIAL_STORE=keyring needs the keyring package (pip install keyring)")
+        self.service_name = service_name
+        self.username = username
+        self.lock_path = lock_path or os.path.join(tempfile.gettempdir(), f"{service_name}.token.lock")
+
+    def read(self) -> Optional[dict]:
+        value = keyring.get_password(self.service_name, self.username)
+        return json.loads(value) if value else None
+
+    def write(self, info: dict):
+        keyring.set_password(self.service_name, self.username, json.dumps(info))
+
+    def lock(self):
+        return file_lock(self.lock_path)
+
+
+class StoredCredentials(Credentials):
+    """User credentials whose refreshes are coordinated through a CredentialStore"""
+
+    store: Optional[CredentialStore] = None
+
+    def refresh(self, request):
+        # Called by google-auth when the token is (about to be) expired
+        self.sync(request, EXPIRY_SKEW)
+
+    def sync(self, request, margin: float):
+        """Make sure the token is valid for at least `margin` more seconds.
+
+        Under the store lock: adopt a newer token another worker saved, or
+        refresh with Google and save the result for the others.
+        """
+        if self.store is None:
+            return super().refresh(request)
+        with self.store.lock():
+            if self._seconds_left() > margin:
+                return
+            stored = self.store.load(self.scopes)
+            if stored is not None and stored._seconds_left() > margin:
+                self.token = stored.token
+                self.expiry = stored.expiry
+                self._refresh_token = stored.refresh_token or self._refresh_token
+                logger.info("Adopted Google token refreshed by another worker")
+                return
+            super().refresh(request)
+            self.store.write(json.loads(self.to_json()))
+            logger.info("Refreshed Google token", extra={"expiry": self.expiry.isoformat() if self.expiry else None})
+
+    def _seconds_left(self) -> float:
+        if not self.token:
+            return float("-inf")
+        if not self.expiry:
+            return float("inf")
+        # google-auth keeps expiry as naive UTC
+        return (self.expiry - datetime.utcnow()).total_seconds()
+
+
+class TokenRefresher:
+    """Refreshes credentials `margin` seconds before they expire, on a daemon thread"""
+
+    def __init__(self, credentials: StoredCredentials, margin: float = REFRESH_MARGIN, retry_delay: float = 30.0):
+        self.credentials = credentials
+        self.margin = margin
+        self.retry_delay = retry_delay
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+
+    def start(self) -> "TokenRefresher":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._seconds_until_refresh()):
+            try:
+                self.credentials.sync(Request(), self.margin)
+            except Exception as error:
+                # The token is still valid for a while; try again shortly
+                logger.warning("Proactive Google token refresh failed: %s", error)
+                if self._stop.wait(self.retry_delay):
+                    return
+
+    def _seconds_until_refresh(self) -> float:
+        remaining = self.credentials._seconds_left()
+        if remaining == float("inf"):
+            return 3600.0
+        # A little jitter so workers do not all queue on the lock at the same instant
+        return max(0.0, remaining - self.margin) + random.uniform(0, min(30.0, self.margin / 10))
+
+
+def build_credential_store(token_file: Optional[str] = None) -> CredentialStore:
+    """Create the store selected by CREDENTIAL_STORE (file or keyring)"""
+    backend = os.getenv("CREDENTIAL_STORE", "file")
+    if backend == "keyring":
+        return KeyringCredentialStore()
+    if backend != "file":
+        raise ValueError(f"CREDENTIAL_STORE must be 'file' or 'keyring', got {backend!r}")
+    return FileCredentialStore(token_file or os.getenv("GOOGLE_CALENDAR_TOKEN_FILE", "token.json"))
@@ -0,0 +1,159 @@
+"""
+Last-known-good freebusy results.
+
+Every successful freebusy query is remembered per calendar and window. Entries
+younger than FREEBUSY_FRESH_TTL answer normal queries directly (this is what
+prefetch warms). When Google cannot be reached (breaker open, quota exhausted,
+retries spent) older entries are served instead, with the slots flagged stale,
+rather than inventing availability.
+
+Lookups go through a per-calendar list of windows sorted by start: only
+windows starting within the calendar's longest window before the query can
+cover or overlap it, and those are found with a binary search, so a lookup
+does not scan the other calendars' entries under the lock.
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from metrics import CACHE_LOOKUPS
+
+_FRESH_HIT = CACHE_LOOKUPS.labels("freebusy", "hit")
+_FRESH_MISS = CACHE_LOOKUPS.labels("freebusy", "miss")
+_STALE_HIT = CACHE_LOOKUPS.labels("freebusy_stale", "hit")
+_STALE_MISS = CACHE_LOOKUPS.labels("freebusy_stale", "miss")
+
+
+class FreeBusyEntry:
+    __slots__ = ("calendar_id", "time_min", "time_max", "busy", "fetched_at", "fetch_seconds", "prefetched")
+
+    def __init__(self, calendar_id: str, time_min: datetime, time_max: datetime,
+                 busy: List[dict], fetched_at: float, fetch_seconds: float = 0.0, prefetched: bool = False):
+        self.calendar_id = calendar_id
+        self.time_min = time_min
+        self.time_max = time_max
+        self.busy = busy
+        self.fetched_at = fetched_at
+        self.fetch_seconds = fetch_seconds
+        self.prefetched = prefetched
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def covers(self, time_min: datetime, time_max: datetime) -> bool:
+        return self.time_min <= time_min and self.time_max >= time_max
+
+
+class _Windows:
+    """One calendar's cached windows as (time_min, time_max) keys sorted by start"""
+    __slots__ = ("keys", "longest")
+
+    def __init__(self):
+        self.keys: List[Tuple[datetime, datetime]] = []
+        # Upper bound on time_max - time_min; only ever grows while the calendar has entries
+        self.longest = timedelta(0)
+
+
+class FreeBusyCache:
+    """Bounded LRU of freebusy windows; a lookup is served by any entry covering the window"""
+
+    def __init__(self, capacity: int = 1024, max_age: float = 24 * 3600, fresh_ttl: float = 60.0):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.fresh_ttl = fresh_ttl
+        self._entries: "OrderedDict[Tuple[str, datetime, datetime], FreeBusyEntry]" = OrderedDict()
+        self._calendars: Dict[str, _Windows] = {}
+        self._lock = threading.Lock()
+
+    def put(self, calendar_id: str, time_min: datetime, time_max: datetime, busy: List[dict],
+            fetch_seconds: float = 0.0, prefetched: bool = False) -> FreeBusyEntry:
+        key = (calendar_id, time_min, time_max)
+        entry = FreeBusyEntry(calendar_id, time_min, time_max, busy, time.time(), fetch_seconds, prefetched)
+        with self._lock:
+            if key not in self._entries:
+                windows = self._calendars.setdefault(calendar_id, _Windows())
+                bisect.insort(windows.keys, (time_min, time_max))
+                windows.longest = max(windows.longest, time_max - time_min)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._forget(self._entries.popitem(last=False)[0])
+        return entry
+
+    def _forget(self, key: Tuple[str, datetime, datetime]):
+        calendar_id, time_min, time_max = key
+        windows = self._calendars[calendar_id]
+        del windows.keys[bisect.bisect_left(windows.keys, (time_min, time_max))]
+        if not windows.keys:
+            del self._calendars[calendar_id]
+
+    def _overlapping(self, calendar_id: str, start: datetime, end: datetime) -> Iterator[FreeBusyEntry]:
+        """Entries of `calendar_id` whose window overlaps or touches [start, end]; call with the lock held"""
+        windows = self._calendars.get(calendar_id)
+        if windows is None:
+            return
+        keys = windows.keys
+        # Only windows starting in [start - longest, end] can reach the query
+        low = bisect.bisect_left(keys, start - windows.longest, key=lambda window: window[0])
+        high = bisect.bisect_right(keys, end, key=lambda window: window[0])
+        for time_min, time_max in keys[low:high]:
+            if time_max >= start:
+                yield self._entries[(calendar_id, time_min, time_max)]
+
+    def get(self, calendar_id: str, time_min: datetime, time_max: datetime,
+            max_age: Optional[float] = None) -> Optional[FreeBusyEntry]:
+        """Freshest entry for `calendar_id` covering [time_min, time_max], or None"""
+        max_age = self.max_age if max_age is None else max_age
+        best = None
+        with self._lock:
+            for entry in self._overlapping(calendar_id, time_min, time_min):
+                if not entry.covers(time_min, time_max):
+                    continue
+                if entry.age <= max_age and (best is None or entry.fetched_at > best.fetched_at):
+                    best = entry
+            if best is not None:
+                self._entries.move_to_end((best.calendar_id, best.time_min, best.time_max))
+        return best
+
+    def get_fresh(self, calendar_id: str, time_min: datetime, time_max: datetime) -> Optional[FreeBusyEntry]:
+        """Entry young enough to answer a normal query (FREEBUSY_FRESH_TTL); counted in cache metrics"""
+        entry = self.get(calendar_id, time_min, time_max, max_age=self.fresh_ttl)
+        (_FRESH_HIT if entry is not None else _FRESH_MISS).inc()
+        return entry
+
+    def get_stale(self, calendar_id: str, time_min: datetime, time_max: datetime) -> Optional[FreeBusyEntry]:
+        """Fallback lookup used when Google is unavailable; counted in cache metrics"""
+        entry = self.get(calendar_id, time_min, time_max)
+        (_STALE_HIT if entry is not None else _STALE_MISS).inc()
+        return entry
+
+    def add_busy(self, calendar_id: str, start: datetime, end: datetime):
+        """Record an event we just created in every cached window it overlaps.
+
+        Without this a cached window would keep offering (and re-checks would
+        keep approving) the slot until the entry expired.
+        """
+        period = {"start": start.isoformat(), "end": end.isoformat()}
+        with self._lock:
+            for entry in self._overlapping(calendar_id, start, end):
+                if entry.time_min < end and entry.time_max > start:
+                    # Readers may hold the old list; replace rather than mutate it
+                    entry.busy = entry.busy + [period]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._calendars.clear()
+
+
+freebusy_cache = FreeBusyCache(
+    capacity=int(os.getenv("FREEBUSY_CACHE_SIZE", "1024")),
+    max_age=float(os.getenv("FREEBUSY_STALE_MAX_AGE", str(24 * 3600))),
+    fresh_ttl=float(os.getenv("FREEBUSY_FRESH_TTL", "60")),
+)
@@ -0,0 +1,173 @@
+"""
+Resilient execution of Google Calendar API requests.
+
+Every request goes through one shared `GoogleApiClient`, which:
+
+  - takes a token from a client-side bucket sized to the project quota
+    (GOOGLE_API_QPS / GOOGLE_API_BURST) so we throttle ourselves before
+    Google starts answering 403/429
+  - retries rate-limit, 5xx and network errors with full-jitter exponential
+    backoff, honouring Retry-After, within the per-request retry budget
+  - feeds a circuit breaker so a struggling API is not hammered; while it is
+    open, calls fail fast with CircuitOpenError
+"""
+
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import Optional
+
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+
+from metrics import GOOGLE_API_LATENCY, GOOGLE_API_REJECTED, GOOGLE_API_RETRIES, GOOGLE_BREAKER_OPEN
+from resilience import (CircuitBreaker, CircuitOpenError, RateLimitedError, TokenBucket,
+                        backoff_delay, current_retry_budget)
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+RETRYABLE_STATUSES = {500, 502, 503, 504}
+
+
+class CalendarUnavailableError(Exception):
+    """Google Calendar could not be reached and no cached data can answer the query"""
+
+
+CALENDAR_UNAVAILABLE_MESSAGE = ("I can't reach your Google Calendar right now, so I can't check availability "
+                                "safely. Please try again in a minute.")
+
+
+def stale_notice(slots) -> str:
+    """User-facing caveat when suggested slots come from cached freebusy data"""
+    fetched = [slot.as_of for slot in slots if slot.stale and slot.as_of]
+    if not any(slot.stale for slot in slots):
+        return ""
+    when = f" as of {min(fetched).strftime('%I:%M %p %Z')}" if fetched else ""
+    return (f"\n\n⚠️ Google Calendar is temporarily unreachable, so these times are based on your "
+            f"calendar{when} and may have changed.")
+
+
+@lru_cache(maxsize=None)
+def discovery_document() -> dict:
+    """Parsed Calendar v3 discovery document, read once per process.
+
+    server.py loads it in the master, so forked workers build their service from it.
+    """
+    return json.loads(get_static_doc("calendar", "v3"))
+
+
+def retry_reason(error: Exception) -> Optional[str]:
+    """Classify an error as retryable ("rate_limited", "server_error", "network") or not (None)"""
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status == 429:
+            return "rate_limited"
+        if status == 403 and any(reason in str(error.content) for reason in RATE_LIMIT_REASONS):
+            return "rate_limited"
+        if status in RETRYABLE_STATUSES:
+            return "server_error"
+        return None
+    if isinstance(error, OSError):
+        # socket timeouts, connection resets, DNS failures
+        return "network"
+    return None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    if isinstance(error, HttpError):
+        try:
+            return float(error.resp.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+class GoogleApiClient:
+    def __init__(self, rate_limiter: TokenBucket, breaker: CircuitBreaker, max_attempts: int = 4,
+                 backoff_base: float = 0.25, backoff_cap: float = 4.0, throttle_wait: float = 1.0):
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.throttle_wait = throttle_wait
+
+    def execute(self, method: str, request, idempotent: bool = True, throttle_wait: Optional[float] = None):
+        """Execute a googleapiclient request with rate limiting, retries and the breaker.
+
+        Non-idempotent requests (inserts) are only retried when Google rejected
+        them for rate limiting, since a 5xx or a dropped connection may have
+        been applied server-side. `throttle_wait` overrides how long to wait for
+        a rate-limiter token; background work passes 0 so it never queues
+        ahead of user requests.
+        """
+        budget = current_retry_budget()
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                GOOGLE_API_REJECTED.labels(method, "circuit_open").inc()
+                raise CircuitOpenError(f"Google Calendar circuit open; retry in {self.breaker.retry_after():.0f}s")
+            if not self.rate_limiter.try_acquire(self.throttle_wait if throttle_wait is None else throttle_wait):
+                GOOGLE_API_REJECTED.labels(method, "rate_limited").inc()
+                # Release a half-open probe slot without counting this as a failure
+                self.breaker.record_skipped()
+                raise RateLimitedError(f"Client-side Google Calendar quota exhausted for {method}")
+
+            try:
+                result = self._send(method, request, attempt)
+            except Exception as error:
+                reason = retry_reason(error)
+                if reason is None:
+                    # The API answered (4xx); it is healthy even if the request was bad
+                    self.breaker.record_success()
+                    raise
+                retryable = idempotent or reason == "rate_limited"
+                attempt += 1
+                delay = _retry_after(error)
+                if delay is None:
+                    delay = backoff_delay(attempt - 1, self.backoff_base, self.backoff_cap)
+                if not retryable or attempt >= self.max_attempts or not budget.spend(delay):
+                    self.breaker.record_failure()
+                    raise
+                GOOGLE_API_RETRIES.labels(method, reason).inc()
+                logger.warning("Retrying Google API call", extra={
+                    "method": method, "reason": reason, "attempt": attempt, "delay": round(delay, 3),
+                })
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    def _send(self, method: str, request, attempt: int):
+        started = time.perf_counter()
+        outcome = "ok"
+        with tracer.start_span(f"google.{method}", {"attempt": attempt}) as span:
+            try:
+                return request.execute()
+            except HttpError as error:
+                outcome = f"http_{error.resp.status}"
+                raise
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                span.set_attribute("outcome", outcome)
+                GOOGLE_API_LATENCY.labels(method, outcome).observe(time.perf_counter() - started)
+
+
+_qps = float(os.getenv("GOOGLE_API_QPS", "10"))
+google_api = GoogleApiClient(
+    rate_limiter=TokenBucket(_qps, float(os.getenv("GOOGLE_API_BURST", str(_qps)))),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("GOOGLE_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("GOOGLE_BREAKER_RESET", "30")),
+    ),
+    max_attempts=int(os.getenv("GOOGLE_API_MAX_ATTEMPTS", "4")),
+    throttle_wait=float(os.getenv("GOOGLE_API_THROTTLE_WAIT", "1.0")),
+)
+GOOGLE_BREAKER_OPEN.set_function(lambda: 1 if google_api.breaker.state == CircuitBreaker.OPEN else 0)
@@ -1,16 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+import asyncio
+import os
+import threading
 import uuid
-from typing import Dict, Optional
+from datetime import datetime
+from typing import List, Optional
 import logging
+import time
+import metrics
+import logging_setup
+from logging_setup import configure_logging, log_context
+from tracing import tracer
+from profiling import profiler, to_pstats_file, to_speedscope
+from resilience import retry_budget
+from google_api import CalendarUnavailableError, google_api
+from prefetch import prefetcher
+from admission import BOOKING, EXPLORATORY, AdmissionController, OverloadedError
+import rate_limits
+from rate_limits import ClientRateLimiter, QuotaExceededError, RateLimitMiddleware, SessionQuota, request_client
 from calendar_service import CalendarService
 from booking_agent import BookingAgent
-from models import AgentState
+from checkpointing import build_checkpointer
+from models import AgentState, BookingRequest, ScheduledBooking
+from timezones import get_timezone, is_valid_timezone
+import batch_scheduler
+from batch_scheduler import BatchScheduler
 from simple_booking_agent import SimpleBookingAgent  # Instead of BookingAgent
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (structured, written off the request thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize services
@@ -24,6 +45,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Per-client request limits; added before CORS so that 429s still carry CORS headers
+rate_limiter = ClientRateLimiter()
+session_quota = SessionQuota()
+if rate_limits.ENABLED and rate_limiter.enabled:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+metrics.RATE_LIMIT_CLIENTS.set_function(lambda: len(rate_limiter))
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -33,56 +61,215 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory session storage (use Redis/Database in production)
-sessions: Dict[str, AgentState] = {}
+# Conversation state lives in LangGraph checkpoints keyed by session_id, so any
+# worker can resume any session (see checkpointing.py for backends)
+checkpointer = build_checkpointer()
+agent = BookingAgent(calendar_service, checkpointer=checkpointer)
+metrics.ACTIVE_SESSIONS.set_function(checkpointer.thread_count)
+scheduler = BatchScheduler(calendar_service)
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "3600"))
+SESSION_CLEANUP_INTERVAL = float(os.getenv("SESSION_CLEANUP_INTERVAL", "3600"))
+CHAT_OK = metrics.CHAT_LATENCY.labels("ok")
+CHAT_ERROR = metrics.CHAT_LATENCY.labels("error")
+# Retries of Google API calls allowed per /chat turn, and the total backoff they may add
+RETRY_BUDGET = int(os.getenv("GOOGLE_RETRY_BUDGET", "3"))
+RETRY_BUDGET_SECONDS = float(os.getenv("GOOGLE_RETRY_BUDGET_SECONDS", "5"))
+# Turns (and batch requests) running per worker, turns queued behind them, and how long one may wait
+admission = AdmissionController(int(os.getenv("ADMISSION_MAX_CONCURRENT", "32")),
+                                int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+                                float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")))
+metrics.ADMISSION_IN_FLIGHT.set_function(lambda: admission.active)
+metrics.ADMISSION_QUEUED.set_function(lambda: admission.queued)
+# How long shutdown waits for turns still running in the threadpool to checkpoint
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "20"))
+
+# Turns being processed; a turn keeps running in the threadpool even if its client goes away
+_turns_in_flight = 0
+_turns_done = threading.Condition()
 
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
+    timezone: Optional[str] = None  # IANA name, e.g. "Europe/Berlin"; kept for the session
 
 class ChatResponse(BaseModel):
     response: str
     session_id: str
     state: str
+    booking_request: Optional[dict] = None
+
+class BatchScheduleRequest(BaseModel):
+    requests: List[BookingRequest]
+    start_date: str  # YYYY-MM-DD, first day of the window
+    end_date: str  # YYYY-MM-DD, last day of the window (inclusive)
+    timezone: Optional[str] = None  # IANA name for dates and times; the calendar's by default
+    create_events: bool = False
+    batch_id: Optional[str] = None  # resend with the same id to retry without duplicate events
+
+class BatchScheduleResponse(BaseModel):
+    batch_id: str
+    scheduled: int
+    unscheduled: int
+    assignments: List[ScheduledBooking]
+
+def run_turn(message: str, session_id: str, request_id: str, profile_mode: Optional[str],
+             timezone: Optional[str] = None, client: Optional[str] = None) -> AgentState:
+    """Resume the session from its checkpoint (greeting new ones) and process one message.
+
+    New sessions count against the `client`'s session quota (QuotaExceededError).
+    """
+    state = agent.load_state(session_id)
+    if state is None:
+        if client is not None and rate_limits.ENABLED:
+            session_quota.charge(client)
+        state = agent.process_message("", AgentState(timezone=timezone), session_id=session_id,
+                                      request_id=request_id)
+        metrics.SESSIONS_CREATED.inc()
+        logger.info("Created new session")
+    if timezone:
+        state.timezone = timezone
+    return profiler.run(
+        profile_mode, f"session {session_id}",
+        agent.process_message, message, state,
+        session_id=session_id, request_id=request_id
+    )
+
+def tracked_turn(*args) -> AgentState:
+    """run_turn, counted so shutdown can wait for it to reach the session store"""
+    global _turns_in_flight
+    with _turns_done:
+        _turns_in_flight += 1
+    try:
+        return run_turn(*args)
+    finally:
+        with _turns_done:
+            _turns_in_flight -= 1
+            _turns_done.notify_all()
+
+def drain(timeout: float) -> bool:
+    """Wait for turns in flight, then close the session store; False if turns were still running"""
+    with _turns_done:
+        drained = _turns_done.wait_for(lambda: _turns_in_flight == 0, timeout)
+    if not drained:
+        logger.warning("Shutting down with turns still running", extra={"turns": _turns_in_flight})
+    prefetcher.shutdown()
+    calendar_service.close()
+    if hasattr(checkpointer, "close"):
+        checkpointer.close()
+    return drained
+
+def after_fork():
+    """Re-create per-process resources in a worker forked from the preloading master (server.py)"""
+    logging_setup.after_fork()
+    tracer.after_fork()
+    calendar_service.after_fork()
+    if hasattr(checkpointer, "after_fork"):
+        checkpointer.after_fork()
+
+def turn_priority(request: ChatRequest) -> int:
+    """Turns that pick or confirm a slot of an ongoing conversation are admitted first"""
+    if request.session_id:
+        intent = agent.nlp_processor.extract_intent(request.message)
+        if intent == "confirmation" or intent.startswith("slot_selection"):
+            return BOOKING
+    return EXPLORATORY
+
+def overloaded(error: OverloadedError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(error.retry_after)})
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """Handle chat messages from the frontend"""
+    started = time.perf_counter()
+    if request.timezone and not is_valid_timezone(request.timezone):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {request.timezone}")
+    # Get or create session
+    session_id = request.session_id or str(uuid.uuid4())
+    request_id = http_request.headers.get("X-Request-ID") or uuid.uuid4().hex
     try:
-        # Get or create session
-        session_id = request.session_id or str(uuid.uuid4())
-        
-        # Initialize session if it doesn't exist
-        if session_id not in sessions:
-            sessions[session_id] = AgentState()
-            # Create agent and initialize with greeting
-            agent = BookingAgent(calendar_service)
-            sessions[session_id] = agent.process_message("", sessions[session_id])
-            logger.info(f"Created new session: {session_id}")
-        
-        # Process the user message
-        agent = BookingAgent(calendar_service)
-        sessions[session_id] = agent.process_message(request.message, sessions[session_id])
-        
-        logger.info(f"Processed message for session {session_id}: {request.message}")
+        with log_context(request_id=request_id, session_id=session_id), \
+                retry_budget(RETRY_BUDGET, RETRY_BUDGET_SECONDS), \
+                tracer.start_span("POST /chat", {"session.id": session_id, "request.id": request_id},
+                                  traceparent=http_request.headers.get("traceparent")) as span:
+            # Process the user message (profiled when requested by an admin). The turn
+            # blocks on Google calls, so it runs in the threadpool to keep the event loop
+            # free; concurrent identical freebusy queries are coalesced in CalendarService
+            profile_mode = profiler.requested_mode(http_request.headers.get("X-Profile"),
+                                                   http_request.headers.get("X-Admin-Token"))
+            async with admission.admit(turn_priority(request)):
+                state = await run_in_threadpool(tracked_turn, request.message, session_id, request_id,
+                                                profile_mode, request.timezone, request_client(http_request.scope))
+            
+            logger.debug("Processed message: %s", request.message)
+            span.set_attribute("conversation.state", state.current_state.value)
         
+        CHAT_OK.observe(time.perf_counter() - started)
         return ChatResponse(
-            response=sessions[session_id].agent_response,
+            response=state.agent_response,
             session_id=session_id,
-            state=sessions[session_id].current_state.value
+            state=state.current_state.value,
+            booking_request=state.booking_request.dict()
         )
         
+    except QuotaExceededError as e:
+        CHAT_ERROR.observe(time.perf_counter() - started)
+        logger.warning("Session not created: %s", e, extra={"request_id": request_id, "session_id": session_id})
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except OverloadedError as e:
+        CHAT_ERROR.observe(time.perf_counter() - started)
+        logger.warning("Chat turn not admitted: %s", e, extra={"request_id": request_id, "session_id": session_id})
+        raise overloaded(e)
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}")
+        CHAT_ERROR.observe(time.perf_counter() - started)
+        logger.exception("Error in chat endpoint", extra={"request_id": request_id, "session_id": session_id})
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/schedule/batch", response_model=BatchScheduleResponse)
+async def schedule_batch(request: BatchScheduleRequest, http_request: Request):
+    """Assign slots to many booking requests at once, optionally creating the events"""
+    if not batch_scheduler.AVAILABLE:
+        raise HTTPException(status_code=501, detail="Batch scheduling needs NumPy")
+    if request.timezone and not is_valid_timezone(request.timezone):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {request.timezone}")
+    try:
+        first_day = datetime.strptime(request.start_date, "%Y-%m-%d").date()
+        last_day = datetime.strptime(request.end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date and end_date must be YYYY-MM-DD")
+    if not 0 <= (last_day - first_day).days < batch_scheduler.MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"The window must span 1 to {batch_scheduler.MAX_DAYS} days")
+    if len(request.requests) > batch_scheduler.MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"At most {batch_scheduler.MAX_REQUESTS} requests per batch")
+    
+    timezone = get_timezone(request.timezone) if request.timezone else calendar_service.timezone
+    batch_id = request.batch_id or uuid.uuid4().hex
+    request_id = http_request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    with log_context(request_id=request_id), \
+            retry_budget(RETRY_BUDGET, RETRY_BUDGET_SECONDS), \
+            tracer.start_span("POST /schedule/batch", {"batch.id": batch_id, "request.id": request_id},
+                              traceparent=http_request.headers.get("traceparent")):
+        try:
+            async with admission.admit(EXPLORATORY):
+                assignments = await run_in_threadpool(scheduler.schedule, request.requests, first_day, last_day,
+                                                      timezone, request.batch_id)
+                if request.create_events:
+                    await run_in_threadpool(scheduler.book, assignments, batch_id)
+        except OverloadedError as e:
+            raise overloaded(e)
+        except CalendarUnavailableError:
+            raise HTTPException(status_code=503, detail="Google Calendar is unavailable; try again shortly")
+    
+    scheduled = sum(assignment.slot is not None for assignment in assignments)
+    return BatchScheduleResponse(batch_id=batch_id, scheduled=scheduled,
+                                 unscheduled=len(assignments) - scheduled, assignments=assignments)
+
 @app.get("/session/{session_id}")
 async def get_session(session_id: str):
     """Get session information"""
-    if session_id not in sessions:
+    session = await run_in_threadpool(agent.load_state, session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = sessions[session_id]
     return {
         "session_id": session_id,
         "state": session.current_state.value,
@@ -93,9 +280,9 @@ async def get_session(session_id: str):
 @app.delete("/session/{session_id}")
 async def delete_session(session_id: str):
     """Delete a session"""
-    if session_id in sessions:
-        del sessions[session_id]
-        logger.info(f"Deleted session: {session_id}")
+    if await run_in_threadpool(checkpointer.delete_thread, session_id):
+        metrics.SESSIONS_EVICTED.labels("deleted").inc()
+        logger.info("Deleted session", extra={"session_id": session_id})
         return {"message": "Session deleted successfully"}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -106,9 +293,57 @@ async def health():
     return {
         "status": "healthy",
         "calendar_authenticated": calendar_service.authenticated,
-        "active_sessions": len(sessions)
+        "google_breaker": google_api.breaker.state,
+        "active_sessions": checkpointer.thread_count(),
+        "admission": admission.stats(),
+        "rate_limit_clients": len(rate_limiter)
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics.REGISTRY.expose(), media_type=metrics.CONTENT_TYPE)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard admin endpoints with PROFILING_ADMIN_TOKEN"""
+    if not profiler.authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/admin/profiling/arm", dependencies=[Depends(require_admin)])
+async def arm_profiler(count: int = 1, mode: str = "sample"):
+    """Profile the next `count` chat turns"""
+    if mode not in ("sample", "cprofile"):
+        raise HTTPException(status_code=400, detail="mode must be 'sample' or 'cprofile'")
+    profiler.arm(count, mode)
+    return {"armed": count, "mode": mode}
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """List captured profiles, newest first"""
+    return {"profiles": profiler.list()}
+
+@app.get("/admin/profiles/flame", dependencies=[Depends(require_admin)])
+async def flame_profile(last: int = 20):
+    """Folded stacks aggregated over the last N sampled turns (flamegraph.pl / speedscope input)"""
+    return Response(content=profiler.flame(last), media_type="text/plain")
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: int, format: str = "speedscope"):
+    """Download one profile as speedscope JSON (sampled) or pstats (cprofile)"""
+    record = profiler.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        if record.pstats_data is None:
+            raise HTTPException(status_code=409, detail="pstats is only available for cprofile captures")
+        return Response(content=to_pstats_file(record), media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.pstats"'})
+    if format == "speedscope":
+        if record.samples is None:
+            raise HTTPException(status_code=409, detail="speedscope export is only available for sampled captures")
+        return to_speedscope(record)
+    raise HTTPException(status_code=400, detail="format must be 'speedscope' or 'pstats'")
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -116,51 +351,48 @@ async def root():
         "message": "Calendar Booking Agent API",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "metrics": "/metrics"
     }
 
-# Optional: Clean up old sessions periodically
-from datetime import datetime, timedelta
-import asyncio
-
+# Expire idle sessions periodically
 async def cleanup_old_sessions():
-    """Clean up sessions older than 1 hour"""
+    """Delete sessions idle for longer than SESSION_IDLE_TIMEOUT"""
     while True:
         try:
-            current_time = datetime.now()
-            sessions_to_remove = []
-            
-            for session_id, session in sessions.items():
-                # Simple cleanup based on session creation (you might want to track last activity)
-                # For now, we'll keep this simple
-                if len(sessions) > 100:  # Only cleanup if we have too many sessions
-                    sessions_to_remove.append(session_id)
-            
-            # Remove oldest sessions
-            for session_id in sessions_to_remove[:50]:  # Remove up to 50 old sessions
-                if session_id in sessions:
-                    del sessions[session_id]
-                    logger.info(f"Cleaned up old session: {session_id}")
-            
+            removed = await run_in_threadpool(checkpointer.delete_idle, SESSION_IDLE_TIMEOUT)
+            if removed:
+                metrics.SESSIONS_EVICTED.labels("cleanup").inc(removed)
+                logger.info("Cleaned up idle sessions", extra={"removed": removed})
         except Exception as e:
-            logger.error(f"Error in session cleanup: {e}")
+            logger.error("Error in session cleanup: %s", e)
         
-        # Wait 1 hour before next cleanup
-        await asyncio.sleep(3600)
+        await asyncio.sleep(SESSION_CLEANUP_INTERVAL)
+
+_cleanup_task: Optional[asyncio.Task] = None
 
 # Start cleanup task when the app starts
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks"""
+    global _cleanup_task
     logger.info("Starting Calendar Booking Agent API")
-    # asyncio.create_task(cleanup_old_sessions())
+    _cleanup_task = asyncio.create_task(cleanup_old_sessions())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain: requests have stopped; let running turns checkpoint, then close the session store"""
+    logger.info("Stopping Calendar Booking Agent API")
+    if _cleanup_task is not None:
+        _cleanup_task.cancel()
+    await run_in_threadpool(drain, SHUTDOWN_DRAIN_SECONDS)
 
 if __name__ == "__main__":
+    # A single process for development; production runs `python -m server`
     import uvicorn
     uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        app,
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,325 @@
+"""
+Lightweight Prometheus-style metrics.
+
+Counters and histograms keep one preallocated array per thread, so recording
+a value is a list index increment with no lock and no allocation; arrays are
+only summed when /metrics is scraped. When a thread exits its array is folded
+into a running total and dropped, so short-lived threads (LangGraph starts
+new executor threads every turn) do not pile up shards. Label children are
+created once and cached, so hot paths should hold on to `metric.labels(...)`
+results.
+"""
+
+import itertools
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _ShardOwner:
+    """Lives in a thread's local storage, so it is collected when the thread exits"""
+    __slots__ = ("__weakref__",)
+
+
+class _ShardedArray:
+    """Per-thread value arrays; writers never contend, readers sum all shards"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: Dict[int, list] = {}
+        # Values of the shards of threads that have exited
+        self._retired = [0] * size
+        self._keys = itertools.count()
+        self._lock = threading.Lock()
+
+    def local(self) -> list:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0] * self._size
+            owner = _ShardOwner()
+            with self._lock:
+                key = next(self._keys)
+                self._shards[key] = shard
+            weakref.finalize(owner, self._retire, key)
+            self._local.shard = shard
+            self._local.owner = owner
+        return shard
+
+    def _retire(self, key: int):
+        with self._lock:
+            shard = self._shards.pop(key)
+            for i, value in enumerate(shard):
+                self._retired[i] += value
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._shards)
+
+    def totals(self) -> list:
+        with self._lock:
+            shards = list(self._shards.values())
+            totals = list(self._retired)
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+class _CounterChild:
+    def __init__(self):
+        self._values = _ShardedArray(1)
+
+    def inc(self, amount: float = 1):
+        self._values.local()[0] += amount
+
+    def value(self) -> float:
+        return self._values.totals()[0]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        self._value += amount
+
+    def dec(self, amount: float = 1):
+        self._value -= amount
+
+    def value(self) -> float:
+        return self._value
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = tuple(buckets)
+        # One slot per bucket, one for +Inf, then the running sum
+        self._values = _ShardedArray(len(self._buckets) + 2)
+
+    def observe(self, value: float):
+        shard = self._values.local()
+        shard[bisect_left(self._buckets, value)] += 1
+        shard[-1] += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        totals = self._values.totals()
+        counts = totals[:-1]
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[-1]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _label_str(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._sample_lines(key, child))
+        return lines
+
+    def _sample_lines(self, key: tuple, child) -> List[str]:
+        return [f"{self.name}{self._label_str(key)} {_fmt(child.value())}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        self._callback = callback
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def set_function(self, callback: Callable[[], float]):
+        """Evaluate `callback` at scrape time instead of tracking the value"""
+        self._callback = callback
+
+    def _sample_lines(self, key: tuple, child) -> List[str]:
+        value = self._callback() if self._callback and not key else child.value()
+        return [f"{self.name}{self._label_str(key)} {_fmt(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _sample_lines(self, key: tuple, child) -> List[str]:
+        cumulative, count, total = child.snapshot()
+        lines = []
+        for bound, value in zip(self.buckets + (float("inf"),), cumulative):
+            le = "+Inf" if bound == float("inf") else _fmt(bound)
+            labels = self._label_str(key, 'le="%s"' % le)
+            lines.append(f"{self.name}_bucket{labels} {value}")
+        lines.append(f"{self.name}_count{self._label_str(key)} {count}")
+        lines.append(f"{self.name}_sum{self._label_str(key)} {_fmt(total)}")
+        return lines
+
+
+def _fmt(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def expose(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def timed(histogram_child: _HistogramChild, func: Callable) -> Callable:
+    """Wrap `func` so every call is observed in `histogram_child`"""
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram_child.observe(time.perf_counter() - started)
+    wrapper.__name__ = getattr(func, "__name__", "timed")
+    wrapper.__doc__ = getattr(func, "__doc__", None)
+    return wrapper
+
+
+# Application metrics
+CHAT_LATENCY = REGISTRY.register(Histogram(
+    "booking_chat_request_duration_seconds", "Latency of /chat requests", ["outcome"]))
+NODE_LATENCY = REGISTRY.register(Histogram(
+    "booking_agent_node_duration_seconds", "Time spent in each agent graph node", ["node"]))
+GOOGLE_API_LATENCY = REGISTRY.register(Histogram(
+    "booking_google_api_duration_seconds", "Google Calendar API call latency", ["method", "outcome"]))
+GOOGLE_API_RETRIES = REGISTRY.register(Counter(
+    "booking_google_api_retries_total", "Google Calendar API retries by method and reason", ["method", "reason"]))
+GOOGLE_API_REJECTED = REGISTRY.register(Counter(
+    "booking_google_api_rejected_total",
+    "Google Calendar API calls not sent (rate_limited: no token, circuit_open: breaker open)", ["method", "reason"]))
+GOOGLE_BREAKER_OPEN = REGISTRY.register(Gauge(
+    "booking_google_breaker_open", "1 while the Google Calendar circuit breaker is rejecting calls"))
+AVAILABILITY_SOURCE = REGISTRY.register(Counter(
+    "booking_availability_source_total", "Availability answers by data source (google/stale_cache/mock)", ["source"]))
+SINGLEFLIGHT_CALLS = REGISTRY.register(Counter(
+    "booking_singleflight_calls_total",
+    "Deduplicated calls by flight; leaders made the upstream call, followers shared its result", ["flight", "role"]))
+PREFETCH_REQUESTS = REGISTRY.register(Counter(
+    "booking_prefetch_requests_total", "Availability prefetches by result (started/skipped/dropped/failed)", ["result"]))
+PREFETCH_LOOKUPS = REGISTRY.register(Counter(
+    "booking_prefetch_lookups_total", "Availability checks by how prefetch helped (warm/joined/cached/cold)", ["outcome"]))
+PREFETCH_HIDDEN_SECONDS = REGISTRY.register(Histogram(
+    "booking_prefetch_hidden_seconds", "Google freebusy latency a check did not wait for thanks to prefetch"))
+BOOKING_ATTEMPTS = REGISTRY.register(Counter(
+    "booking_bookings_total",
+    "Confirmed bookings by outcome (booked/duplicate/in_progress/conflict/failed)", ["outcome"]))
+SLOT_HOLDS = REGISTRY.register(Counter(
+    "booking_slot_holds_total",
+    "Slots considered for a hold: held for the session, or contended (held by another session)", ["result"]))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "booking_cache_lookups_total", "Cache lookups by cache name and result (hit/miss)", ["cache", "result"]))
+ACTIVE_SESSIONS = REGISTRY.register(Gauge(
+    "booking_active_sessions", "Conversations currently held in the session store"))
+SESSIONS_CREATED = REGISTRY.register(Counter(
+    "booking_sessions_created_total", "Conversations started"))
+SESSIONS_EVICTED = REGISTRY.register(Counter(
+    "booking_sessions_evicted_total", "Conversations removed from the session store", ["reason"]))
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    "booking_admission_in_flight", "Turns admitted and running in this worker"))
+ADMISSION_QUEUED = REGISTRY.register(Gauge(
+    "booking_admission_queued", "Turns waiting for admission in this worker"))
+ADMISSION_WAIT = REGISTRY.register(Histogram(
+    "booking_admission_wait_seconds", "Time turns spent queued for admission", ["priority"]))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "booking_admission_rejected_total",
+    "Turns answered 503 by admission control (queue_full/timeout/displaced)", ["reason", "priority"]))
+RATE_LIMITED = REGISTRY.register(Counter(
+    "booking_rate_limited_total", "Requests answered 429 by per-client limits (requests/sessions)", ["limit"]))
+RATE_LIMIT_CLIENTS = REGISTRY.register(Gauge(
+    "booking_rate_limit_clients", "Clients tracked by the per-client request limiter"))
@@ -0,0 +1,537 @@
+"""
+Deterministic stand-in for the Google Calendar API, for load tests and demos.
+
+MockCalendarBackend simulates any number of calendars. Each calendar gets a
+seeded workload (some are packed, some mostly free) and each day a seeded mix
+of meetings, so the same seed always yields the same busy times. Inserted
+events go into an event store and show up in later freebusy answers, so
+bookings really remove availability. Latency, 5xx errors and 429 rate limits
+can be injected to exercise the retry, breaker and cache paths.
+
+The backend is reachable two ways, both through the real Google client code:
+
+  - MockGoogleService: an in-process drop-in for the googleapiclient service
+    object, raising the same HttpError the real client raises
+  - a local HTTP server speaking the freeBusy, events.insert and
+    calendarList endpoints (and batch requests of them), for googleapiclient
+    itself (build_http_service) or for a whole app pointed at it with
+    GOOGLE_CALENDAR_API_URL
+
+Run the HTTP stand-in with:
+
+    python -m mock_calendar --port 8090 --latency-ms 40 --error-rate 0.01 --rate-limit-rate 0.02
+"""
+
+import argparse
+import email.parser
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlsplit
+
+import httplib2
+import pytz
+from googleapiclient.errors import HttpError
+
+import recurrence
+
+logger = logging.getLogger(__name__)
+
+Interval = Tuple[datetime, datetime]
+
+# Meeting lengths in minutes, weighted towards the usual 30/60
+MEETING_MINUTES = (30, 30, 30, 60, 60, 60, 60, 90, 120)
+# Relative chance of a meeting starting in each hour of the working day
+HOUR_WEIGHTS = {9: 0.6, 10: 1.0, 11: 1.0, 12: 0.5, 13: 0.7, 14: 1.0, 15: 1.0, 16: 0.8}
+
+
+def _stable_seed(*parts) -> int:
+    # hash() is salted per process; crc32 keeps seeds reproducible across runs
+    return zlib.crc32("|".join(str(part) for part in parts).encode("utf-8"))
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _rfc5545(value: str) -> str:
+    # 20261027T100000Z -> 2026-10-27T10:00:00Z
+    return f"{value[0:4]}-{value[4:6]}-{value[6:8]}T{value[9:11]}:{value[11:13]}:{value[13:15]}{value[15:]}"
+
+
+def _format_time(value: datetime) -> str:
+    return value.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class MockApiError(Exception):
+    """An error the mock answers with, shaped like a Google API error"""
+
+    def __init__(self, status: int, reason: str, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message or reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def body(self) -> dict:
+        return {"error": {"code": self.status, "message": str(self),
+                          "errors": [{"domain": "global", "reason": self.reason, "message": str(self)}]}}
+
+    def headers(self) -> Dict[str, str]:
+        return {"retry-after": f"{self.retry_after:g}"} if self.retry_after is not None else {}
+
+    def to_http_error(self) -> HttpError:
+        resp = httplib2.Response({"status": self.status, **self.headers()})
+        return HttpError(resp, json.dumps(self.body()).encode("utf-8"))
+
+
+class MockCalendarBackend:
+    """Seeded calendars plus an event store; thread-safe"""
+
+    def __init__(self, seed: int = 42, calendars: int = 1, timezone: str = "UTC",
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0,
+                 workday: Tuple[int, int] = (9, 17), cache_days: int = 4096):
+        self.seed = seed
+        self.calendar_ids = ["primary"] + [f"calendar-{i}@mock" for i in range(1, calendars)]
+        self.timezone = pytz.timezone(timezone)
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.workday = workday
+        self.cache_days = cache_days
+        # Seeded too, so a run's sequence of injected faults is reproducible
+        self._rng = random.Random(seed)
+        # Reentrant: _count is also called with the lock held
+        self._lock = threading.RLock()
+        self._generated: "OrderedDict[Tuple[str, date], List[Interval]]" = OrderedDict()
+        # calendar_id -> event_id -> event; (calendar_id, day) -> booked intervals
+        self._events: Dict[str, Dict[str, dict]] = {}
+        self._booked: Dict[Tuple[str, date], List[Interval]] = {}
+        self._stats: Dict[str, int] = {}
+        # Set while the calls of one batch run, which share the batch's round trip
+        self._batch = threading.local()
+
+    @classmethod
+    def from_env(cls) -> "MockCalendarBackend":
+        return cls(
+            seed=int(os.getenv("MOCK_CALENDAR_SEED", "42")),
+            calendars=int(os.getenv("MOCK_CALENDAR_COUNT", "1")),
+            latency_ms=float(os.getenv("MOCK_CALENDAR_LATENCY_MS", "0")),
+            jitter_ms=float(os.getenv("MOCK_CALENDAR_JITTER_MS", "0")),
+            error_rate=float(os.getenv("MOCK_CALENDAR_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("MOCK_CALENDAR_429_RATE", "0")),
+        )
+
+    # API operations, taking and returning Google-shaped JSON
+
+    def query_freebusy(self, body: dict) -> dict:
+        self._before_call("freebusy.query")
+        time_min, time_max = _parse_time(body["timeMin"]), _parse_time(body["timeMax"])
+        calendars = {}
+        for item in body.get("items", []):
+            busy = self.busy_periods(item["id"], time_min, time_max)
+            calendars[item["id"]] = {"busy": [{"start": _format_time(start), "end": _format_time(end)}
+                                              for start, end in busy]}
+        return {"kind": "calendar#freeBusy", "timeMin": body["timeMin"], "timeMax": body["timeMax"],
+                "calendars": calendars}
+
+    def insert_event(self, calendar_id: str, body: dict) -> dict:
+        self._before_call("events.insert")
+        try:
+            start, end = _parse_time(body["start"]["dateTime"]), _parse_time(body["end"]["dateTime"])
+        except (KeyError, TypeError, ValueError):
+            raise MockApiError(400, "invalid", "Event needs start.dateTime and end.dateTime")
+        event_id = body.get("id") or uuid.uuid4().hex
+        with self._lock:
+            events = self._events.setdefault(calendar_id, {})
+            if event_id in events:
+                self._count("events.insert.duplicate")
+                raise MockApiError(409, "duplicate", "The requested identifier already exists.")
+            event = {**body, "id": event_id, "status": "confirmed", "kind": "calendar#event",
+                     "htmlLink": f"https://calendar.mock/event?eid={event_id}"}
+            events[event_id] = event
+            for occurrence_start, occurrence_end in self._occurrences(body, start, end):
+                for day in self._days(occurrence_start, occurrence_end):
+                    self._booked.setdefault((calendar_id, day), []).append((occurrence_start, occurrence_end))
+        return event
+
+    def get_event(self, calendar_id: str, event_id: str) -> dict:
+        self._before_call("events.get")
+        with self._lock:
+            event = self._events.get(calendar_id, {}).get(event_id)
+        if event is None:
+            raise MockApiError(404, "notFound", "Not Found")
+        return event
+
+    def list_calendars(self) -> dict:
+        self._before_call("calendarList.list")
+        return {"kind": "calendar#calendarList",
+                "items": [{"id": calendar_id, "primary": calendar_id == "primary", "accessRole": "owner"}
+                          for calendar_id in self.calendar_ids]}
+
+    def execute_batch(self, calls: Sequence[Tuple[Callable, tuple]]) -> List[Tuple[Optional[dict], Optional["MockApiError"]]]:
+        """Run several API operations as one round trip; each may still fail on its own, as in Google's batch API"""
+        self._before_call("batch")
+        self._batch.active = True
+        try:
+            results = []
+            for func, args in calls:
+                try:
+                    results.append((func(*args), None))
+                except MockApiError as error:
+                    results.append((None, error))
+            return results
+        finally:
+            self._batch.active = False
+
+    # Simulation
+
+    def busy_periods(self, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Interval]:
+        """Merged busy intervals (generated and booked) overlapping [time_min, time_max)"""
+        intervals = []
+        with self._lock:
+            for day in self._days(time_min, time_max):
+                intervals.extend(self._generated_day(calendar_id, day))
+                intervals.extend(self._booked.get((calendar_id, day), ()))
+        merged: List[Interval] = []
+        for start, end in sorted(intervals):
+            if end <= time_min or start >= time_max:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return [(max(start, time_min), min(end, time_max)) for start, end in merged]
+
+    def events(self, calendar_id: str) -> List[dict]:
+        with self._lock:
+            return list(self._events.get(calendar_id, {}).values())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def _generated_day(self, calendar_id: str, day: date) -> List[Interval]:
+        key = (calendar_id, day)
+        cached = self._generated.get(key)
+        if cached is not None:
+            self._generated.move_to_end(key)
+            return cached
+        busy = self._generate_day(calendar_id, day)
+        self._generated[key] = busy
+        if len(self._generated) > self.cache_days:
+            self._generated.popitem(last=False)
+        return busy
+
+    def _generate_day(self, calendar_id: str, day: date) -> List[Interval]:
+        # How packed this calendar is, fixed per calendar: 15% to 75% of the working day
+        load = 0.15 + 0.6 * random.Random(_stable_seed(self.seed, calendar_id)).random()
+        rng = random.Random(_stable_seed(self.seed, calendar_id, day.toordinal()))
+        if day.weekday() >= 5:
+            # The odd weekend commitment
+            load *= 0.1
+        busy = []
+        start_hour, end_hour = self.workday
+        minute = start_hour * 60
+        while minute < end_hour * 60:
+            hour = minute // 60
+            if rng.random() < load * HOUR_WEIGHTS.get(hour, 0.5):
+                length = rng.choice(MEETING_MINUTES)
+                start = self.timezone.localize(datetime.combine(day, dt_time()) + timedelta(minutes=minute))
+                busy.append((start, start + timedelta(minutes=length)))
+                minute += length
+            else:
+                minute += 30
+        return busy
+
+    def _occurrences(self, body: dict, start: datetime, end: datetime) -> List[Interval]:
+        """Every instance of the event: itself, or its RRULE series minus EXDATEs"""
+        lines = body.get("recurrence") or []
+        rule = next((line[len("RRULE:"):] for line in lines if line.startswith("RRULE:")), None)
+        if rule is None:
+            return [(start, end)]
+        zone = pytz.timezone(body["start"].get("timeZone") or "UTC")
+        excluded = {_parse_time(_rfc5545(value))
+                    for line in lines if line.startswith("EXDATE") for value in line.split(":", 1)[1].split(",")}
+        return [(occurrence_start, occurrence_end) for occurrence_start, occurrence_end
+                in recurrence.expand(rule, start.astimezone(zone), end.astimezone(zone))
+                if occurrence_start not in excluded]
+    
+    def _days(self, start: datetime, end: datetime):
+        day = start.astimezone(self.timezone).date()
+        last = (end - timedelta(microseconds=1)).astimezone(self.timezone).date()
+        while day <= last:
+            yield day
+            day += timedelta(days=1)
+
+    def _before_call(self, method: str):
+        with self._lock:
+            roll = self._rng.random()
+            delay = self.latency + (self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if getattr(self._batch, "active", False):
+            delay = 0.0
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self.rate_limit_rate:
+            self._count(f"{method}.rate_limited")
+            raise MockApiError(429, "rateLimitExceeded", "Rate Limit Exceeded", retry_after=self.retry_after)
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._count(f"{method}.error")
+            raise MockApiError(503, "backendError", "Backend Error")
+        self._count(method)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + 1
+
+
+class _MockRequest:
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+
+    def execute(self, num_retries: int = 0):
+        try:
+            return self._func(*self._args)
+        except MockApiError as error:
+            raise error.to_http_error() from None
+
+
+class _MockBatch:
+    """googleapiclient BatchHttpRequest over the in-process backend"""
+
+    def __init__(self, backend: MockCalendarBackend, callback=None):
+        self._backend = backend
+        self._callback = callback
+        self._requests: List[Tuple[str, _MockRequest, Optional[Callable]]] = []
+
+    def add(self, request: _MockRequest, callback=None, request_id: Optional[str] = None):
+        self._requests.append((request_id or str(len(self._requests) + 1), request, callback))
+
+    def execute(self, num_retries: int = 0):
+        try:
+            results = self._backend.execute_batch([(request._func, request._args) for _, request, _ in self._requests])
+        except MockApiError as error:
+            raise error.to_http_error() from None
+        for (request_id, _, callback), (response, error) in zip(self._requests, results):
+            callback = callback or self._callback
+            if callback is not None:
+                callback(request_id, response, error.to_http_error() if error else None)
+
+
+class _FreeBusy:
+    def __init__(self, backend: MockCalendarBackend):
+        self._backend = backend
+
+    def query(self, body: dict) -> _MockRequest:
+        return _MockRequest(self._backend.query_freebusy, body)
+
+
+class _Events:
+    def __init__(self, backend: MockCalendarBackend):
+        self._backend = backend
+
+    def insert(self, calendarId: str, body: dict, **kwargs) -> _MockRequest:
+        return _MockRequest(self._backend.insert_event, calendarId, body)
+
+    def get(self, calendarId: str, eventId: str, **kwargs) -> _MockRequest:
+        return _MockRequest(self._backend.get_event, calendarId, eventId)
+
+
+class _CalendarList:
+    def __init__(self, backend: MockCalendarBackend):
+        self._backend = backend
+
+    def list(self, **kwargs) -> _MockRequest:
+        return _MockRequest(self._backend.list_calendars)
+
+
+class MockGoogleService:
+    """In-process drop-in for `build('calendar', 'v3', ...)` backed by a MockCalendarBackend"""
+
+    def __init__(self, backend: MockCalendarBackend):
+        self.backend = backend
+
+    def freebusy(self) -> _FreeBusy:
+        return _FreeBusy(self.backend)
+
+    def events(self) -> _Events:
+        return _Events(self.backend)
+
+    def calendarList(self) -> _CalendarList:
+        return _CalendarList(self.backend)
+
+    def new_batch_http_request(self, callback=None) -> _MockBatch:
+        return _MockBatch(self.backend, callback)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockCalendar/1.0"
+
+    @property
+    def backend(self) -> MockCalendarBackend:
+        return self.server.backend
+
+    def do_GET(self):
+        path = self._path()
+        if path == ["users", "me", "calendarList"]:
+            return self._answer(self.backend.list_calendars)
+        operation = self._operation(path, None)
+        if operation is not None:
+            return self._answer(*operation)
+        self._send(404, MockApiError(404, "notFound", "Not Found").body())
+
+    def do_POST(self):
+        path = self._path()
+        data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if path == ["batch", "calendar", "v3"]:
+            return self._batch(self.headers.get("Content-Type", ""), data)
+        try:
+            body = json.loads(data or b"{}")
+        except ValueError:
+            return self._send(400, MockApiError(400, "parseError", "Parse Error").body())
+        operation = self._operation(path, body)
+        if operation is None:
+            return self._send(404, MockApiError(404, "notFound", "Not Found").body())
+        self._answer(*operation)
+
+    def _operation(self, path: List[str], body: Optional[dict]) -> Optional[tuple]:
+        """The backend call for a request; `body` is None for GET"""
+        if path == ["freeBusy"] and body is not None:
+            return self.backend.query_freebusy, body
+        if len(path) == 3 and path[0] == "calendars" and path[2] == "events" and body is not None:
+            return self.backend.insert_event, unquote(path[1]), body
+        if len(path) == 4 and path[0] == "calendars" and path[2] == "events" and body is None:
+            return self.backend.get_event, unquote(path[1]), unquote(path[3])
+        return None
+
+    def _batch(self, content_type: str, data: bytes):
+        """multipart/mixed batch: one HTTP request per part, answered part for part"""
+        message = email.parser.BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + data)
+        parts, calls = [], []
+        for part in message.get_payload():
+            request_line, rest = part.get_payload().split("\n", 1)
+            inner = email.parser.Parser().parsestr(rest)
+            method, path = request_line.split(" ")[:2]
+            try:
+                operation = self._operation(self._path(path),
+                                            None if method == "GET" else json.loads(inner.get_payload() or "{}"))
+            except ValueError:
+                operation = None
+            # Long Content-IDs arrive folded over two lines
+            parts.append((part["Content-ID"].replace("\r", "").replace("\n", ""), operation))
+            if operation is not None:
+                calls.append((operation[0], operation[1:]))
+        try:
+            results = iter(self.backend.execute_batch(calls))
+        except MockApiError as error:
+            return self._send(error.status, error.body(), error.headers())
+
+        boundary = uuid.uuid4().hex
+        chunks = []
+        for content_id, operation in parts:
+            response, error = next(results) if operation is not None else (None, MockApiError(404, "notFound", "Not Found"))
+            status, payload = (error.status, error.body()) if error else (200, response)
+            chunks.append(f"--{boundary}\r\nContent-Type: application/http\r\n"
+                          f"Content-ID: <response-{content_id.strip('<>')}>\r\n\r\n"
+                          f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                          f"Content-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(payload)}\r\n")
+        data = ("".join(chunks) + f"--{boundary}--\r\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _path(self, path: Optional[str] = None) -> List[str]:
+        parts = [part for part in urlsplit(path or self.path).path.split("/") if part]
+        # Accept both the bare api_endpoint layout and Google's /calendar/v3 prefix
+        return parts[2:] if parts[:2] == ["calendar", "v3"] else parts
+
+    def _answer(self, func, *args):
+        try:
+            self._send(200, func(*args))
+        except MockApiError as error:
+            self._send(error.status, error.body(), error.headers())
+
+    def _send(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("mock calendar: " + format, *args)
+
+
+def start_server(backend: MockCalendarBackend, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve `backend` over HTTP on a daemon thread; returns the server and its base URL"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.backend = backend
+    threading.Thread(target=server.serve_forever, name="mock-calendar", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def build_http_service(base_url: str):
+    """googleapiclient Calendar service talking to the HTTP stand-in at `base_url`"""
+    from google.auth.credentials import AnonymousCredentials
+    from googleapiclient.discovery import build
+    from googleapiclient.http import BatchHttpRequest, HttpRequest
+
+    def request_builder(http, *args, **kwargs):
+        # httplib2 connections are not thread-safe; give each request its own
+        return HttpRequest(httplib2.Http(), *args, **kwargs)
+
+    service = build("calendar", "v3", credentials=AnonymousCredentials(), static_discovery=True,
+                    cache_discovery=False, requestBuilder=request_builder,
+                    client_options={"api_endpoint": base_url.rstrip("/")})
+    # The batch endpoint does not follow api_endpoint; send batches to the stand-in too
+    batch_uri = f"{base_url.rstrip('/')}/batch/calendar/v3"
+    service.new_batch_http_request = lambda callback=None: BatchHttpRequest(callback=callback, batch_uri=batch_uri)
+    return service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Google Calendar API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--calendars", type=int, default=1, help="number of simulated calendars")
+    parser.add_argument("--timezone", default="UTC")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of calls answered 429")
+    args = parser.parse_args(argv)
+
+    backend = MockCalendarBackend(seed=args.seed, calendars=args.calendars, timezone=args.timezone,
+                                  latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                  error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    server.backend = backend
+    print(f"Mock Google Calendar API on http://{args.host}:{args.port} "
+          f"(GOOGLE_CALENDAR_API_URL=http://{args.host}:{args.port})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
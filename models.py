@@ -18,11 +18,26 @@ class BookingRequest(BaseModel):
     time: Optional[str] = None
     duration: Optional[int] = 60  # minutes
     attendee_email: Optional[str] = None
+    recurrence: Optional[str] = None  # RRULE body, e.g. "FREQ=WEEKLY;BYDAY=TU;COUNT=8"
+    # Batch scheduling: calendars that must all be free, and a time-of-day window; these and
+    # `time` take the chat's "2:00 PM" form or 24-hour "14:00" (nlp_processor.parse_time_of_day)
+    attendees: List[str] = []
+    not_before: Optional[str] = None
+    not_after: Optional[str] = None
     
 class CalendarSlot(BaseModel):
     start_time: datetime
     end_time: datetime
     available: bool = True
+    stale: bool = False  # computed from cached freebusy data while Google was unreachable
+    as_of: Optional[datetime] = None  # when that cached data was fetched
+
+class ScheduledBooking(BaseModel):
+    request: BookingRequest
+    slot: Optional[CalendarSlot] = None  # None when no time met every constraint
+    reason: Optional[str] = None  # why it was not scheduled
+    event_id: Optional[str] = None
+    booked: Optional[bool] = None  # set once creating the event was attempted
 
 class AgentState(BaseModel):
     messages: List[dict] = []
@@ -32,6 +47,9 @@ class AgentState(BaseModel):
     confirmed_slot: Optional[CalendarSlot] = None
     user_input: str = ""
     agent_response: str = ""
+    session_id: Optional[str] = None  # scopes booking idempotency keys
+    hold_owner: Optional[str] = None  # slot-hold owner of a conversation without a session_id
+    timezone: Optional[str] = None  # user's IANA timezone; None means the calendar's
     
     class Config:
         arbitrary_types_allowed = True
\ No newline at end of file
@@ -1,12 +1,59 @@
+import math
 import re
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Tuple, Optional
 from dateutil import parser
-import pytz
+from recurrence import DEFAULT_COUNT, MAX_OCCURRENCES
+from timezones import CALENDAR_TIMEZONE, get_timezone
+
+WEEKDAY_CODES = {"monday": "MO", "tuesday": "TU", "wednesday": "WE", "thursday": "TH",
+                 "friday": "FR", "saturday": "SA", "sunday": "SU"}
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+                "nine": 9, "ten": 10, "eleven": 11, "twelve": 12}
+_DAY_NAMES = "|".join(WEEKDAY_CODES)
+_NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + ")"
+_TWELVE_HOUR = re.compile(r'\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b', re.IGNORECASE)
+_TWENTY_FOUR_HOUR = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*$')
+# "at 10", "at 2:30": a time without am/pm
+_BARE_TIME = re.compile(r'\bat\s+(\d{1,2})(?::(\d{2}))?\b(?!\s*(?:[:/-]|am\b|pm\b))')
+_MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july", "august", "september",
+                "october", "november", "december"]
+_MONTH = "|".join(sorted({*_MONTH_NAMES, *(name[:3] for name in _MONTH_NAMES), "sept"}, key=len, reverse=True))
+_ORDINAL_DAY = r'(\d{1,2})(?:st|nd|rd|th)?'
+# "December 1", "Dec 1st, 2026", "1 December", "the 1st of December"
+_MONTH_DAY = re.compile(rf'\b({_MONTH})\.?\s+{_ORDINAL_DAY}\b(?:,?\s+(\d{{4}})\b)?')
+_DAY_MONTH = re.compile(rf'\b{_ORDINAL_DAY}\s+(?:of\s+)?({_MONTH})\b\.?(?:,?\s+(\d{{4}})\b)?')
+# "on the 15th": a day of the month
+_ON_DAY_OF_MONTH = re.compile(r'\bon\s+the\s+(\d{1,2})(?:st|nd|rd|th)\b')
+_UNTIL = re.compile(r'\b(?:until|till|through|ending(?:\s+on)?)\s+')
+
+def parse_time_of_day(time_str: Optional[str]) -> Optional[int]:
+    """Minutes after midnight for "2:00 PM", "2pm", "14:30", "noon" or "midnight"; None otherwise"""
+    if not time_str:
+        return None
+    match = _TWELVE_HOUR.search(time_str)
+    if match:
+        hour, minute, period = int(match.group(1)), int(match.group(2) or 0), match.group(3).upper()
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if period == 'PM' else 0)
+    else:
+        match = _TWENTY_FOUR_HOUR.match(time_str)
+        if match:
+            hour, minute = int(match.group(1)), int(match.group(2))
+        elif time_str.strip().lower() in ("noon", "midday"):
+            hour, minute = 12, 0
+        elif time_str.strip().lower() == "midnight":
+            hour, minute = 0, 0
+        else:
+            return None
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
 
 class NLPProcessor:
-    def __init__(self, timezone='UTC'):
-        self.timezone = pytz.timezone(timezone)
+    def __init__(self, timezone=CALENDAR_TIMEZONE):
+        self.timezone = get_timezone(timezone)
         
         # Enhanced intent patterns - more comprehensive
         self.booking_intents = [
@@ -59,6 +106,15 @@ class NLPProcessor:
             r'\b(second|2nd|two|2)\b', 
             r'\b(third|3rd|three|3)\b',
         ]
+        
+        # Recurrence patterns as (pattern, FREQ, INTERVAL, BYDAY), most specific first
+        self.recurrence_patterns = [
+            (r'\b(every|each)\s+weekday\b|\bon\s+weekdays\b', "WEEKLY", 1, "MO,TU,WE,TH,FR"),
+            (r'\b(biweekly|fortnightly|every\s+(other|2|two)\s+weeks?)\b', "WEEKLY", 2, None),
+            (r'\b(daily|every\s+day|each\s+day)\b', "DAILY", 1, None),
+            (r'\b(weekly|every\s+week|each\s+week)\b', "WEEKLY", 1, None),
+            (r'\b(monthly|every\s+month|each\s+month)\b', "MONTHLY", 1, None),
+        ]
     
     def extract_intent(self, text: str) -> str:
         """Extract user intent from text"""
@@ -86,18 +142,88 @@ class NLPProcessor:
         
         return "general"
     
-    def extract_datetime_info(self, text: str) -> Tuple[Optional[str], Optional[str]]:
-        """Extract date and time information from text"""
+    def extract_datetime_info(self, text: str, timezone=None) -> Tuple[Optional[str], Optional[str]]:
+        """Extract date and time information from text; relative dates are read in `timezone`"""
         text_lower = text.lower()
         
         # Extract date
-        date_match = self._extract_date(text_lower)
+        date_match = self._extract_date(text_lower, timezone)
         
         # Extract time
         time_match = self._extract_time(text_lower)
         
         return date_match, time_match
     
+    def extract_recurrence(self, text: str) -> Optional[str]:
+        """RRULE body for a recurring request ("every Tuesday for 8 weeks"), or None"""
+        text_lower, until = self._split_until(text.lower())
+        frequency, interval, by_day = None, 1, None
+        
+        # Named days: "every Tuesday", "every other Monday and Thursday", "on Fridays"
+        every_days = re.search(rf'\b(?:every|each)\s+(other\s+)?((?:(?:{_DAY_NAMES})s?(?:\s*,\s*|\s+and\s+)?)+)', text_lower)
+        plural_days = re.findall(rf'\b({_DAY_NAMES})s\b', text_lower)
+        if every_days or plural_days:
+            names = re.findall(_DAY_NAMES, every_days.group(2)) if every_days else plural_days
+            frequency, by_day = "WEEKLY", ",".join(dict.fromkeys(WEEKDAY_CODES[name] for name in names))
+            interval = 2 if every_days and every_days.group(1) else 1
+        else:
+            for pattern, pattern_frequency, pattern_interval, pattern_days in self.recurrence_patterns:
+                if re.search(pattern, text_lower):
+                    frequency, interval, by_day = pattern_frequency, pattern_interval, pattern_days
+                    break
+        if frequency is None:
+            return None
+        if frequency == "WEEKLY" and not by_day:
+            # "every other week on Friday", "weekly on Monday and Thursday"
+            names = re.findall(rf'\b({_DAY_NAMES})\b', text_lower)
+            by_day = ",".join(dict.fromkeys(WEEKDAY_CODES[name] for name in names)) or None
+        
+        rule = f"FREQ={frequency}"
+        if interval > 1:
+            rule += f";INTERVAL={interval}"
+        if by_day:
+            rule += f";BYDAY={by_day}"
+        month_day = _ON_DAY_OF_MONTH.search(text_lower)
+        if frequency == "MONTHLY" and month_day and 1 <= int(month_day.group(1)) <= 31:
+            rule += f";BYMONTHDAY={int(month_day.group(1))}"
+        if until:
+            # Through the end of that day, in the meeting's local time
+            return f"{rule};UNTIL={until:%Y%m%d}T235959"
+        count = self._recurrence_count(text_lower, frequency, interval, by_day)
+        return f"{rule};COUNT={count}"
+    
+    def _split_until(self, text: str) -> Tuple[str, Optional[date]]:
+        """The text before an end date ("until December 1") and that date, or the whole text and None"""
+        for match in _UNTIL.finditer(text):
+            end = self._calendar_date(text[match.end():], datetime.now(self.timezone).date(), anchored=True)
+            if end:
+                return text[:match.start()], end
+        return text, None
+    
+    def _recurrence_count(self, text: str, frequency: str, interval: int, by_day: Optional[str]) -> int:
+        """Number of meetings asked for ("for 8 weeks", "6 sessions"), else DEFAULT_COUNT"""
+        per_week = len(by_day.split(",")) if by_day else 1
+        count = DEFAULT_COUNT
+        match = re.search(rf'\b{_NUMBER}\s+(times|sessions|meetings|occurrences)\b', text)
+        if match:
+            count = self._number(match.group(1))
+        else:
+            match = re.search(rf'\bfor\s+(?:the\s+next\s+)?{_NUMBER}\s+(days?|weeks?|months?)\b', text)
+            if match:
+                amount, unit = self._number(match.group(1)), match.group(2).rstrip("s")
+                days = amount * {"day": 1, "week": 7, "month": 30}[unit]
+                if frequency == "DAILY":
+                    count = days
+                elif frequency == "WEEKLY":
+                    count = math.ceil(days / 7 / interval) * per_week
+                else:
+                    count = amount if unit == "month" else max(1, days // 30)
+        return max(1, min(count, MAX_OCCURRENCES))
+    
+    @staticmethod
+    def _number(value: str) -> int:
+        return NUMBER_WORDS.get(value) or int(value)
+    
     def extract_slot_selection(self, text: str) -> Optional[int]:
         """Extract slot selection from user input"""
         text_lower = text.lower()
@@ -108,9 +234,11 @@ class NLPProcessor:
         
         return None
     
-    def _extract_date(self, text: str) -> Optional[str]:
+    def _extract_date(self, text: str, timezone=None) -> Optional[str]:
         """Extract date from text"""
-        now = datetime.now(self.timezone)
+        now = datetime.now(timezone or self.timezone)
+        # A series' end date ("every Tuesday until December 1") is not its first meeting
+        text = self._split_until(text)[0]
         
         # Handle relative dates
         if "today" in text:
@@ -147,29 +275,58 @@ class NLPProcessor:
                 return now.strftime("%Y-%m-%d")
         
         # Try to parse explicit dates
-        # MM/DD/YYYY format
-        date_matches = re.findall(r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b', text)
-        if date_matches:
-            month, day, year = date_matches[0]
-            try:
-                parsed_date = datetime(int(year), int(month), int(day))
-                return parsed_date.strftime("%Y-%m-%d")
-            except ValueError:
-                pass
+        parsed_date = self._calendar_date(text, now.date())
+        if parsed_date:
+            return parsed_date.strftime("%Y-%m-%d")
         
+        # "on the 15th": the next such day of a month
+        month_day = _ON_DAY_OF_MONTH.search(text)
+        if month_day:
+            year, month = now.year, now.month
+            for _ in range(13):
+                try:
+                    parsed_date = date(year, month, int(month_day.group(1)))
+                except ValueError:
+                    parsed_date = None
+                if parsed_date and parsed_date >= now.date():
+                    return parsed_date.strftime("%Y-%m-%d")
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        
+        return None
+    
+    @staticmethod
+    def _calendar_date(text: str, today: date, anchored: bool = False) -> Optional[date]:
+        """First explicit date in `text` (MM/DD/YYYY, MM/DD, "December 1"); a date without a
+        year is the next one from `today`. With `anchored` the date must start the text."""
+        candidates = []
+        # MM/DD/YYYY format
+        match = re.search(r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b', text)
+        if match:
+            candidates.append((match, int(match.group(1)), int(match.group(2)), match.group(3)))
         # MM/DD format (assume current year)
-        date_matches = re.findall(r'\b(\d{1,2})/(\d{1,2})\b', text)
-        if date_matches:
-            month, day = date_matches[0]
+        match = re.search(r'\b(\d{1,2})/(\d{1,2})\b(?!/)', text)
+        if match:
+            candidates.append((match, int(match.group(1)), int(match.group(2)), None))
+        match = _MONTH_DAY.search(text)
+        if match:
+            month = _MONTH_NAMES.index(next(name for name in _MONTH_NAMES if name.startswith(match.group(1)[:3])))
+            candidates.append((match, month + 1, int(match.group(2)), match.group(3)))
+        match = _DAY_MONTH.search(text)
+        if match:
+            month = _MONTH_NAMES.index(next(name for name in _MONTH_NAMES if name.startswith(match.group(2)[:3])))
+            candidates.append((match, month + 1, int(match.group(1)), match.group(3)))
+        
+        for match, month, day, year in sorted(candidates, key=lambda candidate: candidate[0].start()):
+            if anchored and text[:match.start()].strip(" ,") not in ("", "the"):
+                continue
             try:
-                parsed_date = datetime(now.year, int(month), int(day))
+                parsed_date = date(int(year or today.year), month, day)
                 # If the date is in the past, assume next year
-                if parsed_date < now:
-                    parsed_date = datetime(now.year + 1, int(month), int(day))
-                return parsed_date.strftime("%Y-%m-%d")
+                if not year and parsed_date < today:
+                    parsed_date = date(today.year + 1, month, day)
+                return parsed_date
             except ValueError:
-                pass
-        
+                continue
         return None
     
     def _extract_time(self, text: str) -> Optional[str]:
@@ -192,6 +349,21 @@ class NLPProcessor:
             hour, period = time_match.groups()
             return f"{hour}:00 {period.upper()}"
         
+        # Handle a bare time after "at", read as a working hour unless the text says otherwise
+        time_match = _BARE_TIME.search(text)
+        if time_match:
+            hour, minute = int(time_match.group(1)), time_match.group(2) or "00"
+            if hour <= 23 and int(minute) <= 59:
+                if hour == 0 or hour > 12:
+                    period = "AM" if hour == 0 else "PM"
+                elif re.search(r'\b(afternoon|evening|tonight)\b', text):
+                    period = "PM"
+                elif "morning" in text:
+                    period = "AM" if hour < 12 else "PM"
+                else:
+                    period = "AM" if 8 <= hour <= 11 else "PM"
+                return f"{(hour % 12) or 12}:{minute} {period}"
+        
         # Handle general times
         if "morning" in text:
             return "9:00 AM"
@@ -206,19 +378,5 @@ class NLPProcessor:
     
     def parse_time_to_hour(self, time_str: str) -> Optional[int]:
         """Parse time string to hour (24-hour format)"""
-        if not time_str:
-            return None
-            
-        try:
-            time_match = re.search(r'(\d{1,2}):?(\d{2})?\s*(am|pm|AM|PM)', time_str)
-            if time_match:
-                hour, minute, period = time_match.groups()
-                hour = int(hour)
-                if period.upper() == 'PM' and hour != 12:
-                    hour += 12
-                elif period.upper() == 'AM' and hour == 12:
-                    hour = 0
-                return hour
-        except:
-            pass
-        return None
\ No newline at end of file
+        minute = parse_time_of_day(time_str)
+        return None if minute is None else minute // 60
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Predictive prefetch of freebusy data.
+
+The date of a booking is usually known a turn or more before the time, so
+the agents ask the calendar service to warm the freebusy cache for that day
+(and its neighbours) in the background. When availability is checked later
+the lookup is classified and exported:
+
+  - warm:   served from a prefetched cache entry; the whole fetch was hidden
+  - joined: a prefetch was still in flight and the request waited for the rest
+  - cached: served from an entry an earlier request fetched
+  - cold:   nothing to reuse; the user waited for the full Google call
+
+`booking_prefetch_hidden_seconds` records how much Google latency each warm or
+joined lookup did not have to wait for.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from freebusy_cache import FreeBusyEntry
+from metrics import PREFETCH_HIDDEN_SECONDS, PREFETCH_LOOKUPS, PREFETCH_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Runs best-effort warm-up calls on a small bounded pool"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, enabled: bool = True):
+        self.enabled = enabled
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._started = PREFETCH_REQUESTS.labels("started")
+        self._skipped = PREFETCH_REQUESTS.labels("skipped")
+        self._dropped = PREFETCH_REQUESTS.labels("dropped")
+        self._failed = PREFETCH_REQUESTS.labels("failed")
+
+    def submit(self, func: Callable[[], object]) -> bool:
+        """Queue `func` unless prefetching is off or the pool is saturated"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._dropped.inc()
+                return False
+            self._pending += 1
+        self._started.inc()
+        # Keep the request's trace and log context on the prefetch
+        context = contextvars.copy_context()
+        try:
+            self._pool.submit(context.run, self._run, func)
+        except RuntimeError:
+            # Shut down between the `enabled` check and here
+            with self._lock:
+                self._pending -= 1
+            return False
+        return True
+
+    def shutdown(self):
+        """Drop queued prefetches and let running ones finish; they only warm caches"""
+        self.enabled = False
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def skip(self):
+        """Count a prefetch that was unnecessary (already warm or in flight)"""
+        self._skipped.inc()
+
+    def _run(self, func: Callable[[], object]):
+        try:
+            func()
+        except Exception as error:
+            # Prefetch is an optimisation; the real lookup will surface errors
+            self._failed.inc()
+            logger.debug("Prefetch failed: %s", error)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def record_hit(self, entry: FreeBusyEntry):
+        if entry.prefetched:
+            PREFETCH_LOOKUPS.labels("warm").inc()
+            PREFETCH_HIDDEN_SECONDS.observe(entry.fetch_seconds)
+        else:
+            PREFETCH_LOOKUPS.labels("cached").inc()
+
+    def record_miss(self, joined: Optional[FreeBusyEntry], waited: float):
+        """`joined` is the entry produced by an in-flight call the lookup waited on"""
+        if joined is not None and joined.prefetched:
+            PREFETCH_LOOKUPS.labels("joined").inc()
+            PREFETCH_HIDDEN_SECONDS.observe(max(0.0, joined.fetch_seconds - waited))
+        else:
+            PREFETCH_LOOKUPS.labels("cold").inc()
+
+
+prefetcher = Prefetcher(
+    max_workers=int(os.getenv("PREFETCH_WORKERS", "2")),
+    enabled=os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes"),
+)
+
+# Days either side of the requested date to warm as well
+ADJACENT_DAYS = int(os.getenv("PREFETCH_ADJACENT_DAYS", "1"))
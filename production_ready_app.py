@@ -383,6 +383,7 @@ def initialize_session_state():
     defaults = {
         'messages': [],
         'session_id': str(uuid.uuid4()),
+        'client_id': str(uuid.uuid4()),  # this browser session for the API's rate limits; kept across new chats
         'agent_state': None,
         'joke_count': 0,
         'personality_mode': True,
@@ -558,6 +559,24 @@ def import_agent_components():
 # Initialize components
 SimpleBookingAgent, CalendarService, AgentState = import_agent_components()
 
+# Backend mode: talk to the FastAPI service instead of running the agent here
+from api_client import BackendUnavailableError, backend_mode_enabled, get_api_client, state_from_response
+from resilience import CircuitOpenError
+
+def run_agent_turn(agent, message: str):
+    """Run one agent turn in-process or against the FastAPI backend"""
+    if backend_mode_enabled():
+        client = get_api_client()
+        if st.session_state.agent_state is None:
+            health = client.health()
+            st.session_state.connection_status = "connected" if health.get("calendar_authenticated") else "demo"
+        data = client.chat(message, st.session_state.session_id, client_id=st.session_state.client_id)
+        return state_from_response(data, st.session_state.agent_state)
+    
+    if st.session_state.agent_state is None:
+        st.session_state.agent_state = AgentState()
+    return agent.process_message(message, st.session_state.agent_state, session_id=st.session_state.session_id)
+
 @st.cache_resource
 def get_booking_agent():
     """Initialize and cache the booking agent with enhanced error handling"""
@@ -586,8 +605,8 @@ def get_booking_agent():
 def process_message_with_ai(message: str) -> Optional[Dict[str, Any]]:
     """Process message with enhanced AI and personality"""
     try:
-        agent = get_booking_agent()
-        if not agent:
+        agent = None if backend_mode_enabled() else get_booking_agent()
+        if not agent and not backend_mode_enabled():
             return {
                 "response": "I'm currently running in limited mode. I can still help you with basic scheduling questions!",
                 "state": "demo",
@@ -595,10 +614,6 @@ def process_message_with_ai(message: str) -> Optional[Dict[str, Any]]:
                 "booking_info": {}
             }
         
-        # Initialize agent state if needed
-        if st.session_state.agent_state is None:
-            st.session_state.agent_state = AgentState()
-        
         # Detect personality and generate appropriate response
         personality = PersonalityEngine.detect_personality(message) if message.strip() else "normal"
         personality_prefix = ""
@@ -607,7 +622,7 @@ def process_message_with_ai(message: str) -> Optional[Dict[str, Any]]:
             personality_prefix = PersonalityEngine.get_personality_response(personality)
         
         # Process message through agent
-        st.session_state.agent_state = agent.process_message(message, st.session_state.agent_state)
+        st.session_state.agent_state = run_agent_turn(agent, message)
         
         # Get base response
         base_response = st.session_state.agent_state.agent_response
@@ -637,6 +652,14 @@ def process_message_with_ai(message: str) -> Optional[Dict[str, Any]]:
                 "title": getattr(st.session_state.agent_state.booking_request, 'title', None)
             }
         }
+    except (BackendUnavailableError, CircuitOpenError) as e:
+        logger.warning(f"Booking API unavailable: {e}")
+        return {
+            "response": "The booking service is busy right now. Please try again in a moment! ⏳",
+            "state": "error",
+            "personality": "helpful",
+            "booking_info": {}
+        }
     except Exception as e:
         logger.error(f"Error processing message: {e}")
         return {
@@ -0,0 +1,289 @@
+"""
+Opt-in profiling of single /chat turns.
+
+A turn is profiled when the request carries `X-Profile: sample|cprofile` with a
+valid `X-Admin-Token`, or when an admin has armed the profiler for the next N
+turns. Profiles live in a bounded in-memory ring:
+
+  - "sample": a background thread snapshots the stacks of the turn's threads
+    every PROFILING_INTERVAL_MS; cheap enough for production, exportable as
+    speedscope JSON and aggregated into a folded-stack flame view
+  - "cprofile": deterministic cProfile, exportable as a .pstats file
+
+A turn's work is not confined to the thread that handles it: LangGraph runs
+each node in a fresh executor thread, which carries a copy of the caller's
+context. While a profile is being taken, threads started anywhere get a
+profile hook (threading.setprofile) that checks the context on the next call:
+a thread working for the profiled turn joins it (is sampled, or gets its own
+cProfile, merged into one .pstats at the end) and the hook removes itself.
+Sampled profiles count each thread separately, so they can hold more samples
+than the turn's duration / interval.
+"""
+
+import contextvars
+import cProfile
+import hmac
+import itertools
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional, Set
+
+MODES = ("sample", "cprofile")
+
+
+class ProfileRecord:
+    def __init__(self, profile_id: int, mode: str, label: str, duration: float,
+                 samples: Optional[Counter] = None, pstats_data: Optional[bytes] = None,
+                 interval: float = 0.0):
+        self.id = profile_id
+        self.mode = mode
+        self.label = label
+        self.created = time.time()
+        self.duration = duration
+        self.samples = samples
+        self.pstats_data = pstats_data
+        self.interval = interval
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "label": self.label,
+            "created": self.created,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": sum(self.samples.values()) if self.samples else None,
+        }
+
+
+class _Capture:
+    """The threads working on one profiled turn"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.threads: Set[int] = set()
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def join(self):
+        """Add the calling thread; in cprofile mode this starts its profile"""
+        thread_id = threading.get_ident()
+        with self._lock:
+            if thread_id in self.threads:
+                return
+            self.threads.add(thread_id)
+            if self.mode == "cprofile":
+                profile = cProfile.Profile()
+                self.profiles.append(profile)
+                profile.enable()
+
+    def pstats_data(self) -> bytes:
+        """Stats of every thread's profile, merged; stops them"""
+        with self._lock:
+            profiles = list(self.profiles)
+        stats = pstats.Stats(profiles[0])
+        if len(profiles) > 1:
+            stats.add(*profiles[1:])
+        return marshal.dumps(stats.stats)
+
+
+# The capture of the turn a thread is working for; executor threads get a copy
+_capture: "contextvars.ContextVar[Optional[_Capture]]" = contextvars.ContextVar("profiling_capture", default=None)
+_captures_active = 0
+_captures_lock = threading.Lock()
+
+
+def _join_capture(frame, event, arg):
+    """Profile hook of threads started while a capture is active"""
+    capture = _capture.get()
+    if capture is not None:
+        if capture.mode != "cprofile":
+            sys.setprofile(None)
+        # In cprofile mode the thread's profile replaces this hook
+        capture.join()
+    elif not _captures_active:
+        sys.setprofile(None)
+
+
+def _start_capture(capture: _Capture) -> contextvars.Token:
+    global _captures_active
+    with _captures_lock:
+        _captures_active += 1
+        if _captures_active == 1:
+            threading.setprofile(_join_capture)
+    capture.join()
+    return _capture.set(capture)
+
+
+def _end_capture(capture: _Capture, token: contextvars.Token):
+    global _captures_active
+    _capture.reset(token)
+    with _captures_lock:
+        _captures_active -= 1
+        if not _captures_active:
+            threading.setprofile(None)
+
+
+class StackSampler:
+    """Samples the Python stacks of a set of threads at a fixed interval from a helper thread"""
+
+    def __init__(self, thread_ids: Set[int], interval: float):
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[tuple(stack)] += 1
+
+
+class Profiler:
+    def __init__(self, capacity: int = 50, interval: float = 0.002, admin_token: Optional[str] = None):
+        self.interval = interval
+        self.admin_token = admin_token
+        self._records: deque = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._armed_mode = "sample"
+        self._armed_remaining = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.admin_token)
+
+    def authorized(self, token: Optional[str]) -> bool:
+        # Constant time, so response timing does not reveal how much of a guess was right
+        return self.enabled and hmac.compare_digest((token or "").encode(), self.admin_token.encode())
+
+    def arm(self, count: int, mode: str = "sample"):
+        """Profile the next `count` turns regardless of headers"""
+        with self._lock:
+            self._armed_mode = mode
+            self._armed_remaining = max(0, count)
+
+    def requested_mode(self, header_mode: Optional[str], token: Optional[str]) -> Optional[str]:
+        """Decide whether (and how) to profile the current turn"""
+        if not self.enabled:
+            return None
+        if header_mode and header_mode in MODES and self.authorized(token):
+            return header_mode
+        if self._armed_remaining:
+            with self._lock:
+                if self._armed_remaining:
+                    self._armed_remaining -= 1
+                    return self._armed_mode
+        return None
+
+    def run(self, mode: Optional[str], label: str, func: Callable, *args, **kwargs):
+        """Call `func`, profiling it when `mode` is set"""
+        if mode is None:
+            return func(*args, **kwargs)
+
+        capture = _Capture(mode)
+        sampler = StackSampler(capture.threads, self.interval) if mode != "cprofile" else None
+        started = time.perf_counter()
+        if sampler is not None:
+            sampler.start()
+        token = _start_capture(capture)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _end_capture(capture, token)
+            duration = time.perf_counter() - started
+            if sampler is None:
+                self._store(mode, label, duration, pstats_data=capture.pstats_data())
+            else:
+                self._store(mode, label, duration, samples=sampler.stop())
+
+    def _store(self, mode: str, label: str, duration: float, **data):
+        record = ProfileRecord(next(self._ids), mode, label, duration, interval=self.interval, **data)
+        with self._lock:
+            self._records.append(record)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [record.summary() for record in reversed(self._records)]
+
+    def get(self, profile_id: int) -> Optional[ProfileRecord]:
+        with self._lock:
+            for record in self._records:
+                if record.id == profile_id:
+                    return record
+        return None
+
+    def flame(self, last: int = 20) -> str:
+        """Folded stacks ("a;b;c count") aggregated over the last N sampled profiles"""
+        with self._lock:
+            sampled = [r for r in self._records if r.samples][-last:]
+        totals: Counter = Counter()
+        for record in sampled:
+            totals.update(record.samples)
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in totals.most_common()) + "\n"
+
+
+def to_pstats_file(record: ProfileRecord) -> bytes:
+    """The raw marshalled stats dict, loadable with pstats.Stats(path)"""
+    return record.pstats_data or b""
+
+
+def to_speedscope(record: ProfileRecord) -> Dict[str, Any]:
+    """Speedscope "sampled" profile for a stack-sampled record"""
+    frames: List[Dict[str, str]] = []
+    frame_index: Dict[str, int] = {}
+    samples: List[List[int]] = []
+    weights: List[float] = []
+    for stack, count in record.samples.items():
+        indexes = []
+        for name in stack:
+            if name not in frame_index:
+                frame_index[name] = len(frames)
+                frames.append({"name": name})
+            indexes.append(frame_index[name])
+        samples.append(indexes)
+        weights.append(count * record.interval * 1000)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": f"profile {record.id}: {record.label}",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "exporter": "calendar-booking-agent",
+    }
+
+
+profiler = Profiler(
+    capacity=int(os.getenv("PROFILING_RING_SIZE", "50")),
+    interval=float(os.getenv("PROFILING_INTERVAL_MS", "2")) / 1000.0,
+    admin_token=os.getenv("PROFILING_ADMIN_TOKEN") or None,
+)
@@ -0,0 +1,205 @@
+"""
+Per-client rate limits for the API.
+
+Clients are identified by the address they connect from. Requests relayed
+by RATE_LIMIT_TRUSTED_PROXIES (a gateway, or the Streamlit UI in backend
+mode, which serves all its users from one address) are attributed to the
+RATE_LIMIT_KEY_HEADER value they carry (e.g. an API key or a UI session id),
+else to the first X-Forwarded-For address. Two limits apply:
+
+- RateLimitMiddleware gives every client a token bucket of RATE_LIMIT_RPS
+  requests per second with bursts of RATE_LIMIT_BURST, and answers 429 with
+  Retry-After once it is empty. It is plain ASGI, so a request costs a
+  header lookup and one dictionary update on top of the route.
+- SessionQuota allows each client SESSION_CREATE_LIMIT new conversations per
+  SESSION_CREATE_WINDOW seconds. It is charged where a session is actually
+  created (main.run_turn), because a client-chosen session id the store has
+  never seen creates a session just like a missing one.
+
+Each client costs a fixed few dozen bytes: the bucket is kept as a single
+theoretical arrival time (GCRA, equivalent to a token bucket) and the quota
+as a sliding-window counter (this window's count plus the previous one's,
+weighted by overlap). Both tables are LRU-ordered and capped at
+RATE_LIMIT_MAX_CLIENTS; the least recently seen client is evicted first, and
+an idle client has a full bucket anyway.
+"""
+
+import ipaddress
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from metrics import RATE_LIMITED
+
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no")
+REQUESTS_PER_SECOND = float(os.getenv("RATE_LIMIT_RPS", "5"))
+BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+KEY_HEADER = os.getenv("RATE_LIMIT_KEY_HEADER", "X-Client-ID").lower().encode("latin-1")
+# Networks whose identity headers are believed; anyone else could forge them
+TRUSTED_PROXIES = [ipaddress.ip_network(network.strip(), strict=False)
+                   for network in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if network.strip()]
+SESSION_CREATE_LIMIT = int(os.getenv("SESSION_CREATE_LIMIT", "20"))
+SESSION_CREATE_WINDOW = float(os.getenv("SESSION_CREATE_WINDOW", "3600"))
+EXEMPT_PATHS = ("/health", "/metrics")
+
+
+class QuotaExceededError(Exception):
+    """Raised when a client is over a quota; `retry_after` is in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@lru_cache(maxsize=1024)
+def _trusted(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def client_key(scope) -> str:
+    """Who sent an ASGI request: the peer address, or the identity a trusted proxy relayed"""
+    client = scope.get("client")
+    host = client[0] if client else "unknown"
+    if not TRUSTED_PROXIES or not _trusted(host):
+        return "ip:" + host
+    forwarded = None
+    for name, value in scope.get("headers", ()):
+        if name == KEY_HEADER:
+            return "key:" + value.decode("latin-1")
+        if name == b"x-forwarded-for":
+            forwarded = value
+    if forwarded:
+        return "ip:" + forwarded.split(b",", 1)[0].strip().decode("latin-1")
+    return "ip:" + host
+
+
+class ClientRateLimiter:
+    """Thread-safe token bucket per client, in a bounded LRU table; a `rate` of 0 allows everything"""
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND, burst: float = BURST, max_clients: int = MAX_CLIENTS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self.enabled = rate > 0
+        self._interval = 1.0 / rate if self.enabled else 0.0
+        # A request is allowed while the client's arrival time is at most this far ahead of now
+        self._tolerance = (self.burst - 1) * self._interval
+        self._arrivals: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client: str) -> float:
+        """Take a token for `client`; 0.0 if allowed, else seconds until one is available"""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            arrival = max(self._arrivals.get(client, now), now)
+            wait = arrival - now - self._tolerance
+            if wait > 0:
+                return wait
+            self._arrivals[client] = arrival + self._interval
+            self._arrivals.move_to_end(client)
+            if len(self._arrivals) > self.max_clients:
+                self._arrivals.popitem(last=False)
+        return 0.0
+
+    def __len__(self) -> int:
+        return len(self._arrivals)
+
+
+class SessionQuota:
+    """Thread-safe sliding-window count of new sessions per client, in a bounded LRU table.
+
+    A `limit` or `window` of 0 allows everything.
+    """
+
+    def __init__(self, limit: int = SESSION_CREATE_LIMIT, window: float = SESSION_CREATE_WINDOW,
+                 max_clients: int = MAX_CLIENTS):
+        self.limit = limit
+        self.window = window
+        self.max_clients = max_clients
+        self.enabled = limit > 0 and window > 0
+        # client -> (window number, previous window's count, this window's count)
+        self._counts: "OrderedDict[str, Tuple[int, int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def charge(self, client: str):
+        """Count one new session for `client`; raises QuotaExceededError when over the limit"""
+        if not self.enabled:
+            return
+        now = time.time()
+        number, offset = divmod(now, self.window)
+        number = int(number)
+        with self._lock:
+            last, previous, current = self._counts.get(client, (number, 0, 0))
+            if number != last:
+                previous, current = (current if number == last + 1 else 0), 0
+            # The previous window counts for the part of it still inside the sliding window
+            weight = 1 - offset / self.window
+            if previous * weight + current + 1 > self.limit:
+                RATE_LIMITED.labels("sessions").inc()
+                raise QuotaExceededError("Too many new sessions",
+                                         max(1, math.ceil(self._retry_after(offset, previous, current))))
+            self._counts[client] = (number, previous, current + 1)
+            self._counts.move_to_end(client)
+            if len(self._counts) > self.max_clients:
+                self._counts.popitem(last=False)
+
+    def _retry_after(self, offset: float, previous: int, current: int) -> float:
+        """Seconds until enough past sessions slide out of the window to allow one more"""
+        excess = previous * (1 - offset / self.window) + current + 1 - self.limit
+        if previous and excess <= previous * (1 - offset / self.window):
+            return excess / previous * self.window
+        # Not before this window ends and enough of it has slid out in turn
+        remaining = self.window - offset
+        if current + 1 > self.limit and current:
+            remaining += (current + 1 - self.limit) / current * self.window
+        return remaining
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying a ClientRateLimiter to every HTTP request outside `exempt`.
+
+    Stores the client key in the request state (`request.state.client`) for
+    quotas charged by the routes themselves.
+    """
+
+    def __init__(self, app, limiter: ClientRateLimiter, exempt: Iterable[str] = EXEMPT_PATHS):
+        self.app = app
+        self.limiter = limiter
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        client = client_key(scope)
+        scope.setdefault("state", {})["client"] = client
+        wait = self.limiter.acquire(client)
+        if wait:
+            RATE_LIMITED.labels("requests").inc()
+            response = JSONResponse({"detail": "Too many requests"}, status_code=429,
+                                    headers={"Retry-After": str(max(1, math.ceil(wait)))})
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def request_client(scope) -> str:
+    """The client key stored by RateLimitMiddleware, or computed when it is not installed"""
+    client: Optional[str] = scope.get("state", {}).get("client")
+    return client or client_key(scope)
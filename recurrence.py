@@ -0,0 +1,155 @@
+"""
+Recurring bookings.
+
+A recurrence is kept on the booking request as an RFC 5545 RRULE body, e.g.
+"FREQ=WEEKLY;BYDAY=TU;COUNT=8", and booked as one recurring Google event
+rather than one insert per meeting. Occurrences are expanded with dateutil in
+the slot's local wall time, so "every Tuesday at 10" stays at 10 across DST.
+An end date ("until December 1") is kept as a local UNTIL, the end of that
+day, and only converted to UTC when the event is booked (calendar_rule).
+A slot restored from a checkpoint carries a fixed UTC offset rather than its
+zone, so callers pass the conversation's zone and the series is expanded in
+it; otherwise every meeting after a DST change would shift by an hour.
+
+All occurrences are checked against a single freebusy query spanning the
+series: IntervalIndex answers each overlap test with a binary search, and
+occurrences that clash are left out of the series with EXDATE.
+"""
+
+import bisect
+import itertools
+import os
+from datetime import datetime
+from typing import Dict, List, Sequence, Tuple
+
+import pytz
+from dateutil.rrule import rrulestr
+
+Interval = Tuple[float, float]
+
+# Open-ended requests ("every Tuesday") become this many meetings
+DEFAULT_COUNT = int(os.getenv("RECURRENCE_DEFAULT_COUNT", "10"))
+MAX_OCCURRENCES = int(os.getenv("RECURRENCE_MAX_OCCURRENCES", "52"))
+
+_WEEKDAYS = {"MO": "Monday", "TU": "Tuesday", "WE": "Wednesday", "TH": "Thursday",
+             "FR": "Friday", "SA": "Saturday", "SU": "Sunday"}
+
+
+def parse_rule(rule: str) -> Dict[str, str]:
+    return dict(part.split("=", 1) for part in rule.split(";") if "=" in part)
+
+
+def format_rule(parts: Dict[str, str]) -> str:
+    return ";".join(f"{name}={value}" for name, value in parts.items())
+
+
+def _localize(timezone, local: datetime) -> datetime:
+    return timezone.localize(local) if hasattr(timezone, "localize") else local.replace(tzinfo=timezone)
+
+
+def _local_rule(rule: str, timezone) -> str:
+    """`rule` with a UTC UNTIL (as Google returns it) in the meeting's local wall time"""
+    parts = parse_rule(rule)
+    until = parts.get("UNTIL", "")
+    if not until.endswith("Z"):
+        return rule
+    utc = pytz.UTC.localize(datetime.strptime(until, "%Y%m%dT%H%M%SZ"))
+    parts["UNTIL"] = utc.astimezone(timezone).strftime("%Y%m%dT%H%M%S")
+    return format_rule(parts)
+
+
+def expand(rule: str, start: datetime, end: datetime, limit: int = MAX_OCCURRENCES,
+           timezone=None) -> List[Tuple[datetime, datetime]]:
+    """(start, end) of the first `limit` occurrences of `rule` for a meeting at start..end.
+
+    The meeting itself is always the first occurrence and counts towards
+    COUNT, as in RFC 5545 and Google Calendar, even when its day does not
+    match the rule (a Wednesday slot for "every Tuesday"); dateutil alone
+    would skip it. The series repeats at the same wall time in `timezone`
+    (default: start's own tzinfo).
+    """
+    if timezone is not None:
+        start, end = start.astimezone(timezone), end.astimezone(timezone)
+    timezone = start.tzinfo
+    duration = end - start
+    dtstart = start.replace(tzinfo=None)
+    count = int(parse_rule(rule).get("COUNT", limit))
+    occurrences = []
+    later = (local for local in rrulestr(_local_rule(rule, timezone), dtstart=dtstart) if local != dtstart)
+    for local in itertools.chain([dtstart], later):
+        if len(occurrences) >= min(limit, count):
+            break
+        occurrence = _localize(timezone, local)
+        occurrences.append((occurrence, occurrence + duration))
+    return occurrences
+
+
+def calendar_rule(rule: str, start: datetime, limit: int = MAX_OCCURRENCES) -> str:
+    """`rule` as booked for a series starting at `start`.
+
+    RFC 5545 wants UNTIL in UTC when the start has a time zone, and a series
+    running past `limit` meetings is cut to COUNT=`limit` so that Google books
+    no more than expand() has checked.
+    """
+    parts = parse_rule(rule)
+    until = parts.get("UNTIL")
+    if not until or until.endswith("Z"):
+        return rule
+    if len(expand(rule, start, start, limit + 1)) > limit:
+        del parts["UNTIL"]
+        parts["COUNT"] = str(limit)
+    else:
+        local = _localize(start.tzinfo, datetime.strptime(until, "%Y%m%dT%H%M%S"))
+        parts["UNTIL"] = local.astimezone(pytz.UTC).strftime("%Y%m%dT%H%M%SZ")
+    return format_rule(parts)
+
+
+def describe(rule: str) -> str:
+    """Short English form of a rule this module or NLPProcessor produced"""
+    parts = parse_rule(rule)
+    interval = int(parts.get("INTERVAL", "1"))
+    frequency = {"DAILY": "day", "WEEKLY": "week", "MONTHLY": "month"}.get(parts.get("FREQ"), "time")
+    days = parts.get("BYDAY")
+    if days == "MO,TU,WE,TH,FR":
+        text = "every weekday"
+    elif days:
+        names = [_WEEKDAYS.get(day, day) for day in days.split(",")]
+        names = " and ".join(names) if len(names) < 3 else ", ".join(names[:-1]) + " and " + names[-1]
+        text = {1: "every ", 2: "every other "}.get(interval, f"every {interval} weeks on ") + names
+    else:
+        text = f"every {frequency}" if interval == 1 else f"every {interval} {frequency}s"
+    if parts.get("BYMONTHDAY", "").isdigit():
+        day = int(parts["BYMONTHDAY"])
+        suffix = "th" if 10 <= day % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+        text += f" on the {day}{suffix}"
+    if parts.get("UNTIL"):
+        until = datetime.strptime(parts["UNTIL"][:8], "%Y%m%d")
+        text += f" until {until:%B} {until.day}"
+    return text
+
+
+def exdate(rule_starts: Sequence[datetime]) -> str:
+    """EXDATE line leaving out the occurrences starting at `rule_starts` (in UTC)"""
+    return "EXDATE:" + ",".join(start.astimezone(pytz.UTC).strftime("%Y%m%dT%H%M%SZ") for start in rule_starts)
+
+
+class IntervalIndex:
+    """Static set of busy intervals (epoch seconds) answering overlap queries in O(log n)"""
+
+    def __init__(self, intervals: Sequence[Interval]):
+        ordered = sorted(intervals)
+        self._starts = [start for start, _ in ordered]
+        # Running maximum of ends, so unmerged or nested intervals are handled too
+        self._max_ends = []
+        latest = float("-inf")
+        for _, end in ordered:
+            latest = max(latest, end)
+            self._max_ends.append(latest)
+
+    def overlaps(self, start: float, end: float) -> bool:
+        """True if any interval overlaps [start, end)"""
+        index = bisect.bisect_left(self._starts, end) - 1
+        return index >= 0 and self._max_ends[index] > start
+
+    def __len__(self) -> int:
+        return len(self._starts)
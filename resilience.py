@@ -0,0 +1,160 @@
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited because the breaker is open"""
+
+
+class RateLimitedError(Exception):
+    """Raised when the client-side rate limiter has no token available in time"""
+
+
+def backoff_delay(attempt: int, base: float = 0.2, cap: float = 5.0,
+                  rng: Optional[random.Random] = None) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))"""
+    rng = rng or random
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Minimal closed/open/half-open circuit breaker.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for `reset_timeout` seconds. The first call after that is
+    let through as a probe; its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may proceed right now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # Half-open: allow a single probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def record_skipped(self):
+        """The admitted call was never sent; free the half-open probe slot"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will admit a probe (0 when closed)"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, timeout: float = 0.0) -> bool:
+        """Take one token, waiting up to `timeout` seconds for the bucket to refill"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class RetryBudget:
+    """Caps the retries and total backoff spent on behalf of one request"""
+
+    def __init__(self, max_retries: int = 3, max_delay: float = 5.0):
+        self.max_retries = max_retries
+        self.max_delay = max_delay
+        self.retries = 0
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def spend(self, delay: float) -> bool:
+        """Reserve one retry after `delay` seconds; False when the budget is exhausted"""
+        with self._lock:
+            if self.retries >= self.max_retries or self.delay + delay > self.max_delay:
+                return False
+            self.retries += 1
+            self.delay += delay
+            return True
+
+
+_retry_budget: contextvars.ContextVar[Optional[RetryBudget]] = contextvars.ContextVar("retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(max_retries: int = 3, max_delay: float = 5.0):
+    """Share one RetryBudget between every retried call made inside the block"""
+    token = _retry_budget.set(RetryBudget(max_retries, max_delay))
+    try:
+        yield _retry_budget.get()
+    finally:
+        _retry_budget.reset(token)
+
+
+def current_retry_budget(max_retries: int = 3, max_delay: float = 5.0) -> RetryBudget:
+    """The budget bound by `retry_budget()`, or a fresh one for calls made outside a request"""
+    return _retry_budget.get() or RetryBudget(max_retries, max_delay)
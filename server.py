@@ -0,0 +1,77 @@
+"""
+Production server: a pre-forking gunicorn master with uvicorn workers.
+
+    python -m server                     # WEB_CONCURRENCY workers on API_HOST:API_PORT
+    gunicorn -c server.py main:app       # the same settings through gunicorn's CLI
+
+The app is imported once in the master, before any worker is forked
+(preload_app), so the compiled LangGraph graph, the NLP patterns and the
+parsed Google discovery document are built once and shared copy-on-write
+instead of once per worker. What must not cross a fork is re-created in each
+worker by main.after_fork: the SQLite connection, the log and span writer
+threads, Google HTTP connections and the token refresher.
+
+On SIGTERM gunicorn stops accepting connections and gives workers
+GRACEFUL_TIMEOUT seconds. Each finishes its requests, waits for turns still
+running to checkpoint (SHUTDOWN_DRAIN_SECONDS) and closes the session store.
+
+Workers share no memory: sessions need a shared store (CHECKPOINT_BACKEND
+sqlite or a remote saver), and GOOGLE_API_QPS and /metrics are per worker.
+"""
+
+import multiprocessing
+import os
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+# gunicorn settings; `gunicorn -c server.py` reads these module attributes
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE_SECONDS", "5"))
+# Restart a worker after this many requests (0: never), staggered by the jitter
+max_requests = int(os.getenv("WORKER_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+proc_name = "booking-agent"
+
+SETTINGS = ("bind", "workers", "worker_class", "preload_app", "graceful_timeout", "timeout",
+            "keepalive", "max_requests", "max_requests_jitter", "proc_name")
+
+
+def on_starting(server):
+    if workers > 1 and os.getenv("CHECKPOINT_BACKEND") == "memory":
+        server.log.warning("CHECKPOINT_BACKEND=memory keeps sessions per worker; "
+                           "use sqlite or a shared store with %d workers", workers)
+
+
+def post_fork(server, worker):
+    # Only needed when the app was preloaded; otherwise the worker imports it fresh
+    app_module = sys.modules.get("main")
+    if app_module is not None:
+        app_module.after_fork()
+
+
+class Server(BaseApplication):
+    """gunicorn configured from this module, serving main:app"""
+
+    def load_config(self):
+        for name in SETTINGS:
+            self.cfg.set(name, globals()[name])
+        self.cfg.set("on_starting", on_starting)
+        self.cfg.set("post_fork", post_fork)
+
+    def load(self):
+        from main import app
+        return app
+
+
+def main():
+    Server().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Single-flight call deduplication.
+
+While a call for a key is in flight, further callers with the same key wait
+for it and share its result (or exception) instead of issuing their own.
+Threads and coroutines share one table: the in-flight call is a
+concurrent.futures.Future, which threads block on and coroutines await via
+asyncio.wrap_future, so a burst of identical queries costs one upstream call
+whichever path it arrives on.
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from metrics import SINGLEFLIGHT_CALLS
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._leader = SINGLEFLIGHT_CALLS.labels(name, "leader")
+        self._follower = SINGLEFLIGHT_CALLS.labels(name, "follower")
+
+    def _claim(self, key: Hashable) -> Tuple[Future, bool]:
+        """Return the in-flight future for `key` and whether the caller must run it"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._follower.inc()
+                return future, False
+            future = Future()
+            # Mark running so a cancelled waiter cannot cancel the shared call
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+        self._leader.inc()
+        return future, True
+
+    def _run(self, key: Hashable, future: Future, func: Callable[[], Any]):
+        try:
+            result = func()
+        except BaseException as error:
+            self._forget(key)
+            future.set_exception(error)
+        else:
+            self._forget(key)
+            future.set_result(result)
+
+    def _forget(self, key: Hashable):
+        # Callers arriving after this point start a fresh call rather than
+        # joining one whose answer is already on its way out
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Run `func` once for all concurrent callers with `key` (blocking)"""
+        future, leader = self._claim(key)
+        if leader:
+            self._run(key, future, func)
+        return future.result()
+
+    async def do_async(self, key: Hashable, func: Callable[[], Any], executor: Optional[Any] = None) -> Any:
+        """Asyncio counterpart of do(); a leading call runs `func` in `executor`"""
+        future, leader = self._claim(key)
+        if leader:
+            context = contextvars.copy_context()
+            asyncio.get_running_loop().run_in_executor(executor, context.run, self._run, key, future, func)
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self, key: Optional[Hashable] = None):
+        """Whether `key` has a call in flight, or the number of calls in flight when no key is given"""
+        with self._lock:
+            return len(self._calls) if key is None else key in self._calls
@@ -0,0 +1,143 @@
+"""
+Short-lived holds on offered slots.
+
+When a session is offered slots (or picks one) they are held for it for
+SLOT_HOLD_SECONDS, and other sessions are not offered anything overlapping
+them, so two conversations cannot both be steered onto the same 2 PM. A
+session holds only its current offer: each hold call replaces its previous
+holds, and finishing or abandoning the booking releases them.
+
+Holds are tracked per calendar as time intervals, in epoch seconds:
+
+  - MemorySlotHolds keeps them in a list sorted by start and expires them
+    from a min-heap of deadlines. An overlap check binary-searches the holds
+    starting within the calendar's longest live hold before the slot and
+    scans those: O(log n + k), where k is the number of such holds
+  - CompactingSqliteSaver (checkpointing.py) keeps them in the session store
+    with the same indexes, shared by every worker using that database. Its
+    check range-scans the (calendar_id, start) index over MAX_HOLD_LENGTH
+    before the slot, so k there counts every hold starting in that day
+
+Offered slots last an hour or so and each session holds only its current
+offer, so k stays near the number of sessions looking at the same hours.
+"""
+
+import bisect
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Dict, List, Sequence, Set, Tuple
+
+from metrics import SLOT_HOLDS
+
+Interval = Tuple[float, float]
+
+HOLD_SECONDS = float(os.getenv("SLOT_HOLD_SECONDS", "600"))
+
+# Longest interval the SQL index looks back for; slots never span more than a day
+MAX_HOLD_LENGTH = 24 * 3600.0
+
+_HELD = SLOT_HOLDS.labels("held")
+_CONTENDED = SLOT_HOLDS.labels("contended")
+
+
+def count_holds(held: int, contended: int):
+    _HELD.inc(held)
+    _CONTENDED.inc(contended)
+
+
+class MemorySlotHolds:
+    """Slot holds for a single process"""
+
+    def __init__(self):
+        # calendar_id -> [(start, end, hold_id)] sorted by start
+        self._index: Dict[str, List[Tuple[float, float, int]]] = {}
+        # calendar_id -> longest hold it has had since its index was last empty
+        self._longest: Dict[str, float] = {}
+        # hold_id -> (calendar_id, start, end, thread_id)
+        self._holds: Dict[int, Tuple[str, float, float, str]] = {}
+        self._by_thread: Dict[str, Set[int]] = {}
+        self._deadlines: List[Tuple[float, int]] = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def hold_slots(self, calendar_id: str, thread_id: str, slots: Sequence[Interval],
+                   ttl: float = HOLD_SECONDS, limit: int = 0) -> List[Interval]:
+        """Replace `thread_id`'s holds with the first `limit` (0: all) of `slots` nobody else holds.
+
+        Returns the intervals actually held, in the order given.
+        """
+        now = time.time()
+        held, contended = [], 0
+        with self._lock:
+            self._expire(now)
+            self._release(thread_id)
+            for start, end in slots:
+                if limit and len(held) >= limit:
+                    break
+                if self._held_by_other(calendar_id, thread_id, start, end):
+                    contended += 1
+                    continue
+                self._add(calendar_id, thread_id, start, end, now + ttl)
+                held.append((start, end))
+        count_holds(len(held), contended)
+        return held
+
+    def release_holds(self, thread_id: str):
+        with self._lock:
+            self._release(thread_id)
+
+    def hold_count(self) -> int:
+        with self._lock:
+            self._expire(time.time())
+            return len(self._holds)
+
+    def _held_by_other(self, calendar_id: str, thread_id: str, start: float, end: float) -> bool:
+        intervals = self._index.get(calendar_id)
+        if not intervals:
+            return False
+        # Only holds starting in (start - longest, end) can overlap
+        low = bisect.bisect_right(intervals, (start - self._longest[calendar_id], float("inf")))
+        high = bisect.bisect_left(intervals, (end, float("-inf")))
+        for held_start, held_end, hold_id in intervals[low:high]:
+            if held_end > start and self._holds[hold_id][3] != thread_id:
+                return True
+        return False
+
+    def _add(self, calendar_id: str, thread_id: str, start: float, end: float, expires_at: float):
+        hold_id = next(self._ids)
+        bisect.insort(self._index.setdefault(calendar_id, []), (start, end, hold_id))
+        self._longest[calendar_id] = max(self._longest.get(calendar_id, 0.0), end - start)
+        self._holds[hold_id] = (calendar_id, start, end, thread_id)
+        self._by_thread.setdefault(thread_id, set()).add(hold_id)
+        heapq.heappush(self._deadlines, (expires_at, hold_id))
+
+    def _remove(self, hold_id: int):
+        calendar_id, start, end, thread_id = self._holds.pop(hold_id)
+        intervals = self._index[calendar_id]
+        del intervals[bisect.bisect_left(intervals, (start, end, hold_id))]
+        if not intervals:
+            del self._index[calendar_id]
+            del self._longest[calendar_id]
+        owned = self._by_thread.get(thread_id)
+        if owned is not None:
+            owned.discard(hold_id)
+            if not owned:
+                del self._by_thread[thread_id]
+
+    def _release(self, thread_id: str):
+        # Released holds stay in the heap; _expire skips ids that are gone
+        for hold_id in list(self._by_thread.get(thread_id, ())):
+            self._remove(hold_id)
+
+    def _expire(self, now: float):
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, hold_id = heapq.heappop(self._deadlines)
+            if hold_id in self._holds:
+                self._remove(hold_id)
+
+
+# Shared by every agent in the process that has no session store to hold slots in
+slot_holds = MemorySlotHolds()
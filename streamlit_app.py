@@ -2,7 +2,6 @@ import streamlit as st
 import requests
 import json
 from datetime import datetime
-import time
 import uuid
 import random
 
@@ -259,6 +258,9 @@ if 'messages' not in st.session_state:
     st.session_state.messages = []
 if 'session_id' not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
+if 'client_id' not in st.session_state:
+    # Identifies this browser session to the API's rate limits; kept across new chats
+    st.session_state.client_id = str(uuid.uuid4())
 if 'agent_state' not in st.session_state:
     st.session_state.agent_state = None
 if 'api_status' not in st.session_state:
@@ -269,6 +271,8 @@ if 'personality_mode' not in st.session_state:
     st.session_state.personality_mode = True
 if 'connection_status' not in st.session_state:
     st.session_state.connection_status = "demo"
+if 'pending_celebration' not in st.session_state:
+    st.session_state.pending_celebration = None
 
 # Fun collections for personality
 CALENDAR_JOKES = [
@@ -337,10 +341,27 @@ def detect_message_personality(message):
     else:
         return "normal"
 
-# Direct agent integration (no API needed)
+# Direct agent integration (no API needed), or backend mode via AGENT_BACKEND=api
 from simple_booking_agent import SimpleBookingAgent
 from calendar_service import CalendarService
 from models import AgentState
+from api_client import BackendUnavailableError, backend_mode_enabled, get_api_client, state_from_response
+from resilience import CircuitOpenError
+
+def run_agent_turn(message: str) -> AgentState:
+    """Run one agent turn in-process or against the FastAPI backend"""
+    if backend_mode_enabled():
+        client = get_api_client()
+        if st.session_state.agent_state is None:
+            health = client.health()
+            st.session_state.connection_status = "connected" if health.get("calendar_authenticated") else "demo"
+        data = client.chat(message, st.session_state.session_id, client_id=st.session_state.client_id)
+        return state_from_response(data, st.session_state.agent_state)
+    
+    agent = get_booking_agent()
+    if st.session_state.agent_state is None:
+        st.session_state.agent_state = AgentState()
+    return agent.process_message(message, st.session_state.agent_state, session_id=st.session_state.session_id)
 
 @st.cache_resource
 def get_booking_agent():
@@ -359,12 +380,6 @@ def get_booking_agent():
 def process_message_direct(message: str):
     """Process message directly with the agent - Enhanced with personality"""
     try:
-        agent = get_booking_agent()
-        
-        # Initialize agent state if not exists
-        if st.session_state.agent_state is None:
-            st.session_state.agent_state = AgentState()
-        
         # Detect personality and add appropriate response prefix
         personality = detect_message_personality(message)
         personality_prefix = ""
@@ -382,7 +397,7 @@ def process_message_direct(message: str):
                 personality_prefix = "No worries! I'm here to help and make this super easy for you! 🤗\n\n"
         
         # Process message
-        st.session_state.agent_state = agent.process_message(message, st.session_state.agent_state)
+        st.session_state.agent_state = run_agent_turn(message)
         
         # Get base response
         base_response = st.session_state.agent_state.agent_response
@@ -405,6 +420,14 @@ def process_message_direct(message: str):
                 "title": st.session_state.agent_state.booking_request.title
             }
         }
+    except (BackendUnavailableError, CircuitOpenError) as e:
+        st.warning(f"Booking service is busy: {e}")
+        return {
+            "response": "I can't reach the booking service right now. Give me a moment and try again! ⏳",
+            "state": "error",
+            "personality": "error",
+            "booking_info": {}
+        }
     except Exception as e:
         st.error(f"Error processing message: {e}")
         return {
@@ -615,6 +638,15 @@ with chat_container:
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+# Booking celebration queued by the previous run
+if st.session_state.pending_celebration:
+    st.markdown(
+        f'<div class="success-message">🎉 Woohoo! Your {st.session_state.pending_celebration} is ready! 🎊<br>Time to celebrate! 🥳</div>',
+        unsafe_allow_html=True
+    )
+    st.balloons()
+    st.session_state.pending_celebration = None
+
 # Enhanced message input
 st.markdown("### 💬 Type your message:")
 with st.form("chat_form", clear_on_submit=True):
@@ -665,13 +697,10 @@ if submit_button and user_input:
             
             # Enhanced success celebration
             if response["state"] == "booking_complete":
+                # Celebrate on the next render instead of pausing this script run;
+                # the balloons animate client-side after the rerun below
                 booking_type = "Google Calendar event" if st.session_state.connection_status == "connected" else "demo booking"
-                st.markdown(
-                    f'<div class="success-message">🎉 Woohoo! Your {booking_type} is ready! 🎊<br>Time to celebrate! 🥳</div>',
-                    unsafe_allow_html=True
-                )
-                st.balloons()
-                time.sleep(1)
+                st.session_state.pending_celebration = booking_type
                 # Additional celebration message
                 celebration_joke = "Why did the calendar throw a party? Because it finally got a date! 🎉📅"
                 st.session_state.messages.append({
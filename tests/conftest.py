@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Tests import the top-level modules the same way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import pytest
+
+from freebusy_cache import freebusy_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_freebusy_cache():
+    # The cache is process-wide; keep one test's mock calendar out of the next
+    freebusy_cache.clear()
+    yield
+    freebusy_cache.clear()
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from admission import BOOKING, EXPLORATORY, AdmissionController, OverloadedError
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def queued(controller: AdmissionController, priority: int) -> asyncio.Task:
+    """Start an acquire that has to wait, and let it reach the queue"""
+    task = asyncio.ensure_future(controller.acquire(priority))
+    await asyncio.sleep(0)
+    return task
+
+
+def test_release_hands_the_slot_to_a_waiter():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        await controller.acquire()
+        waiter = await queued(controller, EXPLORATORY)
+        with pytest.raises(OverloadedError):
+            await controller.acquire(EXPLORATORY)
+        controller.release()
+        await waiter
+        assert controller.active == 1 and controller.queued == 0
+        assert controller.rejected == {("queue_full", "exploratory"): 1}
+    run(scenario())
+
+
+def test_bookings_are_served_first():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=2)
+        await controller.acquire()
+        exploratory = await queued(controller, EXPLORATORY)
+        booking = await queued(controller, BOOKING)
+        controller.release()
+        await booking
+        assert not exploratory.done()
+        controller.release()
+        await exploratory
+    run(scenario())
+
+
+def test_a_booking_displaces_the_newest_exploratory_waiter():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=2)
+        await controller.acquire()
+        older = await queued(controller, EXPLORATORY)
+        newer = await queued(controller, EXPLORATORY)
+        booking = await queued(controller, BOOKING)
+        with pytest.raises(OverloadedError, match="Displaced"):
+            await newer
+        assert not older.done() and controller.queued == 2
+        second = await queued(controller, BOOKING)
+        with pytest.raises(OverloadedError, match="Displaced"):
+            await older
+        # Bookings never displace each other
+        with pytest.raises(OverloadedError, match="queue_full"):
+            await controller.acquire(BOOKING)
+        controller.release()
+        await booking
+        controller.release()
+        await second
+        assert controller.rejected == {("displaced", "exploratory"): 2, ("queue_full", "booking"): 1}
+    run(scenario())
+
+
+def test_a_waiter_that_times_out_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        await controller.acquire()
+        with pytest.raises(OverloadedError, match="timeout"):
+            await controller.acquire()
+        assert controller.queued == 0 and controller.active == 1
+    run(scenario())
+
+
+def test_a_slot_arriving_as_a_waiter_gives_up_is_passed_on():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=2)
+        await controller.acquire()
+        late, _next = asyncio.get_running_loop().create_future(), asyncio.get_running_loop().create_future()
+        controller._queues[EXPLORATORY].extend([late, _next])
+        # release() picks `late` just before its timeout fires
+        controller.release()
+        assert late.result() is None
+        controller._abandon(late, EXPLORATORY)
+        assert _next.done() and controller.active == 1 and controller.queued == 0
+    run(scenario())
+
+
+def test_a_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        await controller.acquire()
+        waiter = await queued(controller, EXPLORATORY)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.queued == 0
+        controller.release()
+        assert controller.active == 0
+    run(scenario())
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytz
+
+from agent_core import AgentCore
+from booking_agent import BookingAgent
+from calendar_service_mock import CalendarService as MockBackedCalendarService
+from checkpointing import build_checkpointer
+from mock_calendar import MockCalendarBackend
+from models import AgentState, CalendarSlot, ConversationState
+from slot_holds import MemorySlotHolds
+
+ZONE = pytz.timezone("America/New_York")
+
+
+class _Calendar:
+    """Calendar double recording the occurrences it is asked about and the events it creates"""
+
+    calendar_id = "primary"
+    timezone = ZONE
+    authenticated = True
+
+    def __init__(self):
+        self.checked = []
+        self.created = []
+
+    def find_conflicts(self, occurrences):
+        self.checked = list(occurrences)
+        return []
+
+    def is_slot_free(self, slot):
+        return True
+
+    def create_event(self, slot, title, description="", attendee_email="", event_id=None, **kwargs):
+        self.created.append(event_id)
+        return True
+
+
+def test_series_starts_with_the_slot_even_off_the_rule():
+    calendar = _Calendar()
+    # A Wednesday slot for "every Tuesday": Google books the Wednesday too
+    slot = CalendarSlot(start_time=ZONE.localize(datetime(2026, 10, 21, 10)),
+                        end_time=ZONE.localize(datetime(2026, 10, 21, 11)))
+    occurrences, _ = AgentCore(calendar)._series_conflicts(slot, "FREQ=WEEKLY;BYDAY=TU;COUNT=3", ZONE)
+    assert [start.day for start, _ in occurrences] == [21, 27, 3]
+    # Every meeting but the slot itself is checked against the calendar
+    assert calendar.checked == occurrences[1:]
+
+
+def test_anonymous_conversations_hold_slots_separately():
+    holds = MemorySlotHolds()
+    agent = AgentCore(_Calendar(), holds=holds)
+    slot = CalendarSlot(start_time=ZONE.localize(datetime(2026, 10, 21, 10)),
+                        end_time=ZONE.localize(datetime(2026, 10, 21, 11)))
+    first, second = AgentState(), AgentState()
+    assert agent._hold(first, [slot]) == [slot]
+    # Another conversation is not offered the slot, nor does it take over the first one's hold
+    assert agent._hold(second, [slot]) == []
+    assert agent._hold(first, [slot]) == [slot]
+    assert agent._holder(first) != agent._holder(second)
+
+
+def test_anonymous_conversations_book_separately():
+    calendar = _Calendar()
+    agent = AgentCore(calendar, holds=MemorySlotHolds())
+    slot = CalendarSlot(start_time=ZONE.localize(datetime(2026, 10, 21, 10)),
+                        end_time=ZONE.localize(datetime(2026, 10, 21, 11)))
+    for state in (AgentState(confirmed_slot=slot), AgentState(confirmed_slot=slot)):
+        assert agent._complete_booking(state).current_state == ConversationState.BOOKING_COMPLETE
+    # Neither is taken for a repeat of the other's booking
+    assert len(set(calendar.created)) == 2
+
+
+def test_series_keeps_its_wall_time_across_dst_after_a_checkpoint():
+    # A calendar with nothing generated on it, so the slot is free
+    backend = MockCalendarBackend(seed=1, workday=(0, 0))
+    service = MockBackedCalendarService(backend=backend)
+    service.authenticate()
+    agent = BookingAgent(service, build_checkpointer("memory"))
+    # Tuesdays at 10am New York time; DST ends on Sunday November 1
+    slot = CalendarSlot(start_time=ZONE.localize(datetime(2026, 10, 27, 10)),
+                        end_time=ZONE.localize(datetime(2026, 10, 27, 11)))
+    state = AgentState(confirmed_slot=slot, timezone="America/New_York", session_id="dst")
+    state.booking_request.recurrence = "FREQ=WEEKLY;BYDAY=TU;COUNT=3"
+    agent.graph.update_state(agent._config("dst"), state)
+    state = agent.load_state("dst")
+    # The checkpoint only keeps the UTC offset
+    assert not hasattr(state.confirmed_slot.start_time.tzinfo, "zone")
+
+    occurrences, _ = agent._series_conflicts(state.confirmed_slot, state.booking_request.recurrence,
+                                             agent._timezone(state))
+    assert [(start.day, start.hour, start.utcoffset().total_seconds() / 3600) for start, _ in occurrences] == \
+        [(27, 10, -4), (3, 10, -5), (10, 10, -5)]
+
+    agent._complete_booking(state)
+    [event] = backend.events("primary")
+    assert event["start"]["timeZone"] == "America/New_York"
+    # The meeting after the change is booked at 10am EST, 15:00 UTC
+    after = pytz.utc.localize(datetime(2026, 11, 3))
+    assert backend.busy_periods("primary", after, after.replace(day=4)) == \
+        [(pytz.utc.localize(datetime(2026, 11, 3, 15)), pytz.utc.localize(datetime(2026, 11, 3, 16)))]
@@ -0,0 +1,50 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+import availability
+from calendar_service import CalendarService
+
+pytestmark = pytest.mark.skipif(not availability.ENABLED, reason="needs NumPy")
+
+ZONE = pytz.timezone("America/New_York")
+# Two weeks around the end of daylight saving time (November 1, 2026)
+START = ZONE.localize(datetime(2026, 10, 26, 0, 0))
+END = ZONE.localize(datetime(2026, 11, 7, 0, 0))
+
+
+def random_busy(seed: int, count: int = 60):
+    """Busy periods at arbitrary minutes, some spanning days, in Google's UTC format"""
+    rng = random.Random(seed)
+    periods = []
+    for _ in range(count):
+        start = START + timedelta(minutes=rng.randrange(12 * 24 * 60))
+        end = start + timedelta(minutes=rng.choice([1, 7, 25, 45, 60, 95, 240, 1500]))
+        periods.append({"start": start.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                        "end": end.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")})
+    return periods
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("duration", [30, 60, 90])
+def test_bitmap_matches_the_per_slot_loop(monkeypatch, seed, duration):
+    service = CalendarService()
+    service.timezone = ZONE
+    busy = random_busy(seed)
+    bitmap = service._generate_available_slots(START, END, busy, duration)
+    monkeypatch.setattr(availability, "ENABLED", False)
+    loop = service._generate_available_slots(START, END, busy, duration)
+    assert [(slot.start_time, slot.end_time) for slot in bitmap] == [(slot.start_time, slot.end_time) for slot in loop]
+    assert bitmap
+
+
+def test_bitmap_finds_slots_when_every_calendar_is_free():
+    day = ZONE.localize(datetime(2026, 10, 27))
+    busy_by_calendar = [
+        [{"start": "2026-10-27T13:00:00Z", "end": "2026-10-27T15:00:00Z"}],  # 9 to 11 AM
+        [{"start": "2026-10-27T16:30:00Z", "end": "2026-10-27T20:00:00Z"}],  # 12:30 to 4 PM
+    ]
+    slots = availability.find_free_slots(day, day + timedelta(days=1), busy_by_calendar, ZONE)
+    assert [start.hour for start, _ in slots] == [11, 16]
@@ -0,0 +1,85 @@
+from datetime import date
+
+import pytest
+import pytz
+
+import batch_scheduler
+from batch_scheduler import BatchScheduler
+from calendar_service import CalendarService
+from calendar_service_mock import CalendarService as MockBackedCalendarService
+from mock_calendar import MockCalendarBackend, build_http_service, start_server
+from models import BookingRequest
+
+pytestmark = pytest.mark.skipif(not batch_scheduler.AVAILABLE, reason="needs NumPy")
+
+MONDAY = date(2030, 1, 7)
+FRIDAY = date(2030, 1, 11)
+
+
+def in_process(backend):
+    service = MockBackedCalendarService(backend=backend)
+    service.authenticate()
+    return service
+
+
+def over_http(backend):
+    server, url = start_server(backend)
+    service = CalendarService()
+    service.service = build_http_service(url)
+    service.authenticated = True
+    return service
+
+
+@pytest.mark.parametrize("connect", [in_process, over_http])
+def test_resending_a_batch_keeps_booked_meetings(connect):
+    backend = MockCalendarBackend(seed=3)
+    scheduler = BatchScheduler(connect(backend))
+    requests = [BookingRequest(title=f"Review {index}", duration=60) for index in range(5)]
+
+    first = scheduler.schedule(requests, MONDAY, FRIDAY, pytz.UTC, batch_id="batch-1")
+    scheduler.book(first, "batch-1")
+    again = scheduler.schedule(requests, MONDAY, FRIDAY, pytz.UTC, batch_id="batch-1")
+    scheduler.book(again, "batch-1")
+
+    assert all(assignment.booked for assignment in first + again)
+    assert [a.slot.start_time for a in again] == [a.slot.start_time for a in first]
+    assert [a.event_id for a in again] == [a.event_id for a in first]
+    assert len(backend.events("primary")) == 5
+
+
+def test_partly_booked_batch_books_only_the_rest():
+    backend = MockCalendarBackend(seed=3)
+    scheduler = BatchScheduler(in_process(backend))
+    requests = [BookingRequest(title=f"Review {index}", duration=60) for index in range(4)]
+
+    first = scheduler.schedule(requests[:2], MONDAY, FRIDAY, pytz.UTC, batch_id="batch-2")
+    scheduler.book(first, "batch-2")
+    full = scheduler.schedule(requests, MONDAY, FRIDAY, pytz.UTC, batch_id="batch-2")
+
+    assert [bool(a.booked) for a in full] == [True, True, False, False]
+    scheduler.book(full, "batch-2")
+    assert len(backend.events("primary")) == 4
+    starts = sorted(a.slot.start_time for a in full)
+    assert all(earlier < later for earlier, later in zip(starts, starts[1:]))
+
+
+def test_fresh_batch_ids_do_not_collide():
+    backend = MockCalendarBackend(seed=3)
+    scheduler = BatchScheduler(in_process(backend))
+    requests = [BookingRequest(title="Sync", duration=30)]
+    for batch_id in ("a", "b"):
+        scheduler.book(scheduler.schedule(requests, MONDAY, FRIDAY, pytz.UTC, batch_id=batch_id), batch_id)
+    assert len(backend.events("primary")) == 2
+
+
+def test_times_use_the_chat_format():
+    backend = MockCalendarBackend(seed=3)
+    scheduler = BatchScheduler(in_process(backend))
+    requests = [BookingRequest(title="Afternoon", duration=30, not_before="1:00 PM", not_after="5 pm"),
+                BookingRequest(title="Late", duration=30, not_before="15:00")]
+    for assignment in scheduler.schedule(requests, MONDAY, FRIDAY, pytz.UTC):
+        assert assignment.slot is not None, assignment.reason
+        assert 13 <= assignment.slot.start_time.hour < 17
+
+    [invalid] = scheduler.schedule([BookingRequest(title="Sync", time="teatime")], MONDAY, FRIDAY, pytz.UTC)
+    assert invalid.slot is None and "teatime" in invalid.reason
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pytest
+
+from booking_ledger import BOOKED, PENDING, MemoryBookingLedger, booking_key
+from checkpointing import build_checkpointer
+from models import CalendarSlot
+
+SLOT = CalendarSlot(start_time=datetime(2026, 10, 21, 10), end_time=datetime(2026, 10, 21, 11))
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def ledger(request):
+    if request.param == "memory":
+        return MemoryBookingLedger()
+    saver = build_checkpointer("memory")
+    saver.setup()
+    return saver
+
+
+def test_booking_key_is_a_stable_event_id():
+    key = booking_key("session", SLOT)
+    assert key == booking_key("session", SLOT)
+    assert key != booking_key("other", SLOT)
+    assert key != booking_key("session", SLOT, recurrence="FREQ=WEEKLY;COUNT=2")
+    assert key.isalnum() and key == key.lower()
+
+
+def test_a_key_is_claimed_once(ledger):
+    key = booking_key("session", SLOT)
+    assert ledger.claim_booking(key, "session") is None
+    assert ledger.claim_booking(key, "session") == PENDING
+    ledger.finish_booking(key)
+    assert ledger.claim_booking(key, "session") == BOOKED
+
+
+def test_a_released_claim_can_be_retried(ledger):
+    key = booking_key("session", SLOT)
+    ledger.claim_booking(key, "session")
+    ledger.release_booking(key)
+    assert ledger.claim_booking(key, "session") is None
+
+
+def test_a_lapsed_pending_claim_is_taken_over(ledger):
+    ledger.lease_seconds = -1
+    key = booking_key("session", SLOT)
+    ledger.claim_booking(key, "session")
+    assert ledger.claim_booking(key, "session") is None
+
+
+def test_memory_ledger_prunes_old_keys_only(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("booking_ledger.time.time", lambda: now[0])
+    ledger = MemoryBookingLedger(max_age=100)
+    ledger.claim_booking("old", "a")
+    now[0] += 60
+    ledger.claim_booking("newer", "a")
+    now[0] += 60
+    ledger.claim_booking("new", "a")
+    assert list(ledger._keys) == ["newer", "new"]
+    # Finishing a booking moves its key to the back of the expiry order
+    now[0] += 50
+    ledger.finish_booking("newer")
+    now[0] += 60
+    ledger.claim_booking("newest", "a")
+    assert list(ledger._keys) == ["newer", "newest"]
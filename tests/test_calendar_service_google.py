@@ -0,0 +1,21 @@
+from datetime import datetime
+
+import pytz
+
+import calendar_service_google
+from models import CalendarSlot
+
+
+def test_development_service_falls_back_to_mock_mode():
+    service = calendar_service_google.CalendarService(credentials_file="/nonexistent/credentials.json")
+    assert service.authenticate()
+    assert not service.authenticated
+    assert service.service is None
+
+
+def test_invitations_are_sent_to_attendees():
+    service = calendar_service_google.CalendarService()
+    slot = CalendarSlot(start_time=pytz.UTC.localize(datetime(2026, 1, 5, 9)),
+                        end_time=pytz.UTC.localize(datetime(2026, 1, 5, 10)))
+    assert service._event_body(slot, "Sync", attendee_email="a@example.com")["sendUpdates"] == "all"
+    assert "sendUpdates" not in service._event_body(slot, "Focus")
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from freebusy_cache import FreeBusyCache
+
+DAY = pytz.UTC.localize(datetime(2026, 10, 19))
+
+
+def window(first: int, last: int):
+    return DAY + timedelta(days=first), DAY + timedelta(days=last)
+
+
+def test_get_finds_a_covering_window_of_the_right_calendar():
+    cache = FreeBusyCache()
+    for calendar_id in ("a", "b", "c"):
+        for first in range(0, 30, 7):
+            cache.put(calendar_id, *window(first, first + 7), busy=[{"calendar": calendar_id}])
+    cache.put("b", *window(0, 60), busy=[{"calendar": "b", "long": True}])
+
+    entry = cache.get("a", *window(15, 17))
+    assert entry.calendar_id == "a" and entry.time_min == window(14, 21)[0]
+    assert cache.get("a", *window(13, 15)) is None
+    # Only the long window covers this one, though it starts much earlier
+    assert cache.get("b", *window(40, 45)).busy[0]["long"]
+    assert cache.get("d", *window(0, 1)) is None
+
+
+def test_get_prefers_the_freshest_entry():
+    cache = FreeBusyCache()
+    cache.put("a", *window(0, 14), busy=[])
+    newer = cache.put("a", *window(0, 7), busy=[])
+    newer.fetched_at += 1
+    assert cache.get("a", *window(1, 2)) is newer
+    assert cache.get("a", *window(1, 2), max_age=-10) is None
+
+
+def test_evicted_and_replaced_windows_leave_the_index():
+    cache = FreeBusyCache(capacity=2)
+    cache.put("a", *window(0, 7), busy=[])
+    cache.put("a", *window(0, 7), busy=[{"again": True}])
+    cache.put("a", *window(7, 14), busy=[])
+    cache.put("b", *window(0, 7), busy=[])
+    assert cache.get("a", *window(1, 2)) is None
+    assert cache.get("a", *window(8, 9)) is not None
+    assert cache.get("b", *window(1, 2)) is not None
+
+
+def test_add_busy_updates_overlapping_windows_only():
+    cache = FreeBusyCache()
+    first = cache.put("a", *window(0, 7), busy=[])
+    second = cache.put("a", *window(7, 14), busy=[])
+    other = cache.put("b", *window(0, 7), busy=[])
+    cache.add_busy("a", *window(3, 4))
+    assert len(first.busy) == 1 and not second.busy and not other.busy
@@ -0,0 +1,44 @@
+import threading
+
+from metrics import Counter, Histogram
+
+
+def run_threads(target, count: int = 200):
+    for _ in range(count):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+
+def test_exited_threads_fold_their_shards_into_the_total():
+    counter = Counter("test_calls_total", "Calls").labels()
+    histogram = Histogram("test_seconds", "Latency", buckets=(0.1, 1.0)).labels()
+    counter.inc()
+
+    def work():
+        counter.inc()
+        histogram.observe(0.5)
+
+    run_threads(work)
+    # Only this thread's shard is left; the others were folded in when their threads exited
+    assert len(counter._values) == 1 and len(histogram._values) == 0
+    assert counter.value() == 201
+    assert histogram.snapshot() == ([0, 200, 200], 200, 100.0)
+
+
+def test_a_live_thread_keeps_its_shard():
+    counter = Counter("test_live_total", "Calls").labels()
+    recorded, finish = threading.Event(), threading.Event()
+
+    def work():
+        counter.inc(2)
+        recorded.set()
+        finish.wait(5)
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    recorded.wait(5)
+    assert len(counter._values) == 1 and counter.value() == 2
+    finish.set()
+    thread.join()
+    assert len(counter._values) == 0 and counter.value() == 2
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+
+from nlp_processor import NLPProcessor, parse_time_of_day
+
+
+@pytest.mark.parametrize("text, minute", [
+    ("2:00 PM", 14 * 60), ("2pm", 14 * 60), ("12:30 AM", 30), ("12 pm", 12 * 60),
+    ("14:30", 14 * 60 + 30), ("noon", 12 * 60), ("around 10 am", 10 * 60),
+])
+def test_parse_time_of_day(text, minute):
+    assert parse_time_of_day(text) == minute
+
+
+@pytest.mark.parametrize("text", ["", "25:00", "13 pm", "teatime"])
+def test_parse_time_of_day_rejects(text):
+    assert parse_time_of_day(text) is None
+
+
+def test_parse_time_to_hour():
+    assert NLPProcessor().parse_time_to_hour("4:45 PM") == 16
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("every Tuesday at 10 for 8 weeks", "10:00 AM"),
+    ("at 2:30", "2:30 PM"),
+    ("at 9 in the evening", "9:00 PM"),
+    ("at 14:00", "2:00 PM"),
+    ("at 4pm", "4:00 PM"),
+])
+def test_extract_time_reads_a_bare_hour(text, expected):
+    assert NLPProcessor().extract_datetime_info(text)[1] == expected
+
+
+@pytest.mark.parametrize("text, rule", [
+    ("every Tuesday at 10 for 8 weeks", "FREQ=WEEKLY;BYDAY=TU;COUNT=8"),
+    ("every other week on friday", "FREQ=WEEKLY;INTERVAL=2;BYDAY=FR;COUNT=10"),
+    ("weekly on Monday and Thursday", "FREQ=WEEKLY;BYDAY=MO,TH;COUNT=10"),
+    ("monthly on the 15th", "FREQ=MONTHLY;BYMONTHDAY=15;COUNT=10"),
+])
+def test_extract_recurrence(text, rule):
+    assert NLPProcessor().extract_recurrence(text) == rule
+
+
+def test_extract_recurrence_until_a_date():
+    processor = NLPProcessor()
+    rule = processor.extract_recurrence("every Tuesday until December 1")
+    assert rule.startswith("FREQ=WEEKLY;BYDAY=TU;UNTIL=")
+    assert rule.endswith("1201T235959")
+    # The end date is not taken for the first meeting
+    date, _ = processor.extract_datetime_info("every Tuesday until December 1")
+    assert datetime.strptime(date, "%Y-%m-%d").weekday() == 1
+
+
+def test_extract_date_for_a_day_of_the_month():
+    date, _ = NLPProcessor().extract_datetime_info("monthly on the 15th")
+    assert date.endswith("-15") and date >= datetime.now().strftime("%Y-%m-%d")
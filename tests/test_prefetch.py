@@ -0,0 +1,25 @@
+import threading
+
+from prefetch import Prefetcher
+
+
+def test_submit_runs_in_background():
+    prefetcher = Prefetcher(max_workers=1)
+    done = threading.Event()
+    assert prefetcher.submit(done.set)
+    assert done.wait(1)
+    prefetcher.shutdown()
+
+
+def test_shutdown_stops_prefetching():
+    prefetcher = Prefetcher(max_workers=1)
+    prefetcher.shutdown()
+    assert not prefetcher.enabled
+    assert not prefetcher.submit(lambda: None)
+
+
+def test_submit_after_pool_shutdown_is_dropped():
+    prefetcher = Prefetcher(max_workers=1)
+    prefetcher._pool.shutdown()
+    assert not prefetcher.submit(lambda: None)
+    assert prefetcher._pending == 0
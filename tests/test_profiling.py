@@ -0,0 +1,59 @@
+import marshal
+import threading
+import time
+
+from booking_agent import BookingAgent
+from calendar_service_mock import CalendarService as MockBackedCalendarService
+from checkpointing import build_checkpointer
+from mock_calendar import MockCalendarBackend
+from nlp_processor import NLPProcessor
+from profiling import Profiler, to_pstats_file
+
+
+def test_authorized_needs_the_admin_token():
+    profiler = Profiler(admin_token="s3cret")
+    assert profiler.authorized("s3cret")
+    assert not profiler.authorized("s3cre")
+    assert not profiler.authorized(None)
+    # Header values are latin-1 and may not be ASCII
+    assert not profiler.authorized("s3crét")
+
+
+def test_profiling_is_off_without_a_token():
+    assert not Profiler().authorized("")
+
+
+def booking_agent():
+    service = MockBackedCalendarService(backend=MockCalendarBackend(seed=1))
+    service.authenticate()
+    return BookingAgent(service, build_checkpointer("memory"))
+
+
+def test_cprofile_covers_the_graph_node_threads():
+    profiler = Profiler(admin_token="s3cret")
+    agent = booking_agent()
+    state = agent.process_message("", session_id="profiled")
+    profiler.run("cprofile", "turn", agent.process_message, "Book a meeting tomorrow at 2pm", state,
+                 session_id="profiled")
+    stats = marshal.loads(to_pstats_file(profiler.get(1)))
+    functions = {name for _, _, name in stats}
+    assert {"extract_intent", "get_availability"} <= functions
+    # Threads started after the turn are left alone
+    assert threading.getprofile() is None
+
+
+def test_sampling_covers_the_graph_node_threads(monkeypatch):
+    profiler = Profiler(interval=0.001, admin_token="s3cret")
+    agent = booking_agent()
+    state = agent.process_message("", session_id="sampled")
+    original = NLPProcessor.extract_intent
+
+    def extract_intent(self, text):
+        # Slow enough to be sampled
+        time.sleep(0.05)
+        return original(self, text)
+
+    monkeypatch.setattr(NLPProcessor, "extract_intent", extract_intent)
+    profiler.run("sample", "turn", agent.process_message, "Book a meeting tomorrow at 2pm", state,
+                 session_id="sampled")
+    assert "extract_intent (test_profiling.py" in profiler.flame()
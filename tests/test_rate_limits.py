@@ -0,0 +1,99 @@
+import pytest
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+import rate_limits
+from rate_limits import ClientRateLimiter, QuotaExceededError, RateLimitMiddleware, SessionQuota, request_client
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limits.time, "monotonic", clock)
+    monkeypatch.setattr(rate_limits.time, "time", clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_the_rate(clock):
+    limiter = ClientRateLimiter(rate=2, burst=3)
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    assert limiter.acquire("b") == 0.0
+    clock.now += 0.5
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("a") > 0
+
+
+def test_bucket_refills_to_the_burst_only(clock):
+    limiter = ClientRateLimiter(rate=1, burst=2)
+    clock.now += 3600
+    assert [limiter.acquire("a") == 0.0 for _ in range(3)] == [True, True, False]
+
+
+def test_least_recently_seen_client_is_evicted(clock):
+    limiter = ClientRateLimiter(rate=1, burst=1, max_clients=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("c")
+    assert len(limiter) == 2
+    # "a" was evicted, so it starts over with a full bucket
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("c") > 0
+
+
+def test_zero_rate_allows_everything():
+    limiter = ClientRateLimiter(rate=0)
+    assert all(limiter.acquire("a") == 0.0 for _ in range(100))
+    assert len(limiter) == 0
+
+
+def test_session_quota_slides_over_the_window(clock):
+    clock.now = 3600 * 1000  # start of a window
+    quota = SessionQuota(limit=2, window=3600)
+    quota.charge("a")
+    quota.charge("a")
+    with pytest.raises(QuotaExceededError) as rejected:
+        quota.charge("a")
+    # Both sessions still count at the start of the next window; half of them after 30 minutes more
+    assert rejected.value.retry_after == 3600 + 1800
+    quota.charge("b")
+
+    clock.now += 3600 + 1800
+    quota.charge("a")
+    with pytest.raises(QuotaExceededError):
+        quota.charge("a")
+
+
+def test_session_quota_forgets_after_two_windows(clock):
+    quota = SessionQuota(limit=1, window=60)
+    quota.charge("a")
+    clock.now += 120
+    quota.charge("a")
+
+
+def test_session_quota_off_when_zero():
+    quota = SessionQuota(limit=1, window=0)
+    for _ in range(5):
+        quota.charge("a")
+
+
+def test_middleware_answers_429_with_retry_after(clock):
+    async def app(scope, receive, send):
+        await PlainTextResponse(request_client(scope))(scope, receive, send)
+
+    client = TestClient(RateLimitMiddleware(app, ClientRateLimiter(rate=1, burst=2)))
+    assert [client.get("/chat").status_code for _ in range(3)] == [200, 200, 429]
+    rejected = client.get("/chat")
+    assert rejected.headers["Retry-After"] == "1"
+    # Exempt paths skip the limiter and its bookkeeping
+    assert client.get("/health").status_code == 200
+    clock.now += 1
+    assert client.get("/chat").text == "ip:testclient"
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytz
+
+import recurrence
+
+ZONE = pytz.timezone("America/New_York")
+
+
+def test_calendar_rule_books_until_in_utc():
+    start = ZONE.localize(datetime(2026, 10, 20, 10))
+    rule = recurrence.calendar_rule("FREQ=WEEKLY;BYDAY=TU;UNTIL=20261201T235959", start)
+    assert rule == "FREQ=WEEKLY;BYDAY=TU;UNTIL=20261202T045959Z"
+    # Both forms expand to the same meetings, the last on December 1
+    local = recurrence.expand("FREQ=WEEKLY;BYDAY=TU;UNTIL=20261201T235959", start, start)
+    assert recurrence.expand(rule, start, start) == local
+    assert len(local) == 7 and local[-1][0].date() == datetime(2026, 12, 1).date()
+
+
+def test_calendar_rule_caps_a_long_series():
+    start = ZONE.localize(datetime(2026, 10, 20, 10))
+    rule = recurrence.calendar_rule("FREQ=DAILY;UNTIL=20271231T235959", start, limit=52)
+    assert rule == "FREQ=DAILY;COUNT=52"
+
+
+def test_expand_counts_the_first_meeting_as_in_rfc_5545():
+    start = ZONE.localize(datetime(2026, 10, 21, 10))
+    on_rule = recurrence.expand("FREQ=WEEKLY;BYDAY=WE;COUNT=3", start, start)
+    off_rule = recurrence.expand("FREQ=WEEKLY;BYDAY=TU;COUNT=3", start, start)
+    assert [occurrence.day for occurrence, _ in on_rule] == [21, 28, 4]
+    assert [occurrence.day for occurrence, _ in off_rule] == [21, 27, 3]
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from metrics import SINGLEFLIGHT_CALLS
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test-threads")
+    followers_joined = SINGLEFLIGHT_CALLS.labels("test-threads", "follower").value
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def query():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flight.do, "key", query)
+        started.wait(5)
+        joined, deadline = followers_joined(), time.monotonic() + 5
+        followers = [pool.submit(flight.do, "key", query) for _ in range(3)]
+        while followers_joined() < joined + 3 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        assert flight.in_flight("key")
+        release.set()
+        assert [f.result() for f in [leader, *followers]] == ["answer"] * 4
+    assert len(calls) == 1
+    assert not flight.in_flight("key")
+
+
+def test_errors_are_shared_and_not_remembered():
+    flight = SingleFlight("test")
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "recovered") == "recovered"
+
+
+def test_coroutines_and_threads_share_one_call():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def query():
+        calls.append(1)
+        release.wait(5)
+        return len(calls)
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do_async("key", query))
+        second = asyncio.ensure_future(flight.do_async("key", query))
+        await asyncio.sleep(0)
+        thread = asyncio.get_running_loop().run_in_executor(None, flight.do, "key", query)
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(first, second, thread)
+
+    assert asyncio.run(scenario()) == [1, 1, 1]
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_call():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    async def scenario():
+        waiter = asyncio.ensure_future(flight.do_async("key", lambda: release.wait(5) and "done"))
+        other = asyncio.ensure_future(flight.do_async("key", lambda: "not run"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        release.set()
+        return await other
+
+    assert asyncio.run(scenario()) == "done"
@@ -0,0 +1,57 @@
+import pytest
+
+from checkpointing import build_checkpointer
+from slot_holds import MemorySlotHolds
+
+HOUR = 3600.0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def holds(request):
+    if request.param == "memory":
+        return MemorySlotHolds()
+    saver = build_checkpointer("memory")
+    saver.setup()
+    return saver
+
+
+def test_overlapping_slots_are_held_by_one_session_only(holds):
+    assert holds.hold_slots("cal", "a", [(0, HOUR), (2 * HOUR, 3 * HOUR)]) == [(0, HOUR), (2 * HOUR, 3 * HOUR)]
+    # Overlaps either hold, touches the first one, different calendar
+    assert holds.hold_slots("cal", "b", [(HOUR / 2, 2 * HOUR + 1), (HOUR, 2 * HOUR)]) == [(HOUR, 2 * HOUR)]
+    assert holds.hold_slots("other", "c", [(0, HOUR)]) == [(0, HOUR)]
+    assert holds.hold_count() == 4
+
+
+def test_holding_again_replaces_a_sessions_holds(holds):
+    holds.hold_slots("cal", "a", [(0, HOUR), (HOUR, 2 * HOUR)])
+    assert holds.hold_slots("cal", "a", [(0, HOUR)], limit=1) == [(0, HOUR)]
+    assert holds.hold_slots("cal", "b", [(HOUR, 2 * HOUR)]) == [(HOUR, 2 * HOUR)]
+    holds.release_holds("a")
+    assert holds.hold_slots("cal", "b", [(0, HOUR)]) == [(0, HOUR)]
+
+
+def test_expired_holds_free_the_slot(holds):
+    holds.hold_slots("cal", "a", [(0, HOUR)], ttl=-1)
+    assert holds.hold_slots("cal", "b", [(0, HOUR)]) == [(0, HOUR)]
+    assert holds.hold_count() == 1
+
+
+def test_a_long_hold_is_found_from_a_later_slot():
+    holds = MemorySlotHolds()
+    holds.hold_slots("cal", "a", [(0, 48 * HOUR)])
+    holds.hold_slots("cal", "a2", [(HOUR, 2 * HOUR)], ttl=-1)
+    assert holds.hold_slots("cal", "b", [(40 * HOUR, 41 * HOUR)]) == []
+
+
+def test_expiring_idle_sessions_drops_their_holds():
+    saver = build_checkpointer("memory")
+    saver.setup()
+    with saver.cursor() as cur:
+        cur.executemany("INSERT INTO checkpoint_threads (thread_id, updated_at) VALUES (?, ?)",
+                        [("idle", 0.0), ("active", 4e9)])
+    saver.hold_slots("cal", "idle", [(0, HOUR)])
+    saver.hold_slots("cal", "active", [(HOUR, 2 * HOUR)])
+    assert saver.delete_idle(3600) == 1
+    assert saver.hold_count() == 1
+    assert saver.hold_slots("cal", "other", [(0, HOUR)]) == [(0, HOUR)]
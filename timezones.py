@@ -0,0 +1,59 @@
+"""
+Timezone handling for slot generation.
+
+Slot times are computed as integer epoch minutes: local day and wall-clock
+minute, minus that day's UTC offset. Offsets are looked up once per
+(timezone, day, hour) and cached, so building a window of slots does not
+localize every slot, and a DST change cannot shift slots the way
+`datetime.replace(hour=...)` on a pytz-localized value did.
+
+The calendar's own timezone comes from CALENDAR_TIMEZONE; a conversation may
+carry the user's timezone (AgentState.timezone), which decides how dates
+like "tomorrow" are read and how slots are shown.
+"""
+
+import os
+from datetime import date, datetime, time
+from functools import lru_cache
+
+import pytz
+
+CALENDAR_TIMEZONE = os.getenv("CALENDAR_TIMEZONE", "UTC")
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=256)
+def get_timezone(name: str):
+    """pytz timezone for an IANA name; raises pytz.UnknownTimeZoneError if there is none"""
+    return pytz.timezone(name)
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        get_timezone(name)
+    except pytz.UnknownTimeZoneError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=16384)
+def utc_offset_minutes(timezone, day: date, hour: int = 12) -> int:
+    """UTC offset of `timezone`, in minutes, at `hour` o'clock local time on `day`"""
+    return int(timezone.localize(datetime.combine(day, time(hour))).utcoffset().total_seconds()) // 60
+
+
+def epoch_minutes(timezone, day: date, minute_of_day: int) -> int:
+    """Epoch minute of local wall time `minute_of_day` on `day`"""
+    offset = utc_offset_minutes(timezone, day, min(minute_of_day // 60, 23))
+    return (day.toordinal() - _EPOCH_ORDINAL) * 1440 + minute_of_day - offset
+
+
+def from_epoch_minutes(minutes: int, timezone) -> datetime:
+    return datetime.fromtimestamp(minutes * 60, timezone)
+
+
+@lru_cache(maxsize=65536)
+def parse_epoch_seconds(value: str) -> int:
+    """Epoch seconds of an RFC 3339 time as Google returns it; the same strings recur, so cached"""
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
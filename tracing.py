@@ -0,0 +1,242 @@
+"""
+Minimal OpenTelemetry-compatible tracing.
+
+Spans follow the OpenTelemetry data model (trace/span IDs, parent links,
+attributes, status) and are exported as OTLP-JSON-shaped lines to a local
+file by a background thread. W3C `traceparent` headers are honoured so traces
+can continue from an upstream caller.
+
+Configure with TRACING_EXPORTER:
+  - "none" (default): every span call returns a shared no-op span
+  - "file": write spans to TRACING_FILE (default traces.jsonl)
+  - "otel": hand spans to the OpenTelemetry SDK if it is installed
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "calendar-booking-agent")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled; every method is a cheap no-op"""
+
+    __slots__ = ()
+    recording = False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def set_status(self, ok: bool, description: str = ""):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes) if attributes else {}
+        self.events = []
+        self.status = {"code": "STATUS_CODE_UNSET"}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def record_exception(self, exc: BaseException):
+        self.events.append({
+            "name": "exception",
+            "timeUnixNano": time.time_ns(),
+            "attributes": {"exception.type": type(exc).__name__, "exception.message": str(exc)},
+        })
+
+    def set_status(self, ok: bool, description: str = ""):
+        self.status = {"code": "STATUS_CODE_OK" if ok else "STATUS_CODE_ERROR", "message": description}
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+            self.set_status(False, str(exc))
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        self._tracer._export(self)
+        return False
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "events": self.events,
+            "status": self.status,
+            "resource": {"service.name": SERVICE_NAME},
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class _FileExporter:
+    """Writes finished spans as JSON lines from a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # Never block a request on tracing; drop the span instead
+            pass
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                span = self._queue.get()
+                if span is None:
+                    break
+                f.write(json.dumps(span.to_otlp(), default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def shutdown(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=2)
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[_FileExporter] = None, otel_tracer=None):
+        self._exporter = exporter
+        self._otel = otel_tracer
+        self.enabled = exporter is not None or otel_tracer is not None
+
+    def after_fork(self):
+        """Start a span exporter thread in a forked worker"""
+        if self._exporter is not None:
+            self._exporter = _FileExporter(self._exporter.path)
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   traceparent: Optional[str] = None):
+        """Start a span as a child of the current one; use it as a context manager"""
+        if not self.enabled:
+            return NOOP_SPAN
+        if self._otel is not None:
+            return self._otel.start_as_current_span(name, attributes=attributes)
+
+        parent = _current_span.get()
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = _parse_traceparent(traceparent)
+        return Span(self, name, trace_id, parent_id, attributes)
+
+    def _export(self, span: Span):
+        if self._exporter is not None:
+            self._exporter.export(span)
+
+
+def _parse_traceparent(header: Optional[str]):
+    """Return (trace_id, parent_span_id) from a W3C traceparent, or a fresh trace"""
+    if header:
+        parts = header.split("-")
+        if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+            return parts[1], parts[2]
+    return "%032x" % random.getrandbits(128), None
+
+
+def _build_tracer() -> Tracer:
+    exporter = os.getenv("TRACING_EXPORTER", "none").lower()
+    if exporter == "file":
+        return Tracer(exporter=_FileExporter(os.getenv("TRACING_FILE", "traces.jsonl")))
+    if exporter == "otel":
+        try:
+            from opentelemetry import trace as otel_trace
+        except ImportError:
+            return Tracer()
+        return Tracer(otel_tracer=otel_trace.get_tracer(SERVICE_NAME))
+    return Tracer()
+
+
+tracer = _build_tracer()
+
+
+def current_span():
+    """The active span, or the no-op span when none is recording.
+
+    Callers should stick to set_attribute/set_attributes/record_exception,
+    which both this module's spans and OpenTelemetry SDK spans provide.
+    """
+    if tracer._otel is not None:
+        from opentelemetry import trace as otel_trace
+        return otel_trace.get_current_span()
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name: str, func: Optional[Callable] = None) -> Callable:
+    """Run each call of `func` inside a span called `name`; usable as a decorator"""
+    if func is None:
+        return lambda f: traced(name, f)
+    if not tracer.enabled:
+        return func
+
+    def wrapper(*args, **kwargs):
+        with tracer.start_span(name):
+            return func(*args, **kwargs)
+    wrapper.__name__ = getattr(func, "__name__", name)
+    wrapper.__doc__ = getattr(func, "__doc__", None)
+    return wrapper